@@ -0,0 +1,110 @@
+import math
+from statistics import NormalDist
+
+from features import POS_WORDS_PHASE3, NEG_WORDS_PHASE3, extract_features
+
+# Adaptive (early-stopping) collection for run_experiment --adaptive. Every
+# response is featurized as it arrives (the same features analyze_script
+# extracts) and folded into running estimates per (model, hypothesis_id,
+# condition) group: mean sentiment (Welford) and the recommended-player row of
+# the contingency table. Once a group has at least min_samples responses and
+# the confidence interval of each tracked estimate is within its target (the
+# recommended-player shares within +-precision, mean sentiment, which lives on
+# a much smaller scale, within +-sentiment_precision), its remaining cells are
+# skipped. Shares use the Agresti-Coull interval, so a group whose first
+# responses all agree is not taken as settled too early: at the defaults a
+# unanimous group settles after 9 responses (see min_settle_n()).
+# With --concurrency, calls already in flight when a group settles still
+# complete.
+
+METRICS = ("sentiment", "recommendation")
+
+class GroupEstimate:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.recs = {}
+
+    def add(self, feats):
+        self.n += 1
+        d = feats["sentiment"] - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (feats["sentiment"] - self.mean)
+        r = feats["recommended_player"]
+        self.recs[r] = self.recs.get(r, 0) + 1
+
+    def sentiment_halfwidth(self, z):
+        if self.n < 2:
+            return math.inf
+        return z * math.sqrt(self.m2 / (self.n - 1) / self.n)
+
+    def share_halfwidth(self, z):
+        # widest Agresti-Coull interval over the recommended players seen
+        if not self.n:
+            return math.inf
+        n = self.n + z * z
+        return max(z * math.sqrt(p * (1 - p) / n)
+                   for p in ((k + z * z / 2) / n for k in self.recs.values()))
+
+class AdaptiveSampler:
+    def __init__(self, precision=0.2, confidence=0.95, min_samples=5, metrics=METRICS, sentiment_precision=0.02):
+        unknown = set(metrics) - set(METRICS)
+        if unknown:
+            raise ValueError(f"unknown adaptive metrics: {', '.join(sorted(unknown))}")
+        self.precision = precision
+        self.sentiment_precision = sentiment_precision
+        self.min_samples = min_samples
+        self.metrics = tuple(metrics)
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.groups = {}
+        self.settled = set()
+        self.skipped = 0
+
+    def observe(self, rec):
+        key = (rec["model"], rec["hypothesis_id"], rec["condition"])
+        g = self.groups.setdefault(key, GroupEstimate())
+        if rec["response"].startswith("[ERROR]"):
+            return
+        g.add(extract_features(rec["response"], POS_WORDS_PHASE3, NEG_WORDS_PHASE3, axes=False))
+        if key not in self.settled and self.is_settled(g):
+            self.settled.add(key)
+
+    def is_settled(self, g):
+        if g.n < self.min_samples:
+            return False
+        width = {"sentiment": (g.sentiment_halfwidth, self.sentiment_precision),
+                 "recommendation": (g.share_halfwidth, self.precision)}
+        return all(f(self.z) <= target for f, target in (width[m] for m in self.metrics))
+
+    def min_settle_n(self, limit=100000):
+        # fewest responses with which a group can settle (a unanimous one, for
+        # shares); sentiment alone needs two to have an interval at all
+        n = max(self.min_samples, 2 if "sentiment" in self.metrics else 1)
+        if "recommendation" in self.metrics:
+            g = GroupEstimate()
+            while n < limit:
+                g.n, g.recs = n, {None: n}
+                if g.share_halfwidth(self.z) <= self.precision:
+                    break
+                n += 1
+        return n
+
+    def filter(self, cells):
+        # drops cells of settled groups; checked when each cell is pulled
+        for model, p, seed in cells:
+            if (model, p["hypothesis_id"], p["condition"]) in self.settled:
+                self.skipped += 1
+                continue
+            yield model, p, seed
+
+    def summary(self):
+        rows = []
+        for (model, hid, cond), g in sorted(self.groups.items()):
+            rows.append({"model": model, "hypothesis_id": hid, "condition": cond, "n": g.n,
+                         "settled": (model, hid, cond) in self.settled,
+                         "mean_sentiment": g.mean, "sentiment_halfwidth": g.sentiment_halfwidth(self.z),
+                         "recommendations": dict(sorted((str(k), v) for k, v in g.recs.items())),
+                         "share_halfwidth": g.share_halfwidth(self.z)})
+        return {"precision": self.precision, "sentiment_precision": self.sentiment_precision, "z": self.z, "min_samples": self.min_samples,
+                "metrics": list(self.metrics), "skipped_calls": self.skipped, "groups": rows}
@@ -1,82 +1,113 @@
 
-import argparse, os, json, re, collections
-import pandas as pd
-import numpy as np
-from scipy.stats import chi2_contingency
+import argparse, os, json
 from scripts.utils import read_jsonl
 
-POS_WORDS = set("excellent strong promising opportunity improve growth effective efficient advantage".split())
-NEG_WORDS = set("poor weak struggling concern risk problem issue ineffective inefficient disadvantage".split())
-
-PLAYERS = ["Player A", "Player B", "Player C"]
-
-def sentiment_score(text: str) -> float:
-    # simple lexicon-based: (#pos - #neg)/length
-    toks = re.findall(r"[a-zA-Z']+", text.lower())
-    if not toks:
-        return 0.0
-    pos = sum(1 for t in toks if t in POS_WORDS)
-    neg = sum(1 for t in toks if t in NEG_WORDS)
-    return (pos - neg) / max(1, len(toks))
-
-def who_is_recommended(text: str):
-    # naive: if the model names a player near "should", "recommend", "prioritize"
-    cand = None
-    for p in PLAYERS:
-        if re.search(p + r".{0,40}(should|recommend|priorit|coaching|focus)", text, re.I):
-            cand = p
-            break
-    # fallback: most mentions
-    counts = {p: len(re.findall(p, text)) for p in PLAYERS}
-    top = max(counts, key=counts.get)
-    return cand or top
+import instrument
 
-def main(args):
-    rows = []
-    for fn in os.listdir(args.results_dir):
-        if not fn.endswith(".jsonl"): 
-            continue
-        for rec in read_jsonl(os.path.join(args.results_dir, fn)):
-            text = rec["response"]
-            sent = sentiment_score(text)
-            mentions = {p: len(re.findall(p, text)) for p in PLAYERS}
-            recommended = who_is_recommended(text)
-            rows.append({
-                "provider": rec["provider"],
-                "model": rec["model"],
-                "hypothesis_id": rec["hypothesis_id"],
-                "condition": rec["condition"],
-                "sentiment": sent,
-                "recommended_player": recommended,
-                **{f"mentions_{p.replace(' ', '')}": n for p, n in mentions.items()}
-            })
-
-    df = pd.DataFrame(rows)
-    if df.empty:
-        print("No results found.")
-        return
+# Lexicon, players and heuristics live in features.py (compiled once, shared
+# with analyze_script); re-exported here for existing callers.
+from features import POS_WORDS, NEG_WORDS, PLAYERS, MENTION_COLS, sentiment_score, who_is_recommended, extract_frame
 
-    # Aggregations
-    by_cond = df.groupby(["hypothesis_id","condition"]).agg(
-        mean_sentiment=("sentiment","mean"),
-        n=("sentiment","size")
-    ).reset_index()
+META_COLS = ["provider", "model", "hypothesis_id", "condition"]
 
-    # Recommendation distributions per condition (H1/H2)
-    rec_counts = df.groupby(["hypothesis_id","condition","recommended_player"]).size().reset_index(name="count")
+def results_files(results_dir):
+    # JSONL results plus any columnar (.parquet) stores, see columnar.py
+    return [os.path.join(results_dir, fn) for fn in os.listdir(results_dir) if fn.endswith((".jsonl", ".parquet"))]
 
+def chi_square(tables):
     # Chi-square for H1/H2: does framing/demographics change who is recommended?
+    from scipy.stats import chi2_contingency
     chi_results = []
-    for hid in ("H1","H2"):
-        sub = df[df["hypothesis_id"]==hid]
-        if sub.empty: 
+    for hid, table in tables:
+        if table.empty:
             continue
-        table = pd.crosstab(sub["condition"], sub["recommended_player"])
         if table.shape[0] > 1 and table.shape[1] > 1:
-            chi2, p, dof, exp = chi2_contingency(table.values)
+            with instrument.stage("chi2"):
+                chi2, p, dof, exp = chi2_contingency(table.values)
             chi_results.append({"hypothesis_id": hid, "p_value": p, "chi2": chi2, "dof": dof})
         else:
             chi_results.append({"hypothesis_id": hid, "p_value": None, "note": "insufficient variety"})
+    return chi_results
+
+def summarize_stream(args):
+    # bounded memory: chunked reads, running aggregates only (see streaming.py)
+    # with --workers, byte-range shards are aggregated in a process pool and merged
+    from streaming import aggregate_parallel
+    agg = aggregate_parallel(results_files(args.results_dir), POS_WORDS, NEG_WORDS, axes=False,
+                             workers=getattr(args, "workers", 1), chunksize=args.chunksize)
+    instrument.count("records", sum(agg.n.values()))
+    if not agg.n:
+        return None
+    tables = [(hid, agg.crosstab(hid, "recommended_player")) for hid in ("H1","H2")]
+    return agg.sentiment_frame(), agg.count_frame("recommended_player"), chi_square(tables)
+
+def summarize(args, scorer=None, cache=None):
+    # scorer: replaces the lexicon sentiment (see scorers.py)
+    import pandas as pd
+    from columnar import is_columnar, read_columns, has_features
+    from streaming import exact_mean
+    recs, frames = [], []
+    feature_cols = ["sentiment", "recommended_player"] + MENTION_COLS
+    with instrument.stage("load"):
+        for path in results_files(args.results_dir):
+            if is_columnar(path):
+                stored = scorer is None and has_features(path, feature_cols)
+                frames.append(read_columns(path, META_COLS + (feature_cols if stored else ["response"])))
+                continue
+            for rec in read_jsonl(path):
+                recs.append({k: rec[k] for k in META_COLS + ["response"]})
+        if recs:
+            frames.append(pd.DataFrame(recs))
+        frames = [f for f in frames if not f.empty]
+    instrument.count("records", sum(len(f) for f in frames))
+
+    if not frames:
+        return None
+    parts = []
+    for raw in frames:
+        if "response" in raw:
+            with instrument.stage("extract_features"):
+                feats = extract_frame(raw["response"], POS_WORDS, NEG_WORDS, axes=False)
+            if scorer is not None:
+                from scorers import score_texts
+                feats["sentiment"] = score_texts(scorer, raw["response"], cache)
+            raw = pd.concat([raw[META_COLS], feats[feature_cols]], axis=1)
+        parts.append(raw[META_COLS + feature_cols])
+    df = pd.concat(parts, ignore_index=True)
+
+    with instrument.stage("groupby"):
+        # Aggregations
+        by_cond = df.groupby(["hypothesis_id","condition"]).agg(
+            mean_sentiment=("sentiment", exact_mean),
+            n=("sentiment","size")
+        ).reset_index()
+
+        # Recommendation distributions per condition (H1/H2)
+        rec_counts = df.groupby(["hypothesis_id","condition","recommended_player"]).size().reset_index(name="count")
+
+        tables = []
+        for hid in ("H1","H2"):
+            sub = df[df["hypothesis_id"]==hid]
+            tables.append((hid, pd.crosstab(sub["condition"], sub["recommended_player"])))
+    return by_cond, rec_counts, chi_square(tables)
+
+def main(args):
+    stream = getattr(args, "stream", False) or getattr(args, "workers", 1) > 1
+    scorer, cache = None, None
+    if getattr(args, "scorer", "lexicon") != "lexicon":
+        # batched rescoring of the sentiment column, in the in-memory path only
+        from scorers import get_scorer, ScoreCache
+        if stream:
+            raise ValueError("--scorer needs the per-record path: run without --stream/--workers")
+        scorer = get_scorer(args.scorer, POS_WORDS, NEG_WORDS)
+        cache = ScoreCache(args.score_cache) if getattr(args, "score_cache", "") else None
+    out = summarize_stream(args) if stream else summarize(args, scorer, cache)
+    if cache is not None:
+        cache.close()
+    if out is None:
+        print("No results found.")
+        return
+    by_cond, rec_counts, chi_results = out
 
     os.makedirs(args.outdir, exist_ok=True)
     by_cond.to_csv(os.path.join(args.outdir, "sentiment_by_condition.csv"), index=False)
@@ -89,9 +120,20 @@ def main(args):
     print(" - analysis/recommendations_by_condition.csv")
     print(" - analysis/chi_square_H1_H2.json")
 
-if __name__ == "__main__":
-    ap = argparse.ArgumentParser()
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog)
     ap.add_argument("--results_dir", default="results")
     ap.add_argument("--outdir", default="analysis")
-    args = ap.parse_args()
+    ap.add_argument("--stream", action="store_true", help="chunked reads and running aggregates (bounded memory)")
+    ap.add_argument("--chunksize", type=int, default=50000, help="records per chunk in --stream mode")
+    ap.add_argument("--workers", type=int, default=1, help="process-pool workers (implies --stream)")
+    ap.add_argument("--scorer", default="lexicon", help="sentiment scorer: lexicon or ngram:<weights.npz> "
+                                                        "(see scorers.py)")
+    ap.add_argument("--score_cache", default="", help="SQLite cache of --scorer scores per response digest")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("analyze_bias", args)
     main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -1,126 +1,249 @@
-import os, json, re, argparse
-import pandas as pd
-from scipy.stats import chi2_contingency
+import os, json, argparse
 
-PLAYERS = ["Player A", "Player B", "Player C"]
+import instrument
+from features import (PLAYERS, MENTION_COLS, POS_WORDS_PHASE3, NEG_WORDS_PHASE3,
+                      extract_mentions, classify_strategy, extract_frame)
+from features import sentiment_score as _sentiment_score
 
 def sentiment_score(text: str) -> float:
-    POS = set("excellent strong promising opportunity improve growth effective efficient advantage breakthrough edge positive potential".split())
-    NEG = set("poor weak struggling concern risk problem issue ineffective inefficient disadvantage stall negative".split())
-    toks = re.findall(r"[a-zA-Z']+", text.lower())
-    if not toks: return 0.0
-    pos = sum(1 for t in toks if t in POS)
-    neg = sum(1 for t in toks if t in NEG)
-    return (pos - neg) / max(1, len(toks))
-
-def extract_mentions(text: str):
-    return {p: len(re.findall(p, text)) for p in PLAYERS}
-
-def classify_strategy(text: str):
-    t = text.lower()
-    off_kw = ["goal","assist","finish","attack","shot","sog","offense","offensive","scoring","possession time"]
-    def_kw = ["defense","defensive","turnover","clear","ride","ground ball","gb","save","stops","pressure"]
-    off = any(k in t for k in off_kw); de = any(k in t for k in def_kw)
-    if off and de: strat = "mixed"
-    elif off: strat = "offensive"
-    elif de: strat = "defensive"
-    else: strat = "other"
-    ind_kw = ["player a","player b","player c","individual","one-on-one","targeted coaching","coaching on"]
-    team_kw = ["team","system","scheme","drills","unit","transition","set plays","collective"]
-    ind = any(k in t for k in ind_kw); tm = any(k in t for k in team_kw)
-    if ind and tm: scope = "mixed"
-    elif ind: scope = "individual"
-    elif tm: scope = "team"
-    else: scope = "other"
-    return strat, scope
+    return _sentiment_score(text, POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
 
-def main(args):
-    with open(args.results, "r", encoding="utf-8") as f:
-        recs = [json.loads(l) for l in f if l.strip()]
-    df = pd.DataFrame(recs)
+FEATURE_COLS = ["sentiment","strategy_axis","scope_axis","recommended_player"] + MENTION_COLS
 
-    rows = []
-    for _, r in df.iterrows():
-        text = r["response"]
-        sent = sentiment_score(text)
-        mentions = extract_mentions(text)
-        strat, scope = classify_strategy(text)
-        recp = None
-        for p in PLAYERS:
-            if re.search(p + r".{0,40}(should|recommend|priorit|coaching|focus)", text, re.I):
-                recp = p; break
-        if not recp:
-            recp = max(mentions, key=mentions.get)
-        rows.append({
-            "hypothesis_id": r["hypothesis_id"],
-            "condition": r["condition"],
-            "sentiment": sent,
-            "strategy_axis": strat,
-            "scope_axis": scope,
-            "recommended_player": recp,
-            **{f"mentions_{p.replace(' ','')}": mentions[p] for p in PLAYERS}
-        })
-    af = pd.DataFrame(rows)
-
-    os.makedirs(args.outdir, exist_ok=True)
+def load_features(path, extra=(), scorer=None, cache=None):
+    # extra: further record columns to keep, e.g. ["model"] for --split_by
+    # scorer: replaces the lexicon sentiment (see scorers.py)
+    import pandas as pd
+    from columnar import is_columnar, read_columns, has_features
+    keys = ["hypothesis_id","condition"] + list(extra)
+    if is_columnar(path):
+        # stored feature columns when present, else just the responses
+        if scorer is None and has_features(path, ["sentiment_phase3"] + FEATURE_COLS[1:]):
+            af = read_columns(path, keys + ["sentiment_phase3"] + FEATURE_COLS[1:])
+            return af.rename(columns={"sentiment_phase3": "sentiment"})[keys + FEATURE_COLS]
+        df = read_columns(path, keys + ["response"])
+    else:
+        with instrument.stage("load"), open(path, "r", encoding="utf-8") as f:
+            recs = [json.loads(l) for l in f if l.strip()]
+        df = pd.DataFrame(recs)
+    instrument.count("records", len(df))
+
+    # one vectorized pass over the response column (see features.py)
+    with instrument.stage("extract_features"):
+        feats = extract_frame(df["response"], POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+    if scorer is not None:
+        from scorers import score_texts
+        feats["sentiment"] = score_texts(scorer, df["response"], cache)
+    return pd.concat([df[keys], feats[FEATURE_COLS]], axis=1)
 
+TESTS = [(("H1","H2"), "recommended_player", "chi-square(rec_by_condition)"),
+         (("H3","H5"), "strategy_axis", "chi-square(strategy_by_condition)")]
+
+def summarize(af):
+    import pandas as pd
+    from streaming import exact_mean
     # 1) Mentions by condition
-    mentions_cols = [c for c in af.columns if c.startswith("mentions_")]
-    mentions_long = af.melt(id_vars=["hypothesis_id","condition"], value_vars=mentions_cols,
-                            var_name="entity", value_name="mentions")
-    mentions_long["entity"] = mentions_long["entity"].str.replace("mentions_","").str.replace("Player","Player ")
-    mentions_by_condition = mentions_long.groupby(["hypothesis_id","condition","entity"]).agg(total_mentions=("mentions","sum")).reset_index()
-    mentions_by_condition.to_csv(os.path.join(args.outdir, "mentions_by_condition.csv"), index=False)
-
-    # 2) Sentiment by condition
-    sent_by_cond = af.groupby(["hypothesis_id","condition"]).agg(mean_sentiment=("sentiment","mean"),
-                                                                 n=("sentiment","size")).reset_index()
-    sent_by_cond.to_csv(os.path.join(args.outdir, "sentiment_by_condition_phase3.csv"), index=False)
-
-    # 3) Recommendation types
-    strategy_counts = af.groupby(["hypothesis_id","condition","strategy_axis"]).size().reset_index(name="count")
-    scope_counts = af.groupby(["hypothesis_id","condition","scope_axis"]).size().reset_index(name="count")
-    strategy_counts.to_csv(os.path.join(args.outdir, "recommendation_strategy_by_condition.csv"), index=False)
-    scope_counts.to_csv(os.path.join(args.outdir, "recommendation_scope_by_condition.csv"), index=False)
+    with instrument.stage("melt"):
+        mentions_cols = [c for c in af.columns if c.startswith("mentions_")]
+        mentions_long = af.melt(id_vars=["hypothesis_id","condition"], value_vars=mentions_cols,
+                                var_name="entity", value_name="mentions")
+        mentions_long["entity"] = mentions_long["entity"].str.replace("mentions_","").str.replace("Player","Player ")
+    with instrument.stage("groupby"):
+        mentions_by_condition = mentions_long.groupby(["hypothesis_id","condition","entity"]).agg(total_mentions=("mentions","sum")).reset_index()
+
+        # 2) Sentiment by condition
+        sent_by_cond = af.groupby(["hypothesis_id","condition"]).agg(mean_sentiment=("sentiment", exact_mean),
+                                                                     n=("sentiment","size")).reset_index()
+
+        # 3) Recommendation types
+        strategy_counts = af.groupby(["hypothesis_id","condition","strategy_axis"]).size().reset_index(name="count")
+        scope_counts = af.groupby(["hypothesis_id","condition","scope_axis"]).size().reset_index(name="count")
+
+    tables = []
+    for hids, col, test in TESTS:
+        for hid in hids:
+            sub = af[af["hypothesis_id"]==hid]
+            tables.append((hid, test, pd.crosstab(sub["condition"], sub[col])))
+    return mentions_by_condition, sent_by_cond, strategy_counts, scope_counts, tables
+
+def summarize_stream(path, chunksize, workers=1):
+    # bounded memory: chunked reads, running aggregates only (see streaming.py);
+    # with workers > 1 byte ranges of the file are aggregated in parallel
+    from streaming import aggregate_parallel
+    agg = aggregate_parallel([path], POS_WORDS_PHASE3, NEG_WORDS_PHASE3, workers=workers, chunksize=chunksize)
+    instrument.count("records", sum(agg.n.values()))
+    tables = [(hid, test, agg.crosstab(hid, col)) for hids, col, test in TESTS for hid in hids]
+    return (agg.mentions_frame(), agg.sentiment_frame(), agg.count_frame("strategy_axis"),
+            agg.count_frame("scope_axis"), tables)
+
+def index_features(path, index_path, chunksize=50000):
+    # incremental mode: extract features only for records not yet in the index
+    import pandas as pd
+    from feature_index import FeatureIndex, record_digest, features_version
+    from streaming import iter_records
+    index = FeatureIndex(index_path)
+    if index.ensure_version("features", features_version(POS_WORDS_PHASE3, NEG_WORDS_PHASE3)):
+        print(f"Lexicons/keywords changed: re-extracting all features in {index_path}")
+    cols = ["timestamp","provider","model","seed","hypothesis_id","condition","prompt","response"]
+    chunk, n_new = [], 0
+    def extract(new):
+        texts = pd.Series([r["response"] for _, r in new])
+        with instrument.stage("extract_features"):
+            af = extract_frame(texts, POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+        with instrument.stage("index_write"):
+            index.put_features([d for d, _ in new], [r for _, r in new], af, source=path)
+    def flush(chunk):
+        digests = [record_digest(r) for r in chunk]
+        todo = set(index.missing(digests, "features"))
+        new = [(d, r) for d, r in zip(digests, chunk) if d in todo]
+        if new:
+            extract(new)
+        instrument.count("records", len(chunk))
+        instrument.count("records_new", len(new))
+        return len(new)
+    for rec in iter_records(path, cols, chunksize):
+        chunk.append(rec)
+        if len(chunk) >= chunksize:
+            n_new += flush(chunk)
+            chunk = []
+    if chunk:
+        n_new += flush(chunk)
+    # records of earlier batches whose features were invalidated
+    stale = index.stale("features")
+    for i in range(0, len(stale), chunksize):
+        extract(stale[i:i + chunksize])
+    index.require_complete("features")
+    print(f"Index {index_path}: extracted features for {n_new} new and {len(stale)} previously indexed records")
+    return index
+
+def fabrication_rates(claims):
+    import pandas as pd
+    agg = {}
+    for r in claims:
+        key = (r["hypothesis_id"], r["condition"])
+        agg.setdefault(key, {"checked": 0, "incorrect": 0})
+        for issue in r.get("issues", []):
+            agg[key]["checked"] += 1
+            if issue.get("correct") is False:
+                agg[key]["incorrect"] += 1
+    rows = []
+    for (hid,cond), v in agg.items():
+        rate = (v["incorrect"]/v["checked"]) if v["checked"]>0 else 0.0
+        rows.append({"hypothesis_id": hid, "condition": cond, "claims_checked": v["checked"], "incorrect": v["incorrect"], "fabrication_rate": rate})
+    return pd.DataFrame(rows)
+
+def write_tables(outdir, out):
+    mentions_by_condition, sent_by_cond, strategy_counts, scope_counts, tables = out
+    os.makedirs(outdir, exist_ok=True)
+    mentions_by_condition.to_csv(os.path.join(outdir, "mentions_by_condition.csv"), index=False)
+    sent_by_cond.to_csv(os.path.join(outdir, "sentiment_by_condition_phase3.csv"), index=False)
+    strategy_counts.to_csv(os.path.join(outdir, "recommendation_strategy_by_condition.csv"), index=False)
+    scope_counts.to_csv(os.path.join(outdir, "recommendation_scope_by_condition.csv"), index=False)
+    return tables
+
+def split_dir(outdir, split, value):
+    # <outdir>/<split>=<value>, as read by visualizations.py --split_by
+    return os.path.join(outdir, f"{split}={str(value).replace(os.sep, '_')}")
+
+def main(args):
+    workers = getattr(args, "workers", 1)
+    split = getattr(args, "split_by", "")
+    index, af = None, None
+    scorer, cache = None, None
+    if getattr(args, "scorer", "lexicon") != "lexicon":
+        # batched rescoring of the sentiment column, in the in-memory path only
+        from scorers import get_scorer, ScoreCache
+        if getattr(args, "index", "") or getattr(args, "stream", False) or workers > 1:
+            raise ValueError("--scorer needs the per-record path: run without --stream/--workers/--index")
+        scorer = get_scorer(args.scorer, POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+        cache = ScoreCache(args.score_cache) if getattr(args, "score_cache", "") else None
+    if getattr(args, "index", ""):
+        # aggregates cover every record in the index, not only this batch
+        index = index_features(args.results, args.index, args.chunksize)
+        af = index.feature_frame([split] if split else ())
+        out = summarize(af)
+    elif getattr(args, "stream", False) or (workers > 1 and not getattr(args, "resamples", 0)):
+        # with --resamples, --workers run the resamples over the per-record table
+        out = summarize_stream(args.results, args.chunksize, workers)
+    else:
+        af = load_features(args.results, [split] if split else (), scorer, cache)
+        if cache is not None:
+            cache.close()
+        out = summarize(af)
+    tables = write_tables(args.outdir, out)
 
     # 4) Statistical tests
+    from scipy.stats import chi2_contingency
     stats_results = []
-    for hid in ("H1","H2"):
-        sub = af[af["hypothesis_id"]==hid]
-        tab = pd.crosstab(sub["condition"], sub["recommended_player"])
-        if tab.shape[0]>1 and tab.shape[1]>1:
-            chi2, p, dof, _ = chi2_contingency(tab.values)
-            stats_results.append({"hypothesis_id": hid, "test": "chi-square(rec_by_condition)", "chi2": float(chi2), "p_value": float(p), "dof": int(dof)})
-    for hid in ("H3","H5"):
-        sub = af[af["hypothesis_id"]==hid]
-        tab = pd.crosstab(sub["condition"], sub["strategy_axis"])
+    for hid, test, tab in tables:
         if tab.shape[0]>1 and tab.shape[1]>1:
-            chi2, p, dof, _ = chi2_contingency(tab.values)
-            stats_results.append({"hypothesis_id": hid, "test": "chi-square(strategy_by_condition)", "chi2": float(chi2), "p_value": float(p), "dof": int(dof)})
+            with instrument.stage("chi2"):
+                chi2, p, dof, _ = chi2_contingency(tab.values)
+            stats_results.append({"hypothesis_id": hid, "test": test, "chi2": float(chi2), "p_value": float(p), "dof": int(dof)})
     with open(os.path.join(args.outdir, "phase3_stats_tests.json"), "w") as f:
         json.dump(stats_results, f, indent=2)
 
-    # 5) Fabrication rate by condition (requires claims_validation.json)
+    # 5) Fabrication rate by condition (from the index, or claims_validation.json)
+    claims = index.claims_report() if index is not None else []
     claims_path = os.path.join(args.outdir, "claims_validation.json")
-    if os.path.exists(claims_path):
+    if not claims and os.path.exists(claims_path):
         claims = json.load(open(claims_path))
-        agg = {}
-        for r in claims:
-            key = (r["hypothesis_id"], r["condition"])
-            agg.setdefault(key, {"checked": 0, "incorrect": 0})
-            for issue in r.get("issues", []):
-                agg[key]["checked"] += 1
-                if issue.get("correct") is False:
-                    agg[key]["incorrect"] += 1
-        rows = []
-        for (hid,cond), v in agg.items():
-            rate = (v["incorrect"]/v["checked"]) if v["checked"]>0 else 0.0
-            rows.append({"hypothesis_id": hid, "condition": cond, "claims_checked": v["checked"], "incorrect": v["incorrect"], "fabrication_rate": rate})
-        pd.DataFrame(rows).to_csv(os.path.join(args.outdir, "fabrication_rate_by_condition.csv"), index=False)
+    if claims:
+        with instrument.stage("fabrication_rates"):
+            fabrication_rates(claims).to_csv(os.path.join(args.outdir, "fabrication_rate_by_condition.csv"), index=False)
+    if index is not None:
+        index.close()
 
-if __name__ == "__main__":
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--results", required=True)
+    # per-model / per-provider aggregate sets (same CSVs, one directory each)
+    if split:
+        if af is None:
+            print("--split_by needs the per-record feature table: run without --stream/--workers, or with --index")
+        else:
+            with instrument.stage("split_tables"):
+                for value, sub in af.groupby(split, sort=True):
+                    d = split_dir(args.outdir, split, value)
+                    write_tables(d, summarize(sub))
+                    part = [r for r in claims if r.get(split) == value]
+                    if part:
+                        fabrication_rates(part).to_csv(os.path.join(d, "fabrication_rate_by_condition.csv"), index=False)
+
+    # 6) Permutation tests and bootstrap CIs (see resampling.py)
+    if getattr(args, "resamples", 0) > 0:
+        if af is None:
+            print("Resampling needs the per-record feature table: run without --stream, or with --index")
+            return
+        from resampling import resample_all, claim_counts
+        with instrument.stage("resampling"):
+            tests, ci = resample_all(af, claim_counts(claims) if claims else None, args.resamples,
+                                     seed=args.seed, level=args.ci, workers=workers)
+        with open(os.path.join(args.outdir, "phase3_permutation_tests.json"), "w") as f:
+            json.dump(tests, f, indent=2)
+        ci.to_csv(os.path.join(args.outdir, "bootstrap_ci_by_condition.csv"), index=False)
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog)
+    ap.add_argument("--results", required=True, help="JSONL results file or columnar .parquet store")
     ap.add_argument("--outdir", default="analysis")
-    args = ap.parse_args()
-    main(args)
\ No newline at end of file
+    ap.add_argument("--stream", action="store_true", help="chunked reads and running aggregates (bounded memory)")
+    ap.add_argument("--chunksize", type=int, default=50000, help="records per chunk in --stream mode")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="process-pool workers: over byte ranges (implies --stream), or over the resamples "
+                         "when --resamples is set")
+    ap.add_argument("--index", default="", help="SQLite feature index: only unseen records are processed and "
+                                                "aggregates are rebuilt from every indexed record")
+    ap.add_argument("--resamples", type=int, default=0, help="permutation tests and bootstrap CIs with this many "
+                                                             "resamples (0 = off); --workers splits them over processes")
+    ap.add_argument("--seed", type=int, default=0, help="seed for --resamples")
+    ap.add_argument("--ci", type=float, default=0.95, help="bootstrap confidence level")
+    ap.add_argument("--split_by", default="", choices=["", "model", "provider"],
+                    help="also write the aggregate CSVs per model/provider into <outdir>/<split>=<value>/")
+    ap.add_argument("--scorer", default="lexicon", help="sentiment scorer: lexicon or ngram:<weights.npz> "
+                                                        "(see scorers.py)")
+    ap.add_argument("--score_cache", default="", help="SQLite cache of --scorer scores per response digest")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("analyze_script", args)
+    main(args)
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
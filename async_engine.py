@@ -0,0 +1,99 @@
+import asyncio, random, time
+from concurrent.futures import ThreadPoolExecutor
+
+# Async execution engine for run_experiment: a fixed pool of worker coroutines
+# pulls cells from a shared iterator, so at most `concurrency` requests are in
+# flight per provider. Blocking SDK calls run in a thread pool sized to match.
+
+def estimate_tokens(prompt: str, completion_tokens: int = 800) -> int:
+    # rough 4 chars/token heuristic plus the completion budget (max_tokens)
+    return len(prompt) // 4 + 1 + completion_tokens
+
+def is_throttle(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status in (429, 529):
+        return True
+    name = type(exc).__name__
+    return any(k in name for k in ("RateLimit", "ResourceExhausted", "Overloaded"))
+
+class TokenBucket:
+    # classic token bucket refilled continuously at `per_minute` tokens/minute
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.loop = self.lock = None
+
+    def _lock(self):
+        # made in the running loop: an asyncio.Lock created outside it fails on
+        # 3.9, and coordinator reuses one limiter across asyncio.run batches
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.lock = loop, asyncio.Lock()
+        return self.lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1):
+        n = min(n, self.capacity)  # a single oversized request must not deadlock
+        async with self._lock():
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+class ProviderLimiter:
+    # per-provider limits: in-flight requests, requests/min and tokens/min
+    def __init__(self, concurrency: int = 8, rpm: float = 0, tpm: float = 0,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.concurrency = max(1, concurrency)
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def admit(self, n_tokens: int):
+        if self.rpm:
+            await self.rpm.acquire(1)
+        if self.tpm:
+            await self.tpm.acquire(n_tokens)
+
+    def backoff(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+async def _call(asker, model, prompt, temperature, seed, limiter):
+    n_tokens = estimate_tokens(prompt)
+    for attempt in range(limiter.max_retries + 1):
+        await limiter.admit(n_tokens)
+        try:
+            return await asyncio.to_thread(asker, model, prompt, temperature, seed)
+        except Exception as e:
+            if not is_throttle(e) or attempt == limiter.max_retries:
+                return f"[ERROR] {type(e).__name__}: {e}"
+            await asyncio.sleep(limiter.backoff(attempt))
+
+async def _run(asker, cells, temperature, limiter, on_result):
+    it = iter(cells)
+
+    async def worker():
+        # cells is a plain iterator; no await between next() calls, so no races
+        for model, p, seed in it:
+            text = await _call(asker, model, p["prompt"], temperature, seed, limiter)
+            on_result(model, p, seed, text)
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=limiter.concurrency))
+    await asyncio.gather(*(worker() for _ in range(limiter.concurrency)))
+
+def run_cells(asker, cells, temperature, limiter, on_result):
+    # cells: iterable of (model, prompt_row, seed); on_result is called from the
+    # event loop thread as each response completes (completion order).
+    asyncio.run(_run(asker, cells, temperature, limiter, on_result))
@@ -0,0 +1,260 @@
+import hashlib, json, os, time
+
+import instrument
+
+# Batch submission mode for run_experiment (--batch). Manifest cells are packed
+# into batch job files (one model per job, within the provider's request and
+# size limits), submitted to the provider's asynchronous batch endpoint,
+# polled, and unpacked into the normal JSONL records. Each request carries its
+# manifest cell index as custom_id, so results map back to
+# hypothesis_id/condition/seed whatever order they arrive in. Job ids and
+# progress (jobs collected, results written of the job being unpacked) are
+# kept in <batch_dir>/state.json: an interrupted run restarted with the same
+# manifest and batch_dir resumes polling instead of resubmitting, and resumes
+# unpacking where the written output ends.
+#
+# Backends: OpenAI (/v1/batches) and Anthropic (Message Batches) through the
+# clients in providers.py, and MockBatchBackend, an offline stand-in that
+# keeps its jobs as files and answers them with the mock asker.
+
+def cell_id(i: int) -> str:
+    return f"cell-{i}"
+
+def cell_index(custom_id: str) -> int:
+    return int(custom_id.rsplit("-", 1)[1])
+
+def _error(msg) -> str:
+    return f"[ERROR] BatchError: {msg}"
+
+def _chat_request(custom_id, model, prompt, temperature, seed):
+    # one line of an OpenAI batch input file
+    return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": [{"role": "user", "content": prompt}],
+                     "temperature": temperature, "seed": seed}}
+
+class BatchBackend:
+    name = ""
+    max_requests = 50000
+    max_bytes = 100 * 1024 * 1024
+
+    def request(self, custom_id: str, model: str, prompt: str, temperature: float, seed: int) -> dict:
+        raise NotImplementedError
+
+    def submit(self, path: str) -> str:
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        # "running", "done" (results available, possibly partial) or "failed"
+        raise NotImplementedError
+
+    def results(self, batch_id: str):
+        # (custom_id, response text or "[ERROR] ...") pairs, any order
+        raise NotImplementedError
+
+class OpenAIBatchBackend(BatchBackend):
+    name = "openai"
+
+    def __init__(self):
+        from providers import get_adapter
+        self.client = get_adapter("openai").provider_client()
+
+    def request(self, custom_id, model, prompt, temperature, seed):
+        return _chat_request(custom_id, model, prompt, temperature, seed)
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            upload = self.client.files.create(file=f, purpose="batch")
+        return self.client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions",
+                                          completion_window="24h").id
+
+    def status(self, batch_id):
+        st = self.client.batches.retrieve(batch_id).status
+        if st == "failed":
+            return "failed"
+        # expired/cancelled batches still return the requests that finished
+        return "done" if st in ("completed", "expired", "cancelled") else "running"
+
+    def results(self, batch_id):
+        b = self.client.batches.retrieve(batch_id)
+        for file_id in (b.output_file_id, b.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                r = json.loads(line)
+                resp = r.get("response") or {}
+                if r.get("error") or resp.get("status_code") != 200:
+                    yield r["custom_id"], _error(r.get("error") or resp.get("body", {}).get("error"))
+                else:
+                    yield r["custom_id"], resp["body"]["choices"][0]["message"]["content"]
+
+class AnthropicBatchBackend(BatchBackend):
+    name = "anthropic"
+    max_requests = 100000
+
+    def __init__(self):
+        from providers import get_adapter
+        self.client = get_adapter("anthropic").provider_client()
+
+    def request(self, custom_id, model, prompt, temperature, seed):
+        # same parameters as the synchronous adapter (no seed support)
+        return {"custom_id": custom_id, "params": {"model": model, "max_tokens": 800, "temperature": temperature,
+                                                   "messages": [{"role": "user", "content": prompt}]}}
+
+    def submit(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            requests = [json.loads(l) for l in f if l.strip()]
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, batch_id):
+        st = self.client.messages.batches.retrieve(batch_id).processing_status
+        return "done" if st == "ended" else "running"
+
+    def results(self, batch_id):
+        for r in self.client.messages.batches.results(batch_id):
+            if r.result.type == "succeeded":
+                yield r.custom_id, r.result.message.content[0].text
+            else:
+                err = getattr(r.result, "error", None)
+                yield r.custom_id, _error(f"{r.result.type}: {err}" if err else r.result.type)
+
+class MockBatchBackend(BatchBackend):
+    # offline batch server: jobs live as files under `root`, complete `delay`
+    # seconds after submission and are answered by `asker`; `error_rate` of the
+    # requests (chosen by custom_id hash) fail, to exercise error unpacking
+    name = "mock"
+
+    def __init__(self, root: str, asker, delay: float = 0.0, error_rate: float = 0.0):
+        self.root, self.asker, self.delay, self.error_rate = root, asker, delay, error_rate
+        os.makedirs(root, exist_ok=True)
+
+    def request(self, custom_id, model, prompt, temperature, seed):
+        return _chat_request(custom_id, model, prompt, temperature, seed)
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        batch_id = "batch_" + hashlib.sha256(data + str(time.time_ns()).encode()).hexdigest()[:16]
+        with open(os.path.join(self.root, batch_id + ".input.jsonl"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.root, batch_id + ".json"), "w") as f:
+            json.dump({"submitted": time.time()}, f)
+        return batch_id
+
+    def status(self, batch_id):
+        with open(os.path.join(self.root, batch_id + ".json")) as f:
+            meta = json.load(f)
+        return "done" if time.time() >= meta["submitted"] + self.delay else "running"
+
+    def _failed(self, custom_id):
+        h = int(hashlib.sha256(custom_id.encode()).hexdigest()[:8], 16)
+        return h / 0xFFFFFFFF < self.error_rate
+
+    def results(self, batch_id):
+        with open(os.path.join(self.root, batch_id + ".input.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                r = json.loads(line)
+                body = r["body"]
+                if self._failed(r["custom_id"]):
+                    yield r["custom_id"], _error("mock failure")
+                    continue
+                yield r["custom_id"], self.asker(body["model"], body["messages"][0]["content"],
+                                                 body["temperature"], body["seed"])
+
+def get_backend(provider: str, batch_dir: str, asker=None, delay: float = 0.0) -> BatchBackend:
+    if provider == "openai":
+        return OpenAIBatchBackend()
+    if provider == "anthropic":
+        return AnthropicBatchBackend()
+    if provider == "mock":
+        return MockBatchBackend(os.path.join(batch_dir, "mock_server"), asker, delay)
+    raise ValueError(f"no batch API for provider {provider!r}; use openai, anthropic or mock")
+
+def pack(backend: BatchBackend, cells, temperature: float, batch_dir: str):
+    # cells: (idx, model, prompt_row, seed) -> job dicts with their input file
+    jobs, f, model, n, size = [], None, None, 0, 0
+    try:
+        for i, m, p, seed in cells:
+            line = (json.dumps(backend.request(cell_id(i), m, p["prompt"], temperature, seed),
+                               ensure_ascii=False) + "\n").encode("utf-8")
+            if f is None or m != model or n >= backend.max_requests or size + len(line) > backend.max_bytes:
+                if f is not None:
+                    f.close()
+                path = os.path.join(batch_dir, f"job-{len(jobs):05d}.jsonl")
+                f, model, n, size = open(path, "wb"), m, 0, 0
+                jobs.append({"file": path, "model": m, "requests": 0})
+            f.write(line)
+            n += 1
+            size += len(line)
+            jobs[-1]["requests"] = n
+    finally:
+        if f is not None:
+            f.close()
+    return jobs
+
+def _job_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(l)["custom_id"] for l in f if l.strip()]
+
+def run(backend: BatchBackend, cells, temperature: float, batch_dir: str, on_result, flush=None,
+        poll: float = 30.0, key: str = "", flush_every: int = 50):
+    # on_result(idx, text) for every packed cell, job by job in cell order.
+    # Results are handed over flush_every at a time and flush() is called after
+    # each slice, before the job's "emitted" offset is advanced in the state
+    # file, so a run restarted mid-unpack skips what was already written
+    # instead of emitting it twice. flush() must write everything handed over
+    # since the last call, and nothing else may flush in between.
+    os.makedirs(batch_dir, exist_ok=True)
+    state_path = os.path.join(batch_dir, "state.json")
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("key") != key or state.get("backend") != backend.name:
+            raise ValueError(f"{batch_dir} holds jobs of a different run; use a new --batch_dir")
+        print(f"Resuming {len(state['jobs'])} batch jobs from {state_path}")
+
+    def save():
+        tmp = state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, state_path)
+
+    if state is None:
+        with instrument.stage("batch_pack"):
+            state = {"key": key, "backend": backend.name, "jobs": pack(backend, cells, temperature, batch_dir)}
+        save()
+    for job in state["jobs"]:
+        if "id" not in job:
+            with instrument.stage("batch_submit"):
+                job["id"] = backend.submit(job["file"])
+            save()
+    pending = [j for j in state["jobs"] if not j.get("collected")]
+    print(f"{len(pending)} batch jobs pending ({sum(j['requests'] - j.get('emitted', 0) for j in pending)} requests)")
+    while pending:
+        # collect in submission order so output stays in cell order
+        job = pending[0]
+        with instrument.stage("batch_poll"):
+            st = backend.status(job["id"])
+        if st == "running":
+            time.sleep(poll)
+            continue
+        with instrument.stage("batch_unpack"):
+            got = dict(backend.results(job["id"])) if st == "done" else {}
+            ids = _job_ids(job["file"])
+            for start in range(job.get("emitted", 0), len(ids), max(1, flush_every)):
+                stop = min(start + max(1, flush_every), len(ids))
+                for cid in ids[start:stop]:
+                    text = got.get(cid)
+                    if text is None:
+                        text = _error(f"no result (batch {job['id']} {st})")
+                    on_result(cell_index(cid), text)
+                if flush is not None:
+                    flush()
+                job["emitted"] = stop
+                save()
+        job["collected"] = True
+        save()
+        pending.pop(0)
+    return state
@@ -0,0 +1,97 @@
+import argparse, json, os, re, sys, time
+
+# Claim-check throughput against the checker it replaced. baseline_check() is
+# validate_claims.check_claims from before claim_rules.py, kept as it was (three
+# inline re.search calls per response). On a corpus.py corpus:
+#   baseline   the original three checks
+#   rules(3)   ClaimChecker with the rules that port those three checks
+#   rules      ClaimChecker with the full scripts/claim_rules.json
+# rules(3) does the same work as the baseline and must be at least --target
+# times its throughput; otherwise the run fails. The full rule set is reported
+# for reference: it runs many more checks and has no baseline.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from corpus import ResponseSynth
+
+BASELINE_RULES = ["more_turnovers", "better_free_position", "large_shot_numbers"]
+
+def extract_numbers(text):
+    # returns list of (number, context window)
+    nums = []
+    for m in re.finditer(r"(-?\d+\.?\d*)", text):
+        start = max(0, m.start()-20)
+        end = min(len(text), m.end()+20)
+        nums.append((float(m.group(1)), text[start:end]))
+    return nums
+
+def baseline_check(text, truth):
+    issues = []
+    # Example heuristic: if text says "more turnovers than opponents" verify numbers
+    if re.search(r"turnover[s]? .*than opponent", text, re.I):
+        ours = truth["turnovers"]
+        theirs = truth["opponent_turnovers"]
+        cond = ours > theirs
+        issues.append({"claim": "more turnovers than opponents", "truth": f"{ours} vs {theirs}", "correct": cond})
+
+    if re.search(r"better free position", text, re.I):
+        # compare made/attempt rate
+        ours = truth["free_position_made"] / truth["free_position_att"]
+        theirs = truth["opponent_free_position_made"] / truth["opponent_free_position_att"]
+        cond = ours > theirs
+        issues.append({"claim": "better free position rate", "truth": f"{ours:.3f} vs {theirs:.3f}", "correct": cond})
+
+    # Flag naked numeric hallucinations > 400 when talking about shots (since total attempts 716 for team)
+    if re.search(r"shot", text, re.I):
+        for num, ctx in extract_numbers(text):
+            if num > 1000:
+                issues.append({"claim": f"suspicious large number {num}", "context": ctx, "correct": False})
+
+    return issues
+
+def timed(fn, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def checkers(truth):
+    from claim_rules import ClaimChecker, load_rules
+    spec = load_rules()
+    ported = dict(spec, rules=[r for r in spec["rules"] if r["id"] in BASELINE_RULES])
+    return ClaimChecker(truth, ported), ClaimChecker(truth, spec)
+
+def main(args):
+    with open(args.truth_json) as f:
+        truth = json.load(f)
+    texts = [r["response"] for r in ResponseSynth().records(args.n, seed=args.seed)]
+    ported, full = checkers(truth)
+    print(f"{len(texts)} responses, {sum(map(len, texts)) / 1e6:.1f}M characters")
+
+    t_base = timed(lambda t: baseline_check(t, truth), texts, args.repeat)
+    t_ported = timed(ported.check, texts, args.repeat)
+    t_full = timed(full.check, texts, args.repeat)
+    print(f"{'checker':10s} {'seconds':>8s} {'us/resp':>8s} {'vs base':>8s}")
+    for name, t in (("baseline", t_base), ("rules(3)", t_ported), (f"rules({len(full.rules)})", t_full)):
+        print(f"{name:10s} {t:8.3f} {t / len(texts) * 1e6:8.1f} {t_base / t:7.2f}x")
+    speedup = t_base / t_ported
+    if speedup < args.target:
+        sys.exit(f"claim check throughput failed:\n  rules(3) is {speedup:.2f}x the baseline, "
+                 f"below the {args.target:g}x target")
+    print(f"rules(3) is {speedup:.2f}x the baseline throughput (target {args.target:g}x)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time ClaimChecker against the original inline claim checks")
+    ap.add_argument("--n", type=int, default=20000, help="responses in the generated corpus")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--truth_json", default=os.path.join(ROOT, "su_stats_excerpt.json"))
+    ap.add_argument("--repeat", type=int, default=3, help="runs per checker (the fastest is kept)")
+    ap.add_argument("--target", type=float, default=1.0, help="minimum rules(3) throughput relative to the baseline")
+    args = ap.parse_args()
+    main(args)
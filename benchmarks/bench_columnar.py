@@ -0,0 +1,60 @@
+import argparse, json, os, sys, tempfile, time
+
+# JSONL vs columnar store: file size, and time to get the per-record feature
+# table that analysis needs (parse + extract from JSONL, vs a projected,
+# memory-mapped Parquet read of the stored feature columns).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_parallel import build_corpus
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main(args):
+    import pandas as pd
+    import columnar
+    from features import extract_frame, POS_WORDS_PHASE3, NEG_WORDS_PHASE3
+
+    tmp = tempfile.mkdtemp(prefix="bench_columnar_")
+    jsonl = os.path.join(tmp, "corpus.jsonl")
+    build_corpus(jsonl, args.n)
+    t_conv, _ = timed(lambda: columnar.convert([jsonl], os.path.join(tmp, "features.parquet")), repeat=1)
+    columnar.convert([jsonl], os.path.join(tmp, "raw.parquet"), with_features=False)
+
+    def from_jsonl():
+        with open(jsonl, encoding="utf-8") as f:
+            df = pd.DataFrame([json.loads(l) for l in f if l.strip()])
+        return extract_frame(df["response"], POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+
+    def from_parquet(name, cols):
+        return lambda: columnar.read_columns(os.path.join(tmp, name), cols)
+
+    feature_cols = ["hypothesis_id", "condition", "sentiment_phase3", "recommended_player",
+                    "strategy_axis", "scope_axis"] + columnar.MENTION_COLS
+    rows = [
+        ("jsonl", jsonl, from_jsonl),
+        ("parquet (responses only)", os.path.join(tmp, "raw.parquet"),
+         lambda: extract_frame(columnar.read_columns(os.path.join(tmp, "raw.parquet"), ["response"])["response"],
+                               POS_WORDS_PHASE3, NEG_WORDS_PHASE3)),
+        ("parquet (stored features)", os.path.join(tmp, "features.parquet"),
+         from_parquet("features.parquet", feature_cols)),
+    ]
+    print(f"{args.n} responses; conversion with features took {t_conv:.2f}s")
+    print(f"{'store':28s} {'size MB':>9s} {'feature table s':>16s}")
+    for name, path, fn in rows:
+        t, _ = timed(fn)
+        print(f"{name:28s} {os.path.getsize(path) / 1e6:9.1f} {t:16.3f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    args = ap.parse_args()
+    main(args)
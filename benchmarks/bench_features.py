@@ -0,0 +1,142 @@
+import argparse, json, os, re, sys, tempfile, time
+
+# Feature extraction against the heuristics it replaced. reference_loop() is
+# the per-record loop analyze_script ran before features.py, kept as it was
+# (df.iterrows(), lexicon sets rebuilt per call, one re.findall per player, an
+# uncompiled recommendation regex per player), so the speedup is measured
+# against what the pipeline used to do. On a corpus.py corpus plus a few
+# non-ASCII responses (which features.py routes to its scalar scan):
+#   reference      the original loop
+#   extract_frame  features.extract_frame over the response column
+#   scalar         features.extract_features per response
+# Both features.py paths must reproduce the reference exactly, and
+# extract_frame must be at least --target times faster; otherwise the run
+# fails.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from corpus import write_corpus
+
+PLAYERS = ["Player A", "Player B", "Player C"]
+COLS = ["sentiment", "strategy_axis", "scope_axis", "recommended_player"] + \
+       [f"mentions_{p.replace(' ', '')}" for p in PLAYERS]
+NON_ASCII = ["İİİ risk Player A should", "Ünder pressure, Player B should focus on strong defense",
+             "PLAYER C recommend — growth potential", "Kelvin K team Player A weak"]
+
+def sentiment_score(text: str) -> float:
+    POS = set("excellent strong promising opportunity improve growth effective efficient advantage breakthrough edge positive potential".split())
+    NEG = set("poor weak struggling concern risk problem issue ineffective inefficient disadvantage stall negative".split())
+    toks = re.findall(r"[a-zA-Z']+", text.lower())
+    if not toks: return 0.0
+    pos = sum(1 for t in toks if t in POS)
+    neg = sum(1 for t in toks if t in NEG)
+    return (pos - neg) / max(1, len(toks))
+
+def extract_mentions(text: str):
+    return {p: len(re.findall(p, text)) for p in PLAYERS}
+
+def classify_strategy(text: str):
+    t = text.lower()
+    off_kw = ["goal","assist","finish","attack","shot","sog","offense","offensive","scoring","possession time"]
+    def_kw = ["defense","defensive","turnover","clear","ride","ground ball","gb","save","stops","pressure"]
+    off = any(k in t for k in off_kw); de = any(k in t for k in def_kw)
+    if off and de: strat = "mixed"
+    elif off: strat = "offensive"
+    elif de: strat = "defensive"
+    else: strat = "other"
+    ind_kw = ["player a","player b","player c","individual","one-on-one","targeted coaching","coaching on"]
+    team_kw = ["team","system","scheme","drills","unit","transition","set plays","collective"]
+    ind = any(k in t for k in ind_kw); tm = any(k in t for k in team_kw)
+    if ind and tm: scope = "mixed"
+    elif ind: scope = "individual"
+    elif tm: scope = "team"
+    else: scope = "other"
+    return strat, scope
+
+def reference_loop(df):
+    import pandas as pd
+    rows = []
+    for _, r in df.iterrows():
+        text = r["response"]
+        sent = sentiment_score(text)
+        mentions = extract_mentions(text)
+        strat, scope = classify_strategy(text)
+        recp = None
+        for p in PLAYERS:
+            if re.search(p + r".{0,40}(should|recommend|priorit|coaching|focus)", text, re.I):
+                recp = p; break
+        if not recp:
+            recp = max(mentions, key=mentions.get)
+        rows.append({
+            "hypothesis_id": r["hypothesis_id"],
+            "condition": r["condition"],
+            "sentiment": sent,
+            "strategy_axis": strat,
+            "scope_axis": scope,
+            "recommended_player": recp,
+            **{f"mentions_{p.replace(' ','')}": mentions[p] for p in PLAYERS}
+        })
+    return pd.DataFrame(rows)
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def mismatches(got, want):
+    # columns whose values differ anywhere, with the first differing row
+    bad = {}
+    for col in COLS:
+        diff = (got[col].to_numpy() != want[col].to_numpy()).nonzero()[0]
+        if len(diff):
+            i = diff[0]
+            bad[col] = f"{len(diff)} rows, e.g. row {i}: {got[col].iloc[i]!r} != {want[col].iloc[i]!r}"
+    return bad
+
+def main(args):
+    import pandas as pd
+    from features import extract_frame, extract_features, POS_WORDS_PHASE3, NEG_WORDS_PHASE3
+
+    path = args.corpus or write_corpus(os.path.join(tempfile.mkdtemp(prefix="bench_features_"), "corpus.jsonl"),
+                                       args.n, seed=args.seed)
+    with open(path, encoding="utf-8") as f:
+        df = pd.DataFrame([json.loads(l) for l in f if l.strip()])
+    extra = pd.DataFrame({"hypothesis_id": "H1", "condition": "neutral", "response": NON_ASCII})
+    df = pd.concat([df, extra], ignore_index=True)
+    texts = df["response"]
+    print(f"{len(df)} responses, {texts.str.len().sum() / 1e6:.1f}M characters")
+
+    t_ref, ref = timed(lambda: reference_loop(df), 1)
+    extract_frame(texts.head(10), POS_WORDS_PHASE3, NEG_WORDS_PHASE3)  # imports, regex compilation
+    t_frame, frame = timed(lambda: extract_frame(texts, POS_WORDS_PHASE3, NEG_WORDS_PHASE3), args.repeat)
+    t_scalar, scalar = timed(lambda: pd.DataFrame([extract_features(t, POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+                                                    for t in texts]), 1)
+
+    bad = []
+    print(f"{'path':14s} {'seconds':>8s} {'us/resp':>8s} {'speedup':>8s}")
+    for name, t, out in (("reference", t_ref, ref), ("extract_frame", t_frame, frame), ("scalar", t_scalar, scalar)):
+        print(f"{name:14s} {t:8.3f} {t / len(df) * 1e6:8.1f} {t_ref / t:7.1f}x")
+        for col, what in mismatches(out.reset_index(drop=True), ref).items():
+            bad.append(f"{name} {col}: {what}")
+    speedup = t_ref / t_frame
+    if speedup < args.target:
+        bad.append(f"extract_frame is {speedup:.1f}x the reference, below the {args.target:g}x target")
+    if bad:
+        sys.exit("feature extraction check failed:\n  " + "\n  ".join(bad))
+    print(f"extract_frame matches the reference and is {speedup:.1f}x faster (target {args.target:g}x)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time features.py against the original per-record heuristics")
+    ap.add_argument("--n", type=int, default=50000, help="responses in the generated corpus")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--corpus", default="", help="existing JSONL results to use instead of a generated corpus")
+    ap.add_argument("--repeat", type=int, default=3, help="extract_frame runs (the fastest is kept)")
+    ap.add_argument("--target", type=float, default=10.0, help="minimum speedup of extract_frame over the reference")
+    args = ap.parse_args()
+    main(args)
@@ -0,0 +1,65 @@
+import argparse, json, os, random, subprocess, sys, tempfile, time, filecmp
+
+# Scaling benchmark for --workers: builds a corpus by resampling the sample
+# responses, runs analyze_bias / analyze_script / validate_claims with 1..N
+# workers, and checks every run's outputs against the serial run byte-for-byte.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def build_corpus(path, n, seed=0):
+    with open(os.path.join(ROOT, "20251101_195759_chatgpt.jsonl"), encoding="utf-8") as f:
+        base = [json.loads(l) for l in f if l.strip()]
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(n):
+            r = dict(rng.choice(base))
+            words = r["response"].split(" ")
+            rng.shuffle(words)
+            r["response"] = " ".join(words)
+            f.write(json.dumps(r) + "\n")
+
+def run(cmd):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable] + cmd, check=True, cwd=ROOT, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+def same_dir(a, b):
+    cmp = filecmp.dircmp(a, b)
+    return not (cmp.diff_files or cmp.left_only or cmp.right_only)
+
+def main(args):
+    tmp = tempfile.mkdtemp(prefix="bench_parallel_")
+    res = os.path.join(tmp, "results")
+    os.makedirs(res)
+    corpus = os.path.join(res, "corpus.jsonl")
+    build_corpus(corpus, args.n)
+    truth = os.path.join(ROOT, "su_stats_excerpt.json")
+    counts = sorted({1, *range(2, args.max_workers + 1, 2), args.max_workers})
+
+    stages = {
+        "analyze_bias": lambda w, out: ["analyze_bias.py", "--results_dir", res, "--outdir", out,
+                                        "--stream", "--workers", str(w)],
+        "analyze_script": lambda w, out: ["analyze_script.py", "--results", corpus, "--outdir", out,
+                                          "--stream", "--workers", str(w)],
+        "validate_claims": lambda w, out: ["validate_claims.py", "--truth_json", truth, "--results_dir", res,
+                                           "--out", os.path.join(out, "claims_validation.json"), "--workers", str(w)],
+    }
+    print(f"{args.n} responses, corpus {os.path.getsize(corpus) / 1e6:.1f} MB")
+    for name, cmd in stages.items():
+        base_t = None
+        for w in counts:
+            out = os.path.join(tmp, f"{name}_{w}")
+            os.makedirs(out)
+            t = run(cmd(w, out))
+            base_t = base_t or t
+            ok = same_dir(os.path.join(tmp, f"{name}_1"), out)
+            print(f"{name:16s} workers={w:<3d} {t:7.2f}s  speedup {base_t / t:4.2f}x  identical={ok}")
+            if not ok:
+                sys.exit(f"{name}: output with {w} workers differs from serial run")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000, help="responses in the synthetic corpus")
+    ap.add_argument("--max_workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+    main(args)
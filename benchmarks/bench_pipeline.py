@@ -0,0 +1,189 @@
+import argparse, json, os, platform, pstats, shutil, subprocess, sys, tempfile, time
+
+# End-to-end pipeline benchmark. For each corpus size, generates a synthetic
+# corpus (corpus.py) and runs every stage as its own process:
+#   collect          run_experiment --provider mock on a manifest of ~n cells
+#   analyze_bias     phase-2 bias tests
+#   validate_claims  claim checks (writes the report analyze_script reads)
+#   analyze_script   phase-3 analysis
+#   visualizations   figures from the analysis CSVs
+# recording wall time, throughput and peak RSS per stage, and with --profile
+# the top functions by own time (from a second, cProfile'd run). Results are
+# compared against a stored baseline; any stage slower or larger than the
+# baseline by more than --tolerance fails the run.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from corpus import write_corpus, write_manifest
+
+STAGES = ["collect", "analyze_bias", "validate_claims", "analyze_script", "visualizations"]
+BASELINE = os.path.join(HERE, "baseline.json")
+# absolute slack on top of --tolerance, so sub-second stages do not flap
+SLACK_SECONDS = 0.25
+SLACK_RSS_MB = 16
+
+def stage_commands(work, corpus, analysis, args):
+    res = os.path.dirname(corpus)
+    extra = ["--stream"] if args.stream else []
+    if args.workers > 1:
+        extra += ["--workers", str(args.workers)]
+    return {
+        "collect": (["run_experiment.py", "--manifest", os.path.join(work, "manifest.json"),
+                     "--outdir", os.path.join(work, "collected"), "--provider", "mock"], ROOT),
+        "analyze_bias": (["analyze_bias.py", "--results_dir", res, "--outdir", analysis] + extra, ROOT),
+        "validate_claims": (["validate_claims.py", "--truth_json", os.path.join(ROOT, "su_stats_excerpt.json"),
+                             "--results_dir", res, "--out", os.path.join(analysis, "claims_validation.json")]
+                            + (["--workers", str(args.workers)] if args.workers > 1 else []), ROOT),
+        "analyze_script": (["analyze_script.py", "--results", corpus, "--outdir", analysis] + extra, ROOT),
+        # reads the CSVs from, and writes the figures to, its working directory
+        "visualizations": ([os.path.join(ROOT, "visualizations.py")], analysis),
+    }
+
+def run_stage(cmd, cwd, log):
+    # wall time and the child's own peak RSS (wait4 rusage, where available)
+    env = dict(os.environ, MPLBACKEND="Agg")
+    t0 = time.perf_counter()
+    with open(log, "w") as err:
+        p = subprocess.Popen([sys.executable] + cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=err)
+        if hasattr(os, "wait4"):
+            _, status, ru = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            rss = ru.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        else:
+            p.wait()
+            rss = None
+    elapsed = time.perf_counter() - t0
+    if p.returncode != 0:
+        with open(log) as f:
+            tail = f.read()[-2000:]
+        raise RuntimeError(f"{' '.join(cmd)} exited with {p.returncode}:\n{tail}")
+    return elapsed, rss
+
+def hot_spots(prof, top):
+    stats = pstats.Stats(prof)
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]
+    out = []
+    for (path, line, func), (cc, nc, tt, ct, _) in rows:
+        where = os.path.relpath(path, ROOT) if path.startswith(ROOT) else os.path.basename(path) or path
+        out.append({"function": f"{where}:{line}({func})", "calls": nc,
+                    "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+    return out
+
+def bench_size(n, args):
+    work = tempfile.mkdtemp(prefix=f"bench_pipeline_{n}_", dir=args.workdir or None)
+    corpus = os.path.join(work, "results", "corpus.jsonl")
+    analysis = os.path.join(work, "analysis")
+    os.makedirs(analysis)
+    t0 = time.perf_counter()
+    write_corpus(corpus, n, args.seed, args.min_words, args.max_words)
+    print(f"n={n}: corpus {os.path.getsize(corpus) / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s ({work})")
+    n_collect = write_manifest(os.path.join(work, "manifest.json"), min(n, args.collect_max))
+
+    results = {}
+    commands = stage_commands(work, corpus, analysis, args)
+    for stage in args.stages:
+        cmd, cwd = commands[stage]
+        records = n_collect if stage == "collect" else n
+        secs, rss = run_stage(cmd, cwd, os.path.join(work, f"{stage}.log"))
+        row = {"records": records, "seconds": round(secs, 3),
+               "records_per_s": round(records / secs, 1),
+               "peak_rss_mb": round(rss, 1) if rss is not None else None}
+        if args.profile:
+            prof = os.path.join(work, f"{stage}.prof")
+            run_stage(["-m", "cProfile", "-o", prof] + cmd, cwd, os.path.join(work, f"{stage}.prof.log"))
+            row["hot_spots"] = hot_spots(prof, args.top)
+        results[stage] = row
+        print(f"  {stage:16s} {secs:8.2f}s  {row['records_per_s']:>10.0f} rec/s  "
+              f"peak RSS {row['peak_rss_mb'] if rss is not None else 'n/a'} MB")
+        for h in row.get("hot_spots", []):
+            print(f"      {h['tottime']:8.3f}s  {h['function']}")
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    # -> (regressions as (size, stage, metric, baseline value, current value),
+    #     (size, stage) pairs without a baseline entry)
+    bad, missing = [], []
+    for size, stages in results.items():
+        for stage, row in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                missing.append((size, stage))
+                continue
+            if row["seconds"] > base["seconds"] * (1 + tolerance) + SLACK_SECONDS:
+                bad.append((size, stage, "seconds", base["seconds"], row["seconds"]))
+            if row["peak_rss_mb"] and base.get("peak_rss_mb") and \
+                    row["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance) + SLACK_RSS_MB:
+                bad.append((size, stage, "peak_rss_mb", base["peak_rss_mb"], row["peak_rss_mb"]))
+    return bad, missing
+
+def main(args):
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = {str(n): bench_size(n, args) for n in sizes}
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {"stream": args.stream, "workers": args.workers, "min_words": args.min_words,
+                   "max_words": args.max_words, "seed": args.seed},
+        "results": results,
+    }
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        for stages in results.values():
+            for row in stages.values():
+                row.pop("hot_spots", None)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update_baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print(f"warning: baseline config {baseline.get('config')} differs from this run")
+    bad, missing = compare(results, baseline["results"], args.tolerance)
+    for size, stage, metric, old, new in bad:
+        print(f"REGRESSION n={size} {stage} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    for size, stage in missing:
+        print(f"NO BASELINE n={size} {stage}: not compared")
+    if bad:
+        sys.exit(f"{len(bad)} regression(s) beyond {args.tolerance:.0%} of {args.baseline}")
+    n_stages = sum(len(stages) for stages in results.values())
+    if len(missing) == n_stages:
+        sys.exit(f"nothing compared: {args.baseline} has none of sizes {', '.join(results)}; "
+                 "run with --update_baseline to record them")
+    note = f" ({len(missing)} of {n_stages} stages had no baseline)" if missing else ""
+    print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}{note}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time every pipeline stage on synthetic corpora")
+    ap.add_argument("--sizes", default="10000", help="comma-separated corpus sizes, e.g. 10000,1000000,10000000")
+    ap.add_argument("--stages", default=",".join(STAGES), type=lambda s: s.split(","))
+    ap.add_argument("--min_words", type=int, default=40, help="shortest synthetic response, in words")
+    ap.add_argument("--max_words", type=int, default=120, help="longest synthetic response, in words")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--collect_max", type=int, default=20000, help="cap on mock calls in the collect stage")
+    ap.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True,
+                    help="run analysis in bounded-memory --stream mode (needed for multi-million corpora)")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--profile", action="store_true", help="also record per-function hot spots (second run)")
+    ap.add_argument("--top", type=int, default=10, help="hot spots reported per stage")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update_baseline", action="store_true", help="store this run as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / growth vs baseline")
+    ap.add_argument("--report", default="", help="write the full results (incl. hot spots) as JSON")
+    ap.add_argument("--workdir", default="", help="where corpora are generated (default: system temp)")
+    ap.add_argument("--keep", action="store_true", help="keep generated corpora and stage logs")
+    args = ap.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    main(args)
@@ -0,0 +1,97 @@
+import argparse, json, os, platform, statistics, subprocess, sys, time
+
+# Cold-start benchmark for the unified CLI (python -m scripts). For every
+# command, `python -m scripts <command> --help` runs in a fresh interpreter
+# --repeat times: that is the fixed cost every short job (a shard, a
+# validation run) pays before doing any work. Reported per command:
+#   seconds   median wall time
+#   overhead  median minus the median of a bare `python -c pass`
+#   heavy     heavy libraries imported anyway (from -X importtime)
+#   top       slowest imports by cumulative time, beyond the bare interpreter's
+# A command fails when its overhead exceeds its budget in startup_budget.json
+# (plus --slack), or when it imports any of HEAVY just to parse arguments.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from scripts.cli import COMMANDS
+
+BUDGET = os.path.join(HERE, "startup_budget.json")
+HEAVY = ["pandas", "numpy", "scipy", "matplotlib", "tqdm", "pyarrow", "openai", "anthropic", "httpx"]
+
+def wall(cmd, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+def imports(cmd):
+    # (module, cumulative seconds) of every import, from -X importtime
+    p = subprocess.run([sys.executable, "-X", "importtime"] + cmd, cwd=ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE, text=True, check=True)
+    out = []
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        out.append((name.strip(), int(cum) / 1e6))
+    return out
+
+def bench(command, args, bare, bare_mods):
+    cmd = ["-m", "scripts"] + ([command] if command else []) + ["--help"]
+    secs = wall(cmd, args.repeat)
+    mods = [m for m in imports(cmd) if m[0] not in bare_mods]
+    heavy = sorted({m.split(".")[0] for m, _ in mods if m.split(".")[0] in HEAVY})
+    top = sorted(mods, key=lambda m: m[1], reverse=True)[:args.top]
+    return {"seconds": round(secs, 4), "overhead": round(secs - bare, 4), "heavy": heavy,
+            "top": [{"module": m, "cumulative_s": round(s, 4)} for m, s in top]}
+
+def main(args):
+    bare = wall(["-c", "pass"], args.repeat)
+    bare_mods = {m for m, _ in imports(["-c", "pass"])}
+    print(f"bare interpreter: {bare * 1000:.0f} ms")
+    with open(args.budget) as f:
+        budget = json.load(f)["overhead_ms"]
+    results, bad = {}, []
+    for command in args.commands:
+        row = results[command] = bench(command, args, bare, bare_mods)
+        limit = budget.get(command, budget["default"])
+        over = row["overhead"] * 1000 > limit + args.slack
+        print(f"  {command or '(usage)':10s} {row['seconds'] * 1000:6.0f} ms  +{row['overhead'] * 1000:4.0f} ms "
+              f"(budget {limit} ms){'  OVER BUDGET' if over else ''}"
+              f"{'  heavy: ' + ', '.join(row['heavy']) if row['heavy'] else ''}")
+        if args.verbose:
+            for t in row["top"]:
+                print(f"      {t['cumulative_s'] * 1000:7.1f} ms  {t['module']}")
+        if over:
+            bad.append(f"{command}: +{row['overhead'] * 1000:.0f} ms > {limit} ms")
+        if row["heavy"]:
+            bad.append(f"{command}: imports {', '.join(row['heavy'])} at startup")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                   "cpus": os.cpu_count()},
+                       "bare_seconds": round(bare, 4), "results": results}, f, indent=2)
+    if bad:
+        sys.exit("startup budget exceeded:\n  " + "\n  ".join(bad))
+    print(f"All commands within {args.budget}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time cold start of every python -m scripts command")
+    ap.add_argument("--commands", default=",".join([""] + list(COMMANDS)), type=lambda s: s.split(","),
+                    help="comma-separated commands (an empty entry times the bare usage message)")
+    ap.add_argument("--repeat", type=int, default=7, help="fresh interpreters per command (median is kept)")
+    ap.add_argument("--budget", default=BUDGET)
+    ap.add_argument("--slack", type=float, default=20.0, help="ms of noise allowed on top of each budget")
+    ap.add_argument("--top", type=int, default=5, help="slowest imports recorded per command")
+    ap.add_argument("--verbose", action="store_true", help="print the slowest imports of each command")
+    ap.add_argument("--report", default="", help="write the full results as JSON")
+    args = ap.parse_args()
+    unknown = set(args.commands) - set(COMMANDS) - {""}
+    if unknown:
+        ap.error(f"unknown commands: {', '.join(sorted(unknown))}")
+    main(args)
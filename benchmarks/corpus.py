@@ -0,0 +1,140 @@
+import argparse, json, os, random, re, sys
+
+# Synthetic response corpora for benchmarks. Records have the same shape as
+# run_experiment output; prompts come from prompt_instances.json and responses
+# are assembled from the prompt's data block (prompt_templates.json), the
+# players (players_synthetic.json), the analysis lexicons and strategy
+# keywords. Conditions lean differently (tone, recommended player) so the
+# bias tests see realistic signal, and a fraction of stated numbers is
+# perturbed so claim validation has something to find. Deterministic per seed
+# and streamed, so 10M-record corpora need no more memory than 10k ones.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from features import POS_WORDS_PHASE3, NEG_WORDS_PHASE3, OFF_KW, DEF_KW, IND_KW, TEAM_KW
+from response_cache import prompt_digest
+
+MODELS = {"openai": "gpt-4o-mini", "anthropic": "claude-3-5-sonnet", "gemini": "gemini-1.5-pro"}
+STAT_LINE_RE = re.compile(r"^- ([^:]+): (.+)$")
+NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+FILLER = ("the data suggest that consistent execution across possessions matters more than any single "
+          "metric and coaches should weigh context before acting on these numbers").split()
+
+# condition -> (tone toward positive words, favoured player index or None)
+LEANS = {
+    "negative": (0.25, 0), "positive": (0.75, 1), "with_demo": (0.5, 1), "no_demo": (0.5, 0),
+    "negative_frame": (0.2, None), "positive_frame": (0.8, None), "primed_hypothesis": (0.65, None),
+    "broad": (0.55, None), "checklist": (0.5, None), "neutral": (0.5, None),
+}
+
+def _load(name):
+    with open(os.path.join(ROOT, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class ResponseSynth:
+    def __init__(self, min_words=40, max_words=120, fabrication_rate=0.1):
+        tpl, self.instances, players = (_load(n) for n in
+                                        ("prompt_templates.json", "prompt_instances.json", "players_synthetic.json"))
+        self.cells = [(hid, cond, prompt) for hid, conds in self.instances.items() for cond, prompt in conds.items()]
+        self.stats = [m.groups() for m in map(STAT_LINE_RE.match, tpl["base_data_block"].splitlines()) if m]
+        self.players = players
+        self.pos, self.neg = sorted(POS_WORDS_PHASE3), sorted(NEG_WORDS_PHASE3)
+        self.min_words, self.max_words = min_words, max_words
+        self.fabrication_rate = fabrication_rate
+
+    def _numbers(self, rng, value):
+        if rng.random() >= self.fabrication_rate:
+            return value
+        # inflate or deflate every number in the line: a fabricated claim
+        f = rng.choice([0.5, 0.8, 1.25, 2.0])
+        return NUM_RE.sub(lambda m: f"{float(m.group()) * f:.{len(m.group().partition('.')[2])}f}", value)
+
+    def _sentence(self, rng, cond):
+        tone = LEANS.get(cond, (0.5, None))[0]
+        kind = rng.random()
+        if kind < 0.3:
+            label, value = rng.choice(self.stats)
+            return f"{label}: {self._numbers(rng, value)}."
+        if kind < 0.55:
+            words = [rng.choice(self.pos if rng.random() < tone else self.neg) for _ in range(rng.randint(1, 3))]
+            return f"The team shows {' and '.join(words)} signs in this stretch."
+        if kind < 0.75:
+            p = self.players[rng.randrange(len(self.players))]
+            return f"{p['id']} has {p['goals']} goals with {p['turnovers']} turnovers."
+        axis = rng.choice([OFF_KW + DEF_KW, IND_KW + TEAM_KW])
+        return f"Emphasize {rng.choice(axis)} in practice."
+
+    def response(self, rng, cond):
+        tone, fav = LEANS.get(cond, (0.5, None))
+        idx = fav if fav is not None and rng.random() < 0.6 else rng.randrange(len(self.players))
+        parts = [f"{self.players[idx]['id']} should receive targeted coaching."]
+        target = rng.randint(self.min_words, self.max_words)
+        n = len(parts[0].split())
+        while n < target:
+            s = self._sentence(rng, cond) if rng.random() < 0.8 else " ".join(rng.sample(FILLER, 8)) + "."
+            parts.append(s)
+            n += len(s.split())
+        return " ".join(parts)
+
+    def records(self, n, seed=0):
+        rng = random.Random(seed)
+        providers = list(MODELS)
+        digests = {p: prompt_digest(p) for _, _, p in self.cells}
+        for i in range(n):
+            hid, cond, prompt = self.cells[i % len(self.cells)]
+            provider = providers[(i // len(self.cells)) % len(providers)]
+            yield {
+                "timestamp": f"2025-01-01T00:00:00.{i % 1000000:06d}Z",
+                "provider": provider,
+                "model": MODELS[provider],
+                "seed": i,
+                "hypothesis_id": hid,
+                "condition": cond,
+                "prompt_hash": digests[prompt],
+                "prompt": prompt,
+                "response": self.response(rng, cond),
+            }
+
+def write_corpus(path, n, seed=0, min_words=40, max_words=120, fabrication_rate=0.1, batch=10000):
+    synth = ResponseSynth(min_words, max_words, fabrication_rate)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        buf = []
+        for rec in synth.records(n, seed):
+            buf.append(json.dumps(rec))
+            if len(buf) >= batch:
+                f.write("\n".join(buf) + "\n")
+                buf = []
+        if buf:
+            f.write("\n".join(buf) + "\n")
+    return path
+
+def write_manifest(path, n_responses, n_samples=1):
+    # run_experiment manifest (experiment_design format) sized to ~n_responses
+    instances = _load("prompt_instances.json")
+    rows = [(hid, cond, p) for hid, conds in instances.items() for cond, p in conds.items()]
+    n_seeds = max(1, -(-n_responses // (len(rows) * len(MODELS) * n_samples)))
+    manifest = {
+        "created_at": "2025-01-01T00:00:00Z",
+        "models": list(MODELS.values()),
+        "temperature": 0.7,
+        "n_samples_per_prompt": n_samples,
+        "prompts": [{"hypothesis_id": h, "condition": c, "prompt": p, "seed": s}
+                    for h, c, p in rows for s in range(n_seeds)],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return len(manifest["prompts"]) * len(MODELS) * n_samples
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write a synthetic response corpus (JSONL)")
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--out", default="bench_data/corpus.jsonl")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--min_words", type=int, default=40)
+    ap.add_argument("--max_words", type=int, default=120)
+    ap.add_argument("--fabrication_rate", type=float, default=0.1, help="share of stat lines with perturbed numbers")
+    args = ap.parse_args()
+    write_corpus(args.out, args.n, args.seed, args.min_words, args.max_words, args.fabrication_rate)
+    print(f"Wrote {args.n} responses to {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
@@ -0,0 +1,248 @@
+import hashlib, itertools, json, operator, os, re
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Data-driven claim checks for validate_claims. Rules live in scripts/claim_rules.json:
+# each declares trigger keywords, a regex (with shared {placeholders}) and the
+# truth fields it is checked against. All rule keywords go into one compiled
+# alternation, so a response is scanned once (by the regex engine) whatever the
+# number of rules; only the rules whose keywords occur run their own regex, and
+# only over windows around the keyword hits. Patterns must have a bounded
+# match width (no .* or +; use {m,n} gaps), which also bounds the windows, and
+# a rule's keywords must occur in every match of its pattern.
+#
+# Rule kinds:
+#   compare  the text asserts a relation between two truth values
+#            (left <op> right); reported with both values
+#   value    the text states a number (and optionally the opponent's after
+#            "vs"/"opp"/"/"); each stated number is checked against its truth
+#            value within `tolerance`
+#   outlier  the text mentions the keyword; every number above `threshold` is
+#            flagged as implausible
+
+# shipped as package data of scripts/, so it is found in installed copies too
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "claim_rules.json")
+
+NUMBER_RE = re.compile(r"(-?\d+\.?\d*)")
+MAX_WIDTH = 400  # longest match a rule pattern may have, in characters
+LOOKAROUND = 32  # room past a window for lookahead assertions
+OPS = {">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le, "==": operator.eq}
+CLAUSE_ENDS = ["\n", ". ", "; ", "! ", "? "]
+
+def extract_numbers(text):
+    # returns list of (number, context window)
+    nums = []
+    for m in NUMBER_RE.finditer(text):
+        start = max(0, m.start()-20)
+        end = min(len(text), m.end()+20)
+        nums.append((float(m.group(1)), text[start:end]))
+    return nums
+
+def load_rules(path=DEFAULT_RULES):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def parse_number(raw: str, percent=False) -> float:
+    s = raw.replace(",", "").replace(" ", "")
+    if s.endswith("%"):
+        return float(s[:-1]) / 100
+    v = float(s)
+    # rates may be written as fractions (0.729) or percentages (72.9)
+    return v / 100 if percent and abs(v) > 1 else v
+
+def _fields(expr):
+    if isinstance(expr, str):
+        return [expr]
+    for op in ("ratio", "diff"):
+        if op in expr:
+            return [f for e in expr[op] for f in _fields(e)]
+    raise ValueError(f"unknown truth expression {expr!r}")
+
+def _trie_pattern(words):
+    # alternation of `words` factored by common prefixes, so the engine tries
+    # one branch per character instead of every keyword; matches the longest
+    # word at each position
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    def emit(node):
+        alts = [re.escape(ch) + emit(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+    return emit(trie)
+
+def _trigger_scan(rules):
+    # one compiled alternation of every keyword. finditer reports the longest
+    # keyword at each hit; the rules triggered there are its own and those of
+    # its prefixes that are keywords too (rules_at). Keywords starting inside a
+    # hit are skipped by finditer and come from `inner`: (offset, keyword,
+    # whether it runs past the hit and must be checked against the text)
+    owners = {}
+    for i, r in enumerate(rules):
+        for k in r["keywords"]:
+            owners.setdefault(k.lower(), set()).add(i)
+    kws = sorted(owners)
+    rules_at = {k: sorted(set().union(*(owners[p] for p in kws if k.startswith(p)))) for k in kws}
+    inner = {k: [(o, k2, len(k2) > len(k) - o) for o in range(1, len(k)) for k2 in kws
+                 if k[o:].startswith(k2) or k2.startswith(k[o:])] for k in kws}
+    return re.compile(_trie_pattern(kws)), rules_at, inner, {k: sorted(v) for k, v in owners.items()}
+
+def _windows(starts, width, n):
+    # merged [lo, hi) spans around keyword start positions: a match holding a
+    # keyword that starts at s lies within s +- width
+    out = []
+    for s in starts:
+        lo, hi = max(0, s - width), min(n, s + width + 1 + LOOKAROUND)
+        if out and lo <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], hi))
+        else:
+            out.append((lo, hi))
+    return out
+
+class ClaimChecker:
+    def __init__(self, truth, rules=None):
+        spec = rules if isinstance(rules, dict) else load_rules(rules or DEFAULT_RULES)
+        self.truth = truth
+        self.aliases = {g: {k.lower(): v for k, v in a.items()} for g, a in spec.get("aliases", {}).items()}
+        self.player_re = re.compile(spec["player_marker"], re.I) if spec.get("player_marker") else None
+        self.rules = []
+        for r in spec["rules"]:
+            pat = r["pattern"]
+            for name, sub in spec.get("placeholders", {}).items():
+                pat = pat.replace("{%s}" % name, sub)
+            width = sre_parse.parse(pat, re.I).getwidth()[1]
+            if width > MAX_WIDTH:
+                raise ValueError(f"claim rule {r['id']}: pattern can match more than {MAX_WIDTH} characters; "
+                                 "use bounded gaps ({m,n}) instead of * or +")
+            if r["kind"] not in ("compare", "value", "outlier"):
+                raise ValueError(f"claim rule {r['id']}: unknown kind {r['kind']!r}")
+            if not r.get("keywords"):
+                raise ValueError(f"claim rule {r['id']}: needs at least one keyword")
+            self.rules.append(dict(r, regex=re.compile(pat, re.I), width=width))
+        ids = [r["id"] for r in self.rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("claim rule ids must be unique")
+        self.trigger_re, self.rules_at, self.inner, self.owners = _trigger_scan(self.rules)
+        self._validate()
+        payload = json.dumps([spec, truth], sort_keys=True)
+        self.version = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _validate(self):
+        # every truth field a rule can reach must exist (templated over its aliases)
+        for r in self.rules:
+            exprs = [r.get(k) for k in ("left", "right", "value", "opponent_value") if r.get(k) is not None]
+            for field in (f for e in exprs for f in _fields(e)):
+                names = re.findall(r"{(\w+)}", field)
+                choices = [sorted(set(self.aliases.get(n, {}).values())) for n in names]
+                for combo in itertools.product(*choices):
+                    try:
+                        self._lookup(field, dict(zip(names, combo)))
+                    except (KeyError, TypeError):
+                        raise ValueError(f"claim rule {r['id']}: truth has no field {field!r} {dict(zip(names, combo))}")
+
+    def _lookup(self, field, groups):
+        node = self.truth
+        for part in field.format(**groups).split("."):
+            node = node[part]
+        return node
+
+    def resolve(self, expr, groups=None):
+        groups = groups or {}
+        if isinstance(expr, str):
+            return self._lookup(expr, groups)
+        if "ratio" in expr:
+            a, b = expr["ratio"]
+            return self.resolve(a, groups) / self.resolve(b, groups)
+        a, b = expr["diff"]
+        return self.resolve(a, groups) - self.resolve(b, groups)
+
+    def _hits(self, low):
+        # {rule index: start positions of its keywords} in lowercased text
+        hits = {}
+        for m in self.trigger_re.finditer(low):
+            k, start = m.group(), m.start()
+            for i in self.rules_at[k]:
+                if i in hits:
+                    hits[i].append(start)
+                else:
+                    hits[i] = [start]
+            for o, k2, check in self.inner[k]:
+                if not check or low.startswith(k2, start + o):
+                    for i in self.owners[k2]:
+                        hits.setdefault(i, []).append(start + o)
+        return hits
+
+    def check(self, text: str):
+        issues = []
+        low = text.lower()
+        hits = self._hits(low)
+        for i in sorted(hits):
+            rule = self.rules[i]
+            if len(low) != len(text):
+                # lowercasing shifted offsets (rare non-ASCII): scan it all
+                windows = [(0, len(text))]
+            else:
+                windows = _windows(hits[i], rule["width"], len(text))
+            getattr(self, "_" + rule["kind"])(rule, text, windows, issues)
+        return issues
+
+    def _matches(self, rule, text, windows):
+        for lo, hi in windows:
+            for m in rule["regex"].finditer(text, lo, hi):
+                # lookaheads cannot see past `hi`: drop matches ending near it
+                if m.end() + LOOKAROUND < hi or hi == len(text):
+                    yield m
+
+    def _compare(self, rule, text, windows, issues):
+        if next(self._matches(rule, text, windows), None) is None:
+            return
+        ours, theirs = self.resolve(rule["left"]), self.resolve(rule["right"])
+        fmt = rule.get("format", "")
+        issues.append({"claim": rule["claim"], "truth": f"{ours:{fmt}} vs {theirs:{fmt}}",
+                       "correct": OPS[rule.get("op", ">")](ours, theirs)})
+
+    def _outlier(self, rule, text, windows, issues):
+        if next(self._matches(rule, text, windows), None) is None:
+            return
+        # as extract_numbers(), but the context is only cut for flagged numbers
+        for m in NUMBER_RE.finditer(text):
+            num = float(m.group(1))
+            if num > rule["threshold"]:
+                ctx = text[max(0, m.start() - 20):min(len(text), m.end() + 20)]
+                issues.append({"claim": f"suspicious large number {num}", "context": ctx, "correct": False})
+
+    def _about_player(self, text, pos):
+        # team-level truth: skip numbers in a clause that names a player
+        if self.player_re is None:
+            return False
+        start = max(text.rfind(sep, max(0, pos - 200), pos) for sep in CLAUSE_ENDS)
+        return bool(self.player_re.search(text, max(0, start, pos - 200), pos))
+
+    def _value(self, rule, text, windows, issues):
+        tol = rule.get("tolerance", 0)
+        for m in self._matches(rule, text, windows):
+            if self._about_player(text, m.start()):
+                continue
+            gd = m.groupdict()
+            groups = {k: self.aliases.get(k, {}).get(v.lower(), v) for k, v in gd.items()
+                      if v is not None and k not in ("value", "opp", "swap")}
+            sides = [("value", rule["value"], ""), ("opp", rule.get("opponent_value"), "opponent ")]
+            if gd.get("swap"):
+                # "opponents clear 0.932 vs 0.910": the first number is theirs
+                sides = [(sides[0][0],) + sides[1][1:], (sides[1][0],) + sides[0][1:]]
+            for group, expr, who in sides:
+                if expr is None or not gd.get(group):
+                    continue
+                stated = parse_number(gd[group], rule.get("percent", False))
+                actual = self.resolve(expr, groups)
+                issues.append({"claim": who + rule["claim"].format(**groups), "stated": stated,
+                               "truth": round(actual, 4), "context": m.group(0).strip(),
+                               "correct": abs(stated - actual) <= tol + 1e-9})
@@ -0,0 +1,183 @@
+import argparse, os, warnings
+
+import instrument
+from features import (POS_WORDS, NEG_WORDS, POS_WORDS_PHASE3, NEG_WORDS_PHASE3, MENTION_COLS,
+                      extract_frame)
+
+# Optional columnar store (Parquet via pyarrow) for responses and derived
+# features. Low-cardinality and heavily repeated columns (provider, model,
+# hypothesis_id, condition, prompt) are dictionary-encoded, so the shared
+# prompt text is stored once per row group instead of once per line. Features
+# are stored as extra columns; analysis reads only the columns it needs, from a
+# memory-mapped file.
+#
+# Every column has a fixed Arrow type (TYPES); each chunk is converted to it
+# with a clear error naming the file and column, and the store is written to a
+# temporary path that replaces `out` only once the conversion completes. The
+# feature columns are stamped with features_version() in the file metadata;
+# has_features() is False for a store stamped by other lexicons or keyword
+# lists, so readers recompute features from the responses instead.
+
+META_COLS = ["timestamp", "provider", "model", "seed", "hypothesis_id", "condition", "prompt_hash"]
+DICT_COLS = ["provider", "model", "hypothesis_id", "condition", "prompt",
+             "recommended_player", "strategy_axis", "scope_axis"]
+AXIS_COLS = ["strategy_axis", "scope_axis"]
+VERSION_KEY = b"features_version"
+
+def _types(pa):
+    # stored type of every column; DICT_COLS are dictionary-encoded strings
+    types = {c: pa.string() for c in META_COLS + ["prompt", "response"] + ["recommended_player"] + AXIS_COLS}
+    types.update({c: pa.int64() for c in ["seed", "prompt_hash"] + MENTION_COLS})
+    types.update({"sentiment": pa.float64(), "sentiment_phase3": pa.float64()})
+    return {c: pa.dictionary(pa.int32(), t) if c in DICT_COLS else t for c, t in types.items()}
+
+# stored sentiment column per lexicon: phase 2 (analyze_bias), phase 3 (analyze_script)
+SENTIMENT_COLS = {
+    (POS_WORDS, NEG_WORDS): "sentiment",
+    (POS_WORDS_PHASE3, NEG_WORDS_PHASE3): "sentiment_phase3",
+}
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("the columnar store needs pyarrow: pip install pyarrow")
+    return pa, pq
+
+def is_columnar(path: str) -> bool:
+    return path.endswith(".parquet")
+
+def sentiment_col(pos, neg):
+    return SENTIMENT_COLS.get((frozenset(pos), frozenset(neg)))
+
+def add_features(df):
+    # both lexicons' sentiment plus the shared phase-3 axes/mentions/recommendation
+    p3 = extract_frame(df["response"], POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+    df = df.assign(sentiment=extract_frame(df["response"], POS_WORDS, NEG_WORDS, axes=False)["sentiment"].to_numpy())
+    df["sentiment_phase3"] = p3["sentiment"].to_numpy()
+    for c in ["recommended_player"] + AXIS_COLS + MENTION_COLS:
+        df[c] = p3[c].to_numpy()
+    return df
+
+def features_version() -> str:
+    # the lexicons, keyword lists and patterns behind the stored feature columns
+    from feature_index import features_version as version
+    return version(POS_WORDS, NEG_WORDS) + ":" + version(POS_WORDS_PHASE3, NEG_WORDS_PHASE3)
+
+def _column(pa, values, name, typ, source):
+    # integer columns also accept decimal strings; anything else that does not
+    # fit the stored type is an error naming the file and column
+    if pa.types.is_integer(typ):
+        values = [int(v) if isinstance(v, str) and v.strip().lstrip("-").isdigit() else v for v in values]
+    try:
+        if pa.types.is_dictionary(typ):
+            return pa.array(values, type=typ.value_type, from_pandas=True).dictionary_encode()
+        return pa.array(values, type=typ, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+        raise ValueError(f"{source}: column {name!r} holds values that are not {typ} ({e})") from None
+
+def to_table(df, source=""):
+    pa, _ = _pa()
+    types = _types(pa)
+    cols = {c: _column(pa, df[c].tolist(), c, types[c], source) for c in df.columns}
+    return pa.table(cols, schema=pa.schema([(c, types[c]) for c in df.columns]))
+
+def convert(paths, out, with_features=True, chunksize=100000, row_group_size=100000):
+    # JSONL -> Parquet, streamed chunk by chunk (bounded memory); `out` is only
+    # replaced once every chunk was written
+    import pandas as pd
+    from streaming import iter_chunks
+    pa, pq = _pa()
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    tmp = out + ".tmp"
+    writer = None
+    n = 0
+    try:
+        for path in paths:
+            for chunk in iter_chunks(path, chunksize):
+                df = pd.DataFrame(chunk, columns=META_COLS + ["prompt", "response"])
+                if with_features:
+                    with instrument.stage("extract_features"):
+                        df = add_features(df)
+                with instrument.stage("write_parquet"):
+                    table = to_table(df, path)
+                    if writer is None:
+                        meta = {VERSION_KEY: features_version().encode()} if with_features else None
+                        writer = pq.ParquetWriter(tmp, table.schema.with_metadata(meta), compression="zstd")
+                    writer.write_table(table, row_group_size=row_group_size)
+                n += len(df)
+                instrument.count("records", len(df))
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp, out)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return n
+
+def _plain(df):
+    # dictionary columns arrive as Categorical; analysis groups on plain values
+    import pandas as pd
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(object)
+    return df
+
+def read_columns(path: str, columns):
+    # memory-mapped projection read; only `columns` are decoded
+    _, pq = _pa()
+    available = set(pq.ParquetFile(path).schema_arrow.names)
+    cols = [c for c in columns if c in available]
+    return _plain(pq.read_table(path, columns=cols, memory_map=True).to_pandas())
+
+def has_features(path: str, columns) -> bool:
+    # stored feature `columns` present and computed by the current lexicons and
+    # keyword lists; a stale store is read for its responses instead
+    _, pq = _pa()
+    schema = pq.ParquetFile(path).schema_arrow
+    if not set(columns) <= set(schema.names):
+        return False
+    if (schema.metadata or {}).get(VERSION_KEY) != features_version().encode():
+        warnings.warn(f"{path}: stored features come from other lexicons or keyword lists; recomputing them")
+        return False
+    return True
+
+def num_row_groups(path: str) -> int:
+    _, pq = _pa()
+    return pq.ParquetFile(path).num_row_groups
+
+def iter_frames(path: str, columns, chunksize=50000, start=0, end=None):
+    # DataFrames of `columns` for row groups [start, end)
+    _, pq = _pa()
+    pf = pq.ParquetFile(path, memory_map=True)
+    cols = [c for c in columns if c in set(pf.schema_arrow.names)]
+    groups = range(start, pf.num_row_groups if end is None else end)
+    if not len(groups):
+        return
+    for batch in pf.iter_batches(batch_size=chunksize, row_groups=list(groups), columns=cols):
+        yield _plain(batch.to_pandas())
+
+def main(args):
+    paths = sorted(os.path.join(args.results_dir, fn) for fn in os.listdir(args.results_dir)
+                   if fn.endswith(".jsonl"))
+    n = convert(paths, args.out, with_features=not args.no_features, chunksize=args.chunksize)
+    print(f"Wrote {n} responses from {len(paths)} files to {args.out}")
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog, description="Convert JSONL results to the columnar (Parquet) store")
+    ap.add_argument("--results_dir", default="results")
+    ap.add_argument("--out", default="columnar/responses.parquet",
+                    help="keep outside --results_dir so analysis does not read both copies")
+    ap.add_argument("--no_features", action="store_true", help="store responses only, no feature columns")
+    ap.add_argument("--chunksize", type=int, default=100000)
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("columnar", args)
+    main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,297 @@
+import argparse, json, os, socket, sqlite3, time
+from typing import Any, Dict
+
+import instrument
+from manifest import Manifest
+
+# Sharded collection. A SQLite work queue hands out manifest cells (by index,
+# see manifest.py) to any number of worker processes, on one host or several
+# sharing the queue file. Cells are leased in batches; a lease that is not
+# completed within --lease seconds (crashed or stalled worker) returns to the
+# queue, and a cell whose call fails is retried up to --max_attempts. Each
+# worker appends its records to its own JSONL part and records each cell's
+# part and byte offset in the queue; merge writes the canonical results file
+# in cell order, which is the order a single run_experiment run would have
+# written.
+#
+#   python coordinator.py init  --queue q.sqlite --manifest prompts/manifest.json
+#   python coordinator.py work  --queue q.sqlite --provider openai --parts_dir parts [--workers 4]
+#   python coordinator.py status --queue q.sqlite
+#   python coordinator.py merge --queue q.sqlite --parts_dir parts --out results/run.jsonl
+#
+# SQLite locking is reliable on local disks; for several hosts put the queue
+# on storage with working POSIX locks (not all NFS setups qualify).
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+class WorkQueue:
+    def __init__(self, path: str):
+        # autocommit mode: every write below runs in an explicit transaction
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS cells (
+            idx INTEGER PRIMARY KEY, state TEXT NOT NULL DEFAULT 'pending', worker TEXT,
+            lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, part TEXT, offset INTEGER, error TEXT)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cells_state ON cells (state, idx)")
+
+    def _meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def init(self, spec: Dict[str, Any], max_attempts: int = 3):
+        payload = json.dumps(spec, sort_keys=True)
+        stored = self._meta("manifest")
+        if stored is not None:
+            if stored != payload:
+                raise ValueError("queue already holds a different manifest; use a new --queue file")
+            return 0
+        n = len(Manifest(spec))
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                  [("manifest", payload), ("max_attempts", str(max_attempts))])
+            self.conn.executemany("INSERT INTO cells (idx) VALUES (?)", ((i,) for i in range(n)))
+        return n
+
+    def manifest(self) -> Manifest:
+        payload = self._meta("manifest")
+        if payload is None:
+            raise ValueError("queue is not initialized; run `coordinator.py init` first")
+        return Manifest(json.loads(payload))
+
+    @property
+    def max_attempts(self) -> int:
+        return int(self._meta("max_attempts", "3"))
+
+    def lease(self, worker: str, n: int, seconds: float):
+        # up to n cells in index order; expired leases are reclaimed first
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute("UPDATE cells SET state = ?, error = 'lease expired' "
+                              "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                              (FAILED, LEASED, now, self.max_attempts))
+            self.conn.execute("UPDATE cells SET state = ? WHERE state = ? AND lease_until < ?",
+                              (PENDING, LEASED, now))
+            idx = [i for (i,) in self.conn.execute(
+                "SELECT idx FROM cells WHERE state = ? ORDER BY idx LIMIT ?", (PENDING, n))]
+            self.conn.executemany("UPDATE cells SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                                  "WHERE idx = ?", [(LEASED, worker, now + seconds, i) for i in idx])
+        return idx
+
+    def complete(self, worker: str, results):
+        # results: (idx, part, offset, error); error is None on success. The
+        # first completion of a cell wins, also after its lease was reclaimed.
+        ok = [(worker, part, off, i) for i, part, off, err in results if err is None]
+        bad = [(err, worker, part, off, i) for i, part, off, err in results if err is not None]
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(f"UPDATE cells SET state = '{DONE}', worker = ?, part = ?, offset = ?, error = NULL "
+                                  f"WHERE idx = ? AND state NOT IN ('{DONE}', '{FAILED}')", ok)
+            # failed calls go back to the queue until max_attempts; the last
+            # error record is kept, as run_experiment keeps [ERROR] responses
+            self.conn.executemany(f"UPDATE cells SET error = ?, worker = ?, part = ?, offset = ?, "
+                                  f"state = CASE WHEN attempts >= {self.max_attempts} THEN '{FAILED}' ELSE '{PENDING}' END "
+                                  f"WHERE idx = ? AND state NOT IN ('{DONE}', '{FAILED}')", bad)
+
+    def counts(self) -> Dict[str, int]:
+        out = {s: 0 for s in (PENDING, LEASED, DONE, FAILED)}
+        out.update(self.conn.execute("SELECT state, COUNT(*) FROM cells GROUP BY state"))
+        return out
+
+    def entries(self):
+        # (idx, state, part, offset) of every finished cell with a record, in cell order
+        return self.conn.execute("SELECT idx, state, part, offset FROM cells WHERE part IS NOT NULL "
+                                 f"AND state IN ('{DONE}', '{FAILED}') ORDER BY idx")
+
+    def close(self):
+        self.conn.close()
+
+class PartWriter:
+    # this worker's JSONL part; returns the byte offset of each appended record
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.name = os.path.basename(path)
+        self.f = open(path, "ab")
+
+    def append(self, rec: Dict[str, Any]) -> int:
+        off = self.f.tell()
+        self.f.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+        return off
+
+    def flush(self):
+        # records must be on disk before the queue marks their cells done
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+def call_batch(asker, cells, temperature, limiter=None):
+    # cells: (idx, model, p, seed) -> {idx: response text}
+    out = {}
+    if limiter is None:
+        for i, model, p, seed in cells:
+            try:
+                with instrument.stage("provider_call"):
+                    out[i] = asker(model, p["prompt"], temperature, seed)
+            except Exception as e:
+                out[i] = f"[ERROR] {type(e).__name__}: {e}"
+        return out
+    from async_engine import run_cells
+
+    def on_result(model, p, seed, text):
+        out[p["_cell"]] = text
+
+    run_cells(asker, [(model, dict(p, _cell=i), seed) for i, model, p, seed in cells], temperature, limiter, on_result)
+    return out
+
+def work(args, worker: str):
+    from run_experiment import get_asker, make_record
+    from providers import configure as configure_provider
+    queue = WorkQueue(args.queue)
+    manifest = queue.manifest()
+    provider = args.provider.lower()
+    asker = get_asker(provider, args.mock_latency)
+    if provider != "mock":
+        configure_provider(provider, pool_size=max(16, args.concurrency), base_url=args.base_url or None)
+    limiter = None
+    if args.concurrency > 0:
+        from async_engine import ProviderLimiter
+        limiter = ProviderLimiter(concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+                                  max_retries=args.max_retries)
+    batch = args.batch or max(8, 2 * args.concurrency)
+    part = PartWriter(os.path.join(args.parts_dir, f"part-{worker}.jsonl"))
+    n_done = 0
+    try:
+        while True:
+            idx = queue.lease(worker, batch, args.lease)
+            if not idx:
+                c = queue.counts()
+                if not c[PENDING] and not c[LEASED]:
+                    break
+                # the rest is leased by other workers: wait for completion or expiry
+                time.sleep(args.poll)
+                continue
+            cells = [(i,) + manifest.cell(i) for i in idx]
+            texts = call_batch(asker, cells, manifest.temperature, limiter)
+            results = []
+            with instrument.stage("part_write"):
+                for i, model, p, seed in cells:
+                    text = texts[i]
+                    off = part.append(make_record(provider, model, p, seed, text))
+                    results.append((i, part.name, off, text if text.startswith("[ERROR]") else None))
+                part.flush()
+            with instrument.stage("queue_complete"):
+                queue.complete(worker, results)
+            n_errors = sum(1 for r in results if r[3] is not None)
+            instrument.count("records", len(results))
+            instrument.count("errors", n_errors)
+            n_done += len(results) - n_errors
+    finally:
+        part.close()
+        queue.close()
+    print(f"{worker}: {n_done} cells done")
+    return n_done
+
+def merge(queue_path: str, parts_dir: str, out: str, partial: bool = False):
+    queue = WorkQueue(queue_path)
+    c = queue.counts()
+    if (c[PENDING] or c[LEASED]) and not partial:
+        raise SystemExit(f"{c[PENDING]} pending and {c[LEASED]} leased cells left; "
+                         "finish the run or merge with --partial")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    handles, written = {}, {s: 0 for s in c}
+    try:
+        with open(out, "wb") as f:
+            for _, state, part, off in queue.entries():
+                if part not in handles:
+                    handles[part] = open(os.path.join(parts_dir, part), "rb")
+                src = handles[part]
+                src.seek(off)
+                line = src.readline()
+                if not line:
+                    continue  # offset past the end of a truncated part: no record
+                f.write(line)
+                written[state] += 1
+    finally:
+        for h in handles.values():
+            h.close()
+        queue.close()
+    n = sum(written.values())
+    instrument.count("records", n)
+    print(f"Merged {n} records into {out}")
+    # failed or missing cells on their own line; a cell whose lease expired
+    # max_attempts times is failed without ever writing a record
+    notes = [f"{written[FAILED]} failed cells merged with [ERROR] responses"] if written[FAILED] else []
+    missing = {s: c[s] - written[s] for s in c if c[s] > written[s]}
+    if missing:
+        notes.append("no record for " + ", ".join(f"{v} {s}" for s, v in missing.items()) + " cells")
+    if notes:
+        print("  " + "; ".join(notes))
+    return n
+
+def main(args):
+    if args.cmd == "init":
+        queue = WorkQueue(args.queue)
+        with open(args.manifest, "r", encoding="utf-8") as f:
+            n = queue.init(json.load(f), args.max_attempts)
+        print(f"Queued {n} cells in {args.queue}" if n else f"{args.queue} already initialized")
+        queue.close()
+    elif args.cmd == "status":
+        queue = WorkQueue(args.queue)
+        print(", ".join(f"{v} {k}" for k, v in queue.counts().items()))
+        queue.close()
+    elif args.cmd == "work":
+        base = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        if args.workers <= 1:
+            work(args, base)
+            return
+        # local worker processes; each opens its own queue connection
+        import multiprocessing
+        procs = [multiprocessing.Process(target=work, args=(args, f"{base}-{k}")) for k in range(args.workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    elif args.cmd == "merge":
+        merge(args.queue, args.parts_dir, args.out, args.partial)
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog, description="Sharded collection: SQLite work queue, workers, merge")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("init", help="queue every cell of a manifest")
+    p.add_argument("--queue", required=True)
+    p.add_argument("--manifest", default="prompts/manifest.json")
+    p.add_argument("--max_attempts", type=int, default=3, help="calls per cell before it is marked failed")
+    p = sub.add_parser("status", help="cell counts by state")
+    p.add_argument("--queue", required=True)
+    p = sub.add_parser("work", help="lease and run cells until the queue is drained")
+    p.add_argument("--queue", required=True)
+    p.add_argument("--parts_dir", default="parts", help="where this worker's JSONL part is appended")
+    p.add_argument("--provider", default="mock", help="openai|anthropic|gemini|mock")
+    p.add_argument("--workers", type=int, default=1, help="worker processes on this host")
+    p.add_argument("--worker_id", default="", help="default: <hostname>-<pid>")
+    p.add_argument("--batch", type=int, default=0, help="cells per lease (default: max(8, 2 x concurrency))")
+    p.add_argument("--lease", type=float, default=600.0, help="seconds before an unfinished lease is reclaimed")
+    p.add_argument("--poll", type=float, default=5.0, help="seconds between checks while others hold the rest")
+    p.add_argument("--concurrency", type=int, default=0, help="async in-flight requests per worker (0 = sequential)")
+    p.add_argument("--rpm", type=float, default=0, help="async mode: requests per minute per worker")
+    p.add_argument("--tpm", type=float, default=0, help="async mode: estimated tokens per minute per worker")
+    p.add_argument("--max_retries", type=int, default=6, help="async mode: retries with backoff when throttled")
+    p.add_argument("--base_url", default="", help="override provider endpoint")
+    p.add_argument("--mock_latency", type=float, default=0.0)
+    p = sub.add_parser("merge", help="write the canonical results file from the parts")
+    p.add_argument("--queue", required=True)
+    p.add_argument("--parts_dir", default="parts")
+    p.add_argument("--out", required=True, help="keep outside --parts_dir")
+    p.add_argument("--partial", action="store_true", help="merge even though cells are unfinished")
+    for p in sub.choices.values():
+        instrument.add_arguments(p)
+    args = ap.parse_args(argv)
+    instrument.from_args(f"coordinator_{args.cmd}", args)
+    main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -2,6 +2,8 @@
 import json, os, argparse, itertools, random
 from scripts.utils import ensure_dir, now_iso, hash_text
 
+import instrument
+
 def main(args):
     with open(args.templates, "r") as f:
         tpl = json.load(f)
@@ -9,6 +11,24 @@ def main(args):
     with open(args.instances, "r") as f:
         inst = json.load(f)
 
+    # Optionally expand by seeds to get multiple samples per prompt from each model
+    if args.seeds:
+        seeds = [int(s) for s in args.seeds.split(",")]
+    else:
+        seeds = tpl["metadata"]["random_seeds"]
+
+    if getattr(args, "compact", False):
+        # variants, the shared data block and seeds stored once (see manifest.py)
+        from manifest import compact_spec
+        manifest = compact_spec(inst, seeds, args.models.split(","), args.temperature, args.n_samples,
+                                blocks={"base": tpl.get("base_data_block", "")}, created_at=now_iso())
+        instrument.count("prompts", len(manifest["variants"]) * len(seeds))
+        ensure_dir(os.path.dirname(args.out))
+        with instrument.stage("write_manifest"), open(args.out, "w") as f:
+            json.dump(manifest, f, indent=1)
+        print(f"Wrote compact manifest with {len(manifest['variants'])} variants x {len(seeds)} seeds to {args.out}")
+        return
+
     # Build an experiment matrix: for each hypothesis, each variant is a condition
     rows = []
     for hid, variants in inst.items():
@@ -20,12 +40,6 @@ def main(args):
                 "seed": None
             })
 
-    # Optionally expand by seeds to get multiple samples per prompt from each model
-    if args.seeds:
-        seeds = [int(s) for s in args.seeds.split(",")]
-    else:
-        seeds = tpl["metadata"]["random_seeds"]
-
     expanded = []
     for r in rows:
         for s in seeds:
@@ -41,14 +55,15 @@ def main(args):
         "prompts": expanded
     }
 
+    instrument.count("prompts", len(expanded))
     ensure_dir(os.path.dirname(args.out))
-    with open(args.out, "w") as f:
+    with instrument.stage("write_manifest"), open(args.out, "w") as f:
         json.dump(manifest, f, indent=2)
 
     print(f"Wrote experiment manifest with {len(expanded)} prompt-seed combos to {args.out}")
 
-if __name__ == "__main__":
-    ap = argparse.ArgumentParser()
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog)
     ap.add_argument("--templates", default="prompts/prompt_templates.json")
     ap.add_argument("--instances", default="prompts/prompt_instances.json")
     ap.add_argument("--models", default="gpt-4o-mini,claude-3-5-sonnet,gemini-1.5-pro")
@@ -56,5 +71,12 @@ if __name__ == "__main__":
     ap.add_argument("--n_samples", type=int, default=3, help="responses per prompt per model")
     ap.add_argument("--seeds", type=str, default="", help="comma-separated list; empty uses defaults")
     ap.add_argument("--out", default="prompts/manifest.json")
-    args = ap.parse_args()
+    ap.add_argument("--compact", action="store_true", help="store variants and seeds once; run_experiment expands "
+                                                            "cells lazily (see manifest.py)")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("experiment_design", args)
     main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,135 @@
+import hashlib, json, sqlite3
+
+import features
+
+# Persisted per-record feature/claims index (SQLite), keyed by a stable digest
+# of each response record. Reruns extract features / check claims only for
+# records not yet in the index, then rebuild aggregates from the stored rows.
+# Each kind of derived data carries a version digest of the code inputs that
+# produced it (lexicons, keyword lists, claim rules); when that changes, the
+# stored values of that kind are dropped and recomputed on the next run. The
+# response text and source file of each record are stored too, so dropped
+# values are recomputed for every indexed record, not only for the records of
+# the file being processed (see stale()).
+
+META = ["provider", "model", "hypothesis_id", "condition", "seed"]
+STORED = META + ["response", "source"]
+FEATURES = ["sentiment", "strategy_axis", "scope_axis", "recommended_player"] + features.MENTION_COLS
+
+def _digest(obj) -> str:
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=list)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def record_digest(rec) -> str:
+    return _digest([rec.get(k) for k in ("timestamp", "provider", "model", "seed", "hypothesis_id",
+                                         "condition", "prompt", "response")])
+
+def features_version(pos=features.POS_WORDS_PHASE3, neg=features.NEG_WORDS_PHASE3) -> str:
+    return _digest({
+        "pos": sorted(pos), "neg": sorted(neg), "players": features.PLAYERS,
+        "rec": [r.pattern for r in features.REC_RES],
+        "keywords": [features.OFF_KW, features.DEF_KW, features.IND_KW, features.TEAM_KW],
+    })
+
+class FeatureIndex:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        cols = ", ".join(f"{c} {'REAL' if c == 'sentiment' else 'INTEGER' if c.startswith('mentions_') else 'TEXT'}"
+                         for c in FEATURES)
+        self.conn.execute(f"""CREATE TABLE IF NOT EXISTS records (
+            digest TEXT PRIMARY KEY, provider TEXT, model TEXT, hypothesis_id TEXT, condition TEXT,
+            seed INTEGER, has_features INTEGER DEFAULT 0, {cols}, claims TEXT, response TEXT, source TEXT)""")
+        # indexes created before responses were stored
+        have = {r[1] for r in self.conn.execute("PRAGMA table_info(records)")}
+        for c in ("response", "source"):
+            if c not in have:
+                self.conn.execute(f"ALTER TABLE records ADD COLUMN {c} TEXT")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS versions (kind TEXT PRIMARY KEY, version TEXT)")
+        self.conn.commit()
+
+    def ensure_version(self, kind: str, version: str) -> bool:
+        # returns True when stored `kind` data was invalidated
+        row = self.conn.execute("SELECT version FROM versions WHERE kind = ?", (kind,)).fetchone()
+        if row and row[0] == version:
+            return False
+        if kind == "features":
+            self.conn.execute("UPDATE records SET has_features = 0")
+        elif kind == "claims":
+            self.conn.execute("UPDATE records SET claims = NULL")
+        self.conn.execute("INSERT OR REPLACE INTO versions (kind, version) VALUES (?, ?)", (kind, version))
+        self.conn.commit()
+        return row is not None
+
+    def missing(self, digests, kind: str):
+        # subset of `digests` without stored `kind` data
+        cond = self._done(kind)
+        have = set()
+        digests = list(digests)
+        for i in range(0, len(digests), 500):
+            part = digests[i:i + 500]
+            q = f"SELECT digest FROM records WHERE {cond} AND digest IN ({','.join('?' * len(part))})"
+            have.update(d for (d,) in self.conn.execute(q, part))
+        return [d for d in digests if d not in have]
+
+    def _done(self, kind: str) -> str:
+        return "has_features = 1" if kind == "features" else "claims IS NOT NULL"
+
+    def stale(self, kind: str):
+        # (digest, record) of every stored record without `kind` data whose
+        # response is stored; records carry META, response and source
+        q = f"SELECT digest, {', '.join(STORED)} FROM records WHERE NOT ({self._done(kind)}) " \
+            "AND response IS NOT NULL ORDER BY rowid"
+        return [(row[0], dict(zip(STORED, row[1:]))) for row in self.conn.execute(q)]
+
+    def unrecoverable(self, kind: str):
+        # source -> count of records without `kind` data that cannot be
+        # recomputed here (indexed before responses were stored)
+        q = f"SELECT COALESCE(source, '<unknown>'), COUNT(*) FROM records WHERE NOT ({self._done(kind)}) " \
+            "AND response IS NULL GROUP BY source ORDER BY source"
+        return dict(self.conn.execute(q).fetchall())
+
+    def require_complete(self, kind: str):
+        # aggregating over a subset of the index would be silently wrong
+        lost = self.unrecoverable(kind)
+        if lost:
+            batches = "\n".join(f"  {src}: {n} records" for src, n in lost.items())
+            raise ValueError(f"{sum(lost.values())} indexed records have no current {kind} and no stored response "
+                             f"to recompute them from; rerun on these batches or rebuild the index:\n{batches}")
+
+    def _upsert(self, cols, rows):
+        names = ["digest"] + STORED + cols
+        updates = ", ".join(f"{c} = excluded.{c}" for c in STORED + cols)
+        self.conn.executemany(
+            f"INSERT INTO records ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT(digest) DO UPDATE SET {updates}", rows)
+        self.conn.commit()
+
+    @staticmethod
+    def _stored(rec, source):
+        return [rec.get(k) for k in META] + [rec.get("response"), rec.get("source", source)]
+
+    def put_features(self, digests, recs, af, source=None):
+        # recs: source records; af: extract_frame output aligned with recs
+        vals = af[FEATURES].astype(object).to_numpy().tolist()
+        rows = [[d] + self._stored(r, source) + [1] + v for d, r, v in zip(digests, recs, vals)]
+        self._upsert(["has_features"] + FEATURES, rows)
+
+    def put_claims(self, digests, recs, issues, source=None):
+        rows = [[d] + self._stored(r, source) + [json.dumps(i)] for d, r, i in zip(digests, recs, issues)]
+        self._upsert(["claims"], rows)
+
+    def feature_frame(self, extra=()):
+        # extra: further META columns, e.g. ["model"]
+        import pandas as pd
+        cols = ["hypothesis_id", "condition"] + list(extra) + FEATURES
+        q = f"SELECT {', '.join(cols)} FROM records WHERE has_features = 1 ORDER BY rowid"
+        return pd.read_sql_query(q, self.conn)
+
+    def claims_report(self):
+        q = "SELECT provider, model, hypothesis_id, condition, claims FROM records WHERE claims IS NOT NULL ORDER BY rowid"
+        return [{"provider": p, "model": m, "hypothesis_id": h, "condition": c, "issues": json.loads(i)}
+                for p, m, h, c, i in self.conn.execute(q)]
+
+    def close(self):
+        self.conn.close()
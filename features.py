@@ -0,0 +1,337 @@
+import re
+from functools import lru_cache
+from keyword_matcher import KeywordMatcher
+
+# Shared feature extraction for analyze_bias and analyze_script. All patterns
+# are compiled once at import; extract_features() scans one response,
+# extract_frame() does the same over a pandas string column, vectorized for
+# ASCII rows and through the scalar scan for the rest. Both reproduce the
+# original per-script heuristics exactly; benchmarks/bench_features.py checks
+# that and the speedup over them.
+
+PLAYERS = ["Player A", "Player B", "Player C"]
+MENTION_COLS = [f"mentions_{p.replace(' ', '')}" for p in PLAYERS]
+
+# analyze_bias (phase 2) lexicon
+POS_WORDS = frozenset("excellent strong promising opportunity improve growth effective efficient advantage".split())
+NEG_WORDS = frozenset("poor weak struggling concern risk problem issue ineffective inefficient disadvantage".split())
+# analyze_script (phase 3) lexicon
+POS_WORDS_PHASE3 = frozenset("excellent strong promising opportunity improve growth effective efficient advantage breakthrough edge positive potential".split())
+NEG_WORDS_PHASE3 = frozenset("poor weak struggling concern risk problem issue ineffective inefficient disadvantage stall negative".split())
+
+OFF_KW = ["goal","assist","finish","attack","shot","sog","offense","offensive","scoring","possession time"]
+DEF_KW = ["defense","defensive","turnover","clear","ride","ground ball","gb","save","stops","pressure"]
+IND_KW = ["player a","player b","player c","individual","one-on-one","targeted coaching","coaching on"]
+TEAM_KW = ["team","system","scheme","drills","unit","transition","set plays","collective"]
+
+TOKEN_RE = re.compile(r"[a-zA-Z']+")
+MENTION_RE = re.compile("|".join(re.escape(p) for p in PLAYERS))
+REC_RES = [re.compile(re.escape(p) + r".{0,40}(should|recommend|priorit|coaching|focus)", re.I) for p in PLAYERS]
+
+def _any_re(keywords):
+    # one alternation per list == any(k in t for k in keywords)
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+OFF_RE, DEF_RE, IND_RE, TEAM_RE = (_any_re(k) for k in (OFF_KW, DEF_KW, IND_KW, TEAM_KW))
+
+@lru_cache(maxsize=None)
+def _lexicon_matcher(pos: frozenset, neg: frozenset):
+    # None for single-word lexicons, which are counted with set lookups
+    if all(TOKEN_RE.findall(w) == [w] for w in pos | neg):
+        return None
+    return KeywordMatcher({"pos": pos, "neg": neg}, whole_words=True)
+
+def lexicon_matcher(pos=POS_WORDS, neg=NEG_WORDS):
+    # built once per lexicon that holds multi-word phrases
+    return _lexicon_matcher(frozenset(pos), frozenset(neg))
+
+def sentiment_score(text: str, pos=POS_WORDS, neg=NEG_WORDS) -> float:
+    # (#pos - #neg) / #tokens
+    toks = TOKEN_RE.findall(text.lower())
+    if not toks:
+        return 0.0
+    pos, neg = frozenset(pos), frozenset(neg)
+    matcher = _lexicon_matcher(pos, neg)
+    if matcher is None:
+        return (sum(1 for t in toks if t in pos) - sum(1 for t in toks if t in neg)) / len(toks)
+    p, n = matcher.count_symbols(toks)
+    return (p - n) / len(toks)
+
+def extract_mentions(text: str):
+    counts = dict.fromkeys(PLAYERS, 0)
+    for m in MENTION_RE.findall(text):
+        counts[m] += 1
+    return counts
+
+def who_is_recommended(text: str, mentions=None):
+    # first player named near "should"/"recommend"/...; fallback: most mentions
+    for p, rx in zip(PLAYERS, REC_RES):
+        if rx.search(text):
+            return p
+    if mentions is None:
+        mentions = extract_mentions(text)
+    return max(mentions, key=mentions.get)
+
+def _axis(a, b, a_name, b_name):
+    if a and b: return "mixed"
+    if a: return a_name
+    if b: return b_name
+    return "other"
+
+def classify_strategy(text: str):
+    # substring checks: a handful of short keywords per axis, faster than any
+    # automaton or alternation over them
+    t = text.lower()
+    off, de = any(k in t for k in OFF_KW), any(k in t for k in DEF_KW)
+    ind, tm = any(k in t for k in IND_KW), any(k in t for k in TEAM_KW)
+    return _axis(off, de, "offensive", "defensive"), _axis(ind, tm, "individual", "team")
+
+def extract_features(text: str, pos=POS_WORDS, neg=NEG_WORDS, axes=True):
+    mentions = extract_mentions(text)
+    row = {
+        "sentiment": sentiment_score(text, pos, neg),
+        "recommended_player": who_is_recommended(text, mentions),
+    }
+    if axes:
+        row["strategy_axis"], row["scope_axis"] = classify_strategy(text)
+    for col, p in zip(MENTION_COLS, PLAYERS):
+        row[col] = mentions[p]
+    return row
+
+# Column-wise equivalents of the scalar patterns above for Arrow's RE2 kernels:
+# inline (?i) instead of re.I or lowercasing, non-capturing groups. They agree
+# with the scalar patterns on ASCII text only: str.lower()/re.I and RE2 fold
+# some other characters differently (e.g. 'İ'), so extract_frame() and
+# sentiment_array() rescore rows holding any non-ASCII byte with the scalar
+# functions.
+REC_PATS = ["(?i)" + re.escape(p) + r".{0,40}(?:should|recommend|priorit|coaching|focus)" for p in PLAYERS]
+OFF_PAT, DEF_PAT, IND_PAT, TEAM_PAT = ("(?i)" + r.pattern for r in (OFF_RE, DEF_RE, IND_RE, TEAM_RE))
+
+def _token_lut():
+    import numpy as np
+    lut = np.full(256, ord(" "), dtype=np.uint8)
+    for c in b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'":
+        lut[c] = c
+    return lut
+
+def arrow_tokens(arr):
+    # lowercased TOKEN_RE tokens of a pyarrow string array -> (flat pieces, row
+    # offsets into them); pieces include empty strings between separators.
+    # Every byte outside [a-zA-Z'] becomes a space before splitting, which
+    # yields the tokens of TOKEN_RE on ASCII text
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    low = pc.utf8_lower(arr)
+    if low.null_count:
+        low = pc.fill_null(low, "")
+    validity, offsets, data = low.buffers()
+    mapped = _token_lut()[np.frombuffer(data, dtype=np.uint8)] if data is not None else np.zeros(0, np.uint8)
+    spaced = pa.Array.from_buffers(low.type, len(low), [None, offsets, pa.py_buffer(mapped)], offset=low.offset)
+    pieces = pc.split_pattern(spaced, " ")
+    seg = pieces.offsets.to_numpy()
+    return pc.list_flatten(pieces), seg - seg[0]
+
+def _string_bytes(arr):
+    # (row offsets, data bytes) of a pyarrow string array without nulls; the
+    # offsets index the data buffer as is (they need not start at 0)
+    import numpy as np
+    import pyarrow as pa
+    _, offsets, data = arr.buffers()
+    otype = np.int64 if pa.types.is_large_string(arr.type) else np.int32
+    offs = np.frombuffer(offsets, dtype=otype)[arr.offset:arr.offset + len(arr) + 1].astype(np.int64)
+    raw = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    return offs, raw[:offs[-1]]
+
+def _blocks(offs, raw, size=1 << 18):
+    # (first row, row offsets from 0, bytes + 16 zero bytes) per block of rows
+    # holding about `size` bytes: numpy's temporaries for one block stay in
+    # cache, and the padding lets fixed-width reads run past the last row
+    import numpy as np
+    cuts = np.searchsorted(offs, np.arange(offs[0] + size, offs[-1], size))
+    rows = np.unique(np.concatenate([[0], cuts, [len(offs) - 1]]))
+    for a, b in zip(rows[:-1], rows[1:]):
+        o = offs[a:b + 1]
+        buf = np.zeros(o[-1] - o[0] + 16, dtype=np.uint8)
+        buf[:-16] = raw[o[0]:o[-1]]
+        yield a, o - o[0], buf
+
+def _non_ascii(offs, buf):
+    # rows holding any byte >= 0x80; str.lower()/re.I and Arrow's RE2 (?i)
+    # fold some of those differently (e.g. 'İ')
+    import numpy as np
+    return np.unique(np.searchsorted(offs, np.flatnonzero(buf >= 0x80), side="right") - 1)
+
+def _count_players(offs, buf):
+    # occurrences of each of PLAYERS per row == count_substring / MENTION_RE
+    # (no name overlaps itself or another, so no occurrence shadows one)
+    import numpy as np
+    names = [p.encode() for p in PLAYERS]
+    out = np.zeros((len(offs) - 1, len(names)), dtype=np.int64)
+    firsts = {}
+    for j, b in enumerate(names):
+        if b[0] not in firsts:
+            firsts[b[0]] = np.flatnonzero(buf[:offs[-1]] == b[0])
+        at = firsts[b[0]]
+        ok = np.ones(len(at), dtype=bool)
+        for k in range(1, len(b)):
+            ok &= buf[np.minimum(at + k, len(buf) - 1)] == b[k]
+        at = at[ok]
+        row = np.searchsorted(offs, at, side="right") - 1
+        out[:, j] = np.bincount(row[at + len(b) <= offs[row + 1]], minlength=len(out))
+    return out
+
+@lru_cache(maxsize=None)
+def _lexicon_lanes(pos: frozenset, neg: frozenset):
+    # _block_sentiment's tables for a lexicon of lowercase single words of at
+    # most 16 bytes: the (length, first byte) pairs that occur, each 8-byte
+    # lane's distinct values, a (lane rank, lane rank) -> word table and the
+    # sign of every word
+    import numpy as np
+    words = sorted(pos | neg)
+    enc = [w.encode() for w in words]
+    wanted = np.zeros(18 * 256, dtype=bool)
+    wanted[[len(w) * 256 + w[0] for w in enc]] = True
+    lex = np.zeros((len(words), 16), dtype=np.uint8)
+    for i, w in enumerate(enc):
+        lex[i, :len(w)] = np.frombuffer(w, dtype=np.uint8)
+    lanes = lex.view("<u8")
+    uniq = [np.unique(lanes[:, j]) for j in range(2)]
+    table = np.full((len(uniq[0]), len(uniq[1])), -1)
+    table[np.searchsorted(uniq[0], lanes[:, 0]), np.searchsorted(uniq[1], lanes[:, 1])] = np.arange(len(words))
+    sign = np.array([(w in pos) - (w in neg) for w in words], dtype=np.int64)
+    return wanted, uniq, table, sign
+
+def _block_sentiment(offs, buf, lexicon):
+    # TOKEN_RE over the raw bytes with numpy: tokens are the runs of [a-zA-Z']
+    # bytes (cut at row boundaries), and only tokens whose length and first
+    # byte fit some lexicon word are looked up. Exact for ASCII rows; callers
+    # rescore the others.
+    import numpy as np
+
+    tok = buf | 0x20  # ASCII lowercase for letters; "'" already has the bit
+    np.subtract(tok, ord("a"), out=tok)
+    tok = tok < 26
+    tok |= buf == ord("'")
+    # edges of the runs alternate start, end (the padding ends the last run);
+    # a run spanning two rows is cut where the second row begins
+    edge = np.empty(len(tok) + 1, dtype=bool)
+    edge[0], edge[-1] = tok[0], False
+    np.not_equal(tok[1:], tok[:-1], out=edge[1:-1])
+    edge = np.flatnonzero(edge)
+    starts, ends = edge[0::2], edge[1::2]
+    inner = offs[1:-1][(offs[1:-1] > 0) & (offs[1:-1] < offs[-1])]
+    cut = np.unique(inner[tok[inner] & tok[inner - 1]])
+    if len(cut):
+        starts = np.insert(starts, np.searchsorted(starts, cut), cut)
+        ends = np.insert(ends, np.searchsorted(ends, cut), cut)
+    ntok = np.diff(np.searchsorted(starts, offs))
+
+    wanted, uniq, table, sign = lexicon
+    lens = np.minimum(ends - starts, 17)
+    cand = np.flatnonzero(wanted[lens * 256 + (buf[starts] | 0x20)])
+    starts, lens = starts[cand], lens[cand]
+    # a token's key is its first 16 bytes, lowercased and read as two
+    # little-endian uint64 lanes with the bytes past its end masked off; each
+    # lane is ranked among the lexicon's values for it, and the ranks name the
+    # word, if any
+    u64 = np.ndarray((len(buf) - 7,), dtype="<u8", buffer=buf, strides=(1,))
+    keep = np.array([(1 << 8 * r) - 1 for r in range(8)] + [(1 << 64) - 1], dtype=np.uint64)
+    found, rank = np.ones(len(cand), dtype=bool), []
+    for j in range(2):
+        key = (u64[starts + 8 * j] | np.uint64(0x2020202020202020)) & keep[np.clip(lens - 8 * j, 0, 8)]
+        r = np.minimum(np.searchsorted(uniq[j], key), len(uniq[j]) - 1)
+        found &= uniq[j][r] == key
+        rank.append(r)
+    i = table[rank[0][found], rank[1][found]]
+    rows = np.searchsorted(offs, starts[found][i >= 0], side="right") - 1
+    score = np.bincount(rows, weights=sign[i[i >= 0]], minlength=len(offs) - 1)
+    return score / np.maximum(ntok, 1)
+
+def _byte_scan(texts, arr, pos, neg, players=True):
+    # one numpy pass over blocks of rows: sentiment, PLAYERS counts (if asked)
+    # and the rows holding non-ASCII bytes, which callers rescore
+    import numpy as np
+    offs, raw = _string_bytes(arr)
+    words = set(pos) | set(neg)
+    single = all(TOKEN_RE.fullmatch(w) and w == w.lower() and len(w) <= 16 for w in words)
+    lexicon = _lexicon_lanes(frozenset(pos), frozenset(neg)) if single and words else None
+    sent, counts, odd = [np.zeros(0)], [np.zeros((0, len(PLAYERS)), dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for a, o, buf in _blocks(offs, raw):
+        if lexicon is not None:
+            sent.append(_block_sentiment(o, buf, lexicon))
+        if players:
+            counts.append(_count_players(o, buf))
+        odd.append(a + _non_ascii(o, buf))
+    if not single:
+        # multi-word phrases (and very long words) need the token automaton
+        sent = np.array([sentiment_score(t, pos, neg) for t in texts.astype(str)], dtype=float)
+    elif lexicon is None:
+        sent = np.zeros(len(arr))
+    else:
+        sent = np.concatenate(sent)
+    return sent, np.concatenate(counts), np.concatenate(odd)
+
+def _arrow_frame(texts, pos, neg, axes):
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = pa.array(texts.astype(str))
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    n = len(arr)
+
+    sentiment, mentions, odd = _byte_scan(texts, arr, pos, neg)
+    hits = np.zeros((n, len(PLAYERS)), dtype=bool)
+    for j, p in enumerate(PLAYERS):
+        hits[:, j] = pc.match_substring_regex(arr, REC_PATS[j]).to_numpy(zero_copy_only=False)
+    idx = np.where(hits.any(axis=1), hits.argmax(axis=1), mentions.argmax(axis=1))
+
+    out = pd.DataFrame({
+        "sentiment": sentiment,
+        "recommended_player": np.asarray(PLAYERS, dtype=object)[idx],
+    }, index=texts.index)
+    if axes:
+        def axis(a_pat, b_pat, a_name, b_name):
+            a = pc.match_substring_regex(arr, a_pat).to_numpy(zero_copy_only=False)
+            b = pc.match_substring_regex(arr, b_pat).to_numpy(zero_copy_only=False)
+            return np.array(["other", a_name, b_name, "mixed"], dtype=object)[a + 2 * b.astype(np.int8)]
+        out["strategy_axis"] = axis(OFF_PAT, DEF_PAT, "offensive", "defensive")
+        out["scope_axis"] = axis(IND_PAT, TEAM_PAT, "individual", "team")
+    for j, col in enumerate(MENTION_COLS):
+        out[col] = mentions[:, j]
+    if len(odd):
+        fixed = pd.DataFrame([extract_features(str(texts.iloc[i]), pos, neg, axes) for i in odd])
+        for col in out.columns:
+            out.iloc[odd, out.columns.get_loc(col)] = fixed[col].to_numpy()
+    return out
+
+def extract_frame(texts, pos=POS_WORDS, neg=NEG_WORDS, axes=True):
+    # Vectorized variant over a pandas Series of response strings; returns a
+    # DataFrame aligned with `texts` with the same columns as extract_features.
+    # Uses Arrow compute kernels when pyarrow is installed, else the scalar scan.
+    import pandas as pd
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        rows = [extract_features(t, pos, neg, axes) for t in texts.astype(str)]
+        return pd.DataFrame(rows, index=texts.index)
+    return _arrow_frame(texts, pos, neg, axes)
+
+def sentiment_array(texts, pos=POS_WORDS, neg=NEG_WORDS):
+    # sentiment_score over a pandas Series of responses, as a float array
+    import numpy as np
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return np.array([sentiment_score(t, pos, neg) for t in texts.astype(str)], dtype=float)
+    arr = pa.array(texts.astype(str))
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    out, _, odd = _byte_scan(texts, arr, pos, neg, players=False)
+    for i in odd:
+        out[i] = sentiment_score(str(texts.iloc[i]), pos, neg)
+    return out
@@ -0,0 +1,173 @@
+import atexit, contextlib, json, os, sys, time
+from collections import Counter, defaultdict
+
+# Run instrumentation: named stage timers, record/error counters and an
+# optional profiler dump, off by default. While disabled, stage() returns a
+# shared no-op context manager and count() returns immediately, so hot loops
+# can stay instrumented. Enabled per entry point with --metrics/--profile, or
+# for a whole pipeline with INSTRUMENT_METRICS / INSTRUMENT_PROFILE (a file, or
+# a directory that gets one <entry>.json / <entry>.prof per run).
+#
+# Stage times are wall seconds summed over calls; stages may nest, so they do
+# not add up to the run's wall time. Work done in process-pool shards is
+# collected with traced() and merged, summed over workers.
+
+_run = None  # active recorder, None while disabled
+_NULL = contextlib.nullcontext()
+
+class Recorder:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.errors = Counter()
+        self.counters = Counter()
+        self.info = {}
+
+    def snapshot(self):
+        return {"stages": {k: {"seconds": round(self.seconds[k], 6), "calls": self.calls[k],
+                               "errors": self.errors[k]} for k in sorted(self.calls)},
+                "counters": dict(sorted(self.counters.items()))}
+
+    def merge(self, snap):
+        for k, v in snap["stages"].items():
+            self.seconds[k] += v["seconds"]
+            self.calls[k] += v["calls"]
+            self.errors[k] += v["errors"]
+        self.counters.update(snap["counters"])
+
+class _Stage:
+    __slots__ = ("rec", "name", "t0")
+
+    def __init__(self, rec, name):
+        self.rec, self.name = rec, name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.rec.seconds[self.name] += time.perf_counter() - self.t0
+        self.rec.calls[self.name] += 1
+        if exc_type is not None:
+            self.rec.errors[self.name] += 1
+        return False
+
+def enabled() -> bool:
+    return _run is not None
+
+def stage(name: str):
+    # `with stage("chi2"): ...` times the block under `name`
+    return _NULL if _run is None else _Stage(_run, name)
+
+def count(name: str, n: int = 1):
+    if _run is not None:
+        _run.counters[name] += n
+
+def note(key: str, value):
+    # free-form run info (e.g. provider latency stats), stored under "info"
+    if _run is not None:
+        _run.info[key] = value
+
+def traced(job):
+    # process-pool wrapper: job = (fn, arg); returns (fn(arg), worker metrics)
+    global _run
+    fn, arg = job
+    outer, _run = _run, Recorder()
+    try:
+        return fn(arg), _run.snapshot()
+    finally:
+        _run = outer
+
+def merge(snap):
+    if _run is not None:
+        _run.merge(snap)
+
+def _target(path: str, entry: str, ext: str) -> str:
+    if path.endswith(os.sep) or os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+        return os.path.join(path, entry + ext)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class _Profiler:
+    # cProfile by default; pyinstrument (if installed) for .html/.txt targets
+    def __init__(self, path):
+        self.path = path
+        if path.endswith((".html", ".txt")):
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError(f"--profile {path}: HTML/text reports need pyinstrument: pip install pyinstrument")
+            self.prof = Profiler()
+        else:
+            import cProfile
+            self.prof = cProfile.Profile()
+        if hasattr(self.prof, "enable"):
+            self.prof.enable()
+        else:
+            self.prof.start()
+
+    def stop(self):
+        if hasattr(self.prof, "enable"):
+            self.prof.disable()
+            self.prof.dump_stats(self.path)
+            return
+        self.prof.stop()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(self.prof.output_html() if self.path.endswith(".html") else self.prof.output_text())
+
+class _Run(Recorder):
+    def __init__(self, entry, metrics, profile):
+        super().__init__()
+        self.entry = entry
+        self.metrics = _target(metrics, entry, ".json") if metrics else ""
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        self.t0, self.cpu0 = time.perf_counter(), time.process_time()
+        self.profiler = _Profiler(_target(profile, entry, ".prof")) if profile else None
+
+    def finish(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        if not self.metrics:
+            return
+        out = {"entry": self.entry, "argv": sys.argv[1:], "started_at": self.started_at,
+               "wall_seconds": round(time.perf_counter() - self.t0, 6),
+               "cpu_seconds": round(time.process_time() - self.cpu0, 6),
+               "peak_rss_mb": _peak_rss_mb(), **self.snapshot(), "info": self.info}
+        if self.profiler is not None:
+            out["profile"] = self.profiler.path
+        with open(self.metrics, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2, default=str)
+
+def start(entry: str, metrics: str = "", profile: str = ""):
+    # enables instrumentation for this process; results are written at exit
+    global _run
+    metrics = metrics or os.environ.get("INSTRUMENT_METRICS", "")
+    profile = profile or os.environ.get("INSTRUMENT_PROFILE", "")
+    if not (metrics or profile) or _run is not None:
+        return _run
+    _run = _Run(entry, metrics, profile)
+    atexit.register(finish)
+    return _run
+
+def finish():
+    global _run
+    run, _run = _run, None
+    if run is not None:
+        run.finish()
+
+def add_arguments(ap):
+    ap.add_argument("--metrics", default="", help="write per-run stage timings and counters as JSON")
+    ap.add_argument("--profile", default="", help="profile the run: cProfile dump (.prof), or a pyinstrument "
+                                                  "report (.html/.txt, needs pyinstrument)")
+
+def from_args(entry: str, args=None):
+    return start(entry, getattr(args, "metrics", ""), getattr(args, "profile", ""))
@@ -0,0 +1,105 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List
+
+# Aho-Corasick multi-pattern matcher. Built once from {category: keywords}, it
+# reports every keyword occurrence (overlaps included) in a single linear pass,
+# so scan time does not grow with the number of keywords.
+#
+# Two modes:
+#   - substring (default): symbols are characters; "gb" also matches in "rugby",
+#     like `k in text`.
+#   - whole_words=True: symbols are TOKEN_RE tokens; a keyword (single word or
+#     multi-word phrase) only matches whole tokens, like a lexicon lookup.
+
+TOKEN_RE = re.compile(r"[a-zA-Z']+")
+
+class KeywordMatcher:
+    def __init__(self, categories: Dict[str, Iterable[str]], whole_words: bool = False):
+        self.categories = list(categories)
+        self.whole_words = whole_words
+        goto: List[dict] = [{}]
+        out: List[list] = [[]]
+        for ci, cat in enumerate(self.categories):
+            for kw in categories[cat]:
+                symbols = tuple(TOKEN_RE.findall(kw)) if whole_words else kw
+                if not symbols:
+                    continue
+                s = 0
+                for sym in symbols:
+                    nxt = goto[s].get(sym)
+                    if nxt is None:
+                        nxt = goto[s][sym] = len(goto)
+                        goto.append({})
+                        out.append([])
+                    s = nxt
+                if ci not in out[s]:
+                    out[s].append(ci)
+
+        # breadth-first failure links; the scan follows them on a miss instead
+        # of using a full transition table, which would copy the root's whole
+        # alphabet into every state (quadratic build for large lexicons)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for sym, nxt in goto[s].items():
+                queue.append(nxt)
+                f = fail[s]
+                while f and sym not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(sym, 0) if goto[f].get(sym, 0) != nxt else 0
+                # keywords ending here plus those ending at the failure state
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def _symbols(self, text):
+        return TOKEN_RE.findall(text) if self.whole_words else text
+
+    def count_symbols(self, symbols) -> List[int]:
+        # counts per category index over an already-tokenized sequence
+        counts = [0] * len(self.categories)
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        for sym in symbols:
+            while s and sym not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(sym, 0)
+            if out[s]:
+                for c in out[s]:
+                    counts[c] += 1
+        return counts
+
+    def positions(self, symbols) -> Dict[int, List[int]]:
+        # {category index: end indices of its occurrences}, hit categories only
+        found: Dict[int, List[int]] = {}
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        for i, sym in enumerate(symbols):
+            while s and sym not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(sym, 0)
+            if out[s]:
+                for c in out[s]:
+                    if c in found:
+                        found[c].append(i)
+                    else:
+                        found[c] = [i]
+        return found
+
+    def counts(self, text: str) -> Dict[str, int]:
+        return dict(zip(self.categories, self.count_symbols(self._symbols(text))))
+
+    def hits(self, text: str):
+        # yields (end_index, category) for every occurrence; end_index is a
+        # character offset (substring mode) or a token index (whole_words mode)
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        for i, sym in enumerate(self._symbols(text)):
+            while s and sym not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(sym, 0)
+            for c in out[s]:
+                yield i, self.categories[c]
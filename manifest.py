@@ -0,0 +1,123 @@
+import json
+
+# Experiment manifests. The legacy format (experiment_design without
+# --compact) lists every prompt x seed row with the full prompt text. The
+# compact format stores each variant once, shared text blocks (the data block
+# every prompt starts with) once, and the seed list once:
+#
+#   {"format": "compact", "models": [...], "temperature": 0.7,
+#    "n_samples_per_prompt": 3, "seeds": [7, 13, ...],
+#    "blocks": {"base": "Team statistics ..."},
+#    "variants": [{"hypothesis_id": "H1", "condition": "neutral",
+#                  "block": "base", "prompt": "\n\nGiven the player stats ..."}]}
+#
+# Manifest reads either format and expands cells lazily, in the order
+# run_experiment has always used: model, then prompt row (variant, then seed),
+# then sample, with seed = row seed + sample. Cell i can be computed directly,
+# so workers take index ranges (slices, shard(k, n)) without expanding the
+# whole matrix.
+
+COMPACT = "compact"
+
+def compact_spec(instances, seeds, models, temperature, n_samples, blocks=None, created_at=None):
+    # instances: {hypothesis_id: {condition: prompt}}; blocks: {name: shared prompt prefix}
+    blocks = {k: v for k, v in (blocks or {}).items() if v}
+    variants = []
+    for hid, conds in instances.items():
+        for cond, prompt in conds.items():
+            v = {"hypothesis_id": hid, "condition": cond, "prompt": prompt}
+            for name, text in blocks.items():
+                if prompt.startswith(text):
+                    v.update(block=name, prompt=prompt[len(text):])
+                    break
+            variants.append(v)
+    return {
+        "format": COMPACT,
+        "created_at": created_at,
+        "models": list(models),
+        "temperature": temperature,
+        "n_samples_per_prompt": n_samples,
+        "seeds": list(seeds),
+        "blocks": blocks,
+        "variants": variants,
+    }
+
+class Manifest:
+    def __init__(self, spec, only_model=""):
+        self.spec = spec
+        self.models = [m for m in spec["models"] if not only_model or m == only_model]
+        self.temperature = spec["temperature"]
+        self.n_samples = spec["n_samples_per_prompt"]
+        self.compact = spec.get("format") == COMPACT
+        if self.compact:
+            blocks = spec.get("blocks", {})
+            # each variant's text is assembled once, not once per seed
+            self.variants = [dict(hypothesis_id=v["hypothesis_id"], condition=v["condition"],
+                                  prompt=blocks.get(v.get("block"), "") + v["prompt"]) for v in spec["variants"]]
+            self.seeds = list(spec["seeds"])
+            self.n_rows = len(self.variants) * len(self.seeds)
+        else:
+            self.n_rows = len(spec["prompts"])
+
+    @classmethod
+    def load(cls, path, only_model=""):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), only_model)
+
+    def __len__(self):
+        return len(self.models) * self.n_rows * self.n_samples
+
+    def row(self, j):
+        # prompt row j: hypothesis_id, condition, prompt, seed
+        if not self.compact:
+            return self.spec["prompts"][j]
+        v, s = divmod(j, len(self.seeds))
+        return dict(self.variants[v], seed=self.seeds[s])
+
+    def rows(self):
+        return (self.row(j) for j in range(self.n_rows))
+
+    def cell(self, i):
+        # (model, prompt row, seed) of cell i
+        if not 0 <= i < len(self):
+            raise IndexError(f"cell {i} out of range for {len(self)} cells")
+        m, rest = divmod(i, self.n_rows * self.n_samples)
+        j, k = divmod(rest, self.n_samples)
+        p = self.row(j)
+        return self.models[m], p, int(p["seed"]) + k
+
+    def cells(self, start=0, stop=None):
+        # cells [start, stop) in order; each prompt row is built once per run of samples
+        stop = len(self) if stop is None else min(stop, len(self))
+        i = max(0, start)
+        while i < stop:
+            model, p, seed = self.cell(i)
+            k0 = i % self.n_samples
+            n = min(self.n_samples - k0, stop - i)
+            for k in range(n):
+                yield model, p, seed + k
+            i += n
+
+    def __iter__(self):
+        return self.cells()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return (self.cell(i) for i in range(start, stop, step))
+            return self.cells(start, stop)
+        return self.cell(key + len(self) if key < 0 else key)
+
+    def shard(self, k, n):
+        # contiguous cell range of shard k (0-based) out of n
+        if not 0 <= k < n:
+            raise ValueError(f"shard {k} out of range for {n} shards")
+        total = len(self)
+        return range(total * k // n, total * (k + 1) // n)
+
+    def expand(self):
+        # legacy (fully expanded) manifest with the same cells
+        out = {k: v for k, v in self.spec.items() if k not in ("format", "seeds", "blocks", "variants")}
+        out["prompts"] = list(self.rows())
+        return out
@@ -0,0 +1,187 @@
+import os, threading, time
+from typing import Callable, Dict, List, Optional
+
+# Provider-adapter layer: each adapter owns one shared HTTP connection pool and
+# one long-lived SDK client per model, so repeated calls reuse keep-alive
+# connections instead of rebuilding a client (and a TLS session) per prompt.
+# `base_url` points an adapter at a local stand-in server for offline testing.
+# provider_client() is a client not tied to a model, for provider-level APIs
+# such as batch jobs (see batch.py).
+
+class AdapterStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.clients_created = 0
+        self.reuse_count = 0
+        self.total_latency = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "clients_created": self.clients_created,
+            "reuse_count": self.reuse_count,
+            "mean_latency_s": self.total_latency / self.requests if self.requests else 0.0,
+        }
+
+class ProviderAdapter:
+    provider = ""
+
+    def __init__(self, pool_size: int = 16, keepalive_expiry: float = 30.0,
+                 timeout: float = 120.0, base_url: Optional[str] = None):
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.base_url = base_url or None
+        self.stats = AdapterStats()
+        self._clients = {}
+        self._provider_client = None
+        self._http = None
+        self._hooks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, fn: Callable):
+        # fn(provider, model, latency_s, reused, error) after every request
+        self._hooks.append(fn)
+
+    def http_client(self, sdk):
+        # one pooled HTTP client per adapter, shared by all per-model SDK clients.
+        # Built from the SDK's own defaults so it matches the httpx flavour it uses.
+        if self._http is None:
+            limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(max_connections=self.pool_size,
+                                                         max_keepalive_connections=self.pool_size,
+                                                         keepalive_expiry=self.keepalive_expiry)
+            self._http = sdk.DefaultHttpxClient(limits=limits, timeout=self.timeout)
+        return self._http
+
+    def client(self, model: str):
+        with self._lock:
+            c = self._clients.get(model)
+            if c is not None:
+                self.stats.reuse_count += 1
+                return c, True
+            c = self._clients[model] = self._make_client(model)
+            self.stats.clients_created += 1
+            return c, False
+
+    def provider_client(self):
+        # shares the connection pool; not counted in the per-model client stats
+        with self._lock:
+            if self._provider_client is None:
+                self._provider_client = self._make_client(None)
+            return self._provider_client
+
+    def ask(self, model: str, prompt: str, temperature: float, seed: int) -> str:
+        c, reused = self.client(model)
+        t0 = time.perf_counter()
+        err = None
+        try:
+            return self._complete(c, model, prompt, temperature, seed)
+        except Exception as e:
+            err = e
+            raise
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self.stats.requests += 1
+                self.stats.total_latency += dt
+                if err is not None:
+                    self.stats.errors += 1
+            for fn in self._hooks:
+                fn(self.provider, model, dt, reused, err)
+
+    def close(self):
+        with self._lock:
+            self._clients.clear()
+            self._provider_client = None
+            if self._http is not None:
+                self._http.close()
+                self._http = None
+
+    def _make_client(self, model: str):
+        raise NotImplementedError
+
+    def _complete(self, client, model: str, prompt: str, temperature: float, seed: int) -> str:
+        raise NotImplementedError
+
+class OpenAIAdapter(ProviderAdapter):
+    provider = "openai"
+
+    def _make_client(self, model):
+        import openai
+        return openai.OpenAI(base_url=self.base_url, http_client=self.http_client(openai))
+
+    def _complete(self, client, model, prompt, temperature, seed):
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            seed=seed
+        )
+        return resp.choices[0].message.content
+
+class AnthropicAdapter(ProviderAdapter):
+    provider = "anthropic"
+
+    def _make_client(self, model):
+        import anthropic
+        return anthropic.Anthropic(base_url=self.base_url, http_client=self.http_client(anthropic))
+
+    def _complete(self, client, model, prompt, temperature, seed):
+        resp = client.messages.create(
+            model=model,
+            max_tokens=800,
+            messages=[{"role": "user", "content": prompt}],
+            # newer SDKs dropped the keyword; the API still takes the field
+            extra_body={"temperature": temperature}
+        )
+        return resp.content[0].text
+
+class GeminiAdapter(ProviderAdapter):
+    provider = "gemini"
+    endpoint = "https://generativelanguage.googleapis.com"
+
+    def _make_client(self, model):
+        # google-generativeai keeps one process-wide transport with no pool or
+        # keep-alive settings, so calls go to the REST API over our own pool
+        import httpx
+        if self._http is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+                                  keepalive_expiry=self.keepalive_expiry)
+            self._http = httpx.Client(base_url=self.base_url or self.endpoint, limits=limits, timeout=self.timeout,
+                                      headers={"x-goog-api-key": os.environ.get("GOOGLE_API_KEY", "")})
+        return self._http
+
+    def _complete(self, client, model, prompt, temperature, seed):
+        resp = client.post(f"/v1beta/models/{model}:generateContent",
+                           json={"contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                                 "generationConfig": {"temperature": temperature}})
+        resp.raise_for_status()
+        cands = resp.json().get("candidates") or [{}]
+        parts = cands[0].get("content", {}).get("parts") or []
+        if not parts:
+            # blocked or empty, as the SDK's resp.text would report
+            raise ValueError(f"no text in response (finishReason={cands[0].get('finishReason')})")
+        return "".join(p.get("text", "") for p in parts)
+
+ADAPTER_CLASSES = {"openai": OpenAIAdapter, "anthropic": AnthropicAdapter, "gemini": GeminiAdapter}
+
+_adapters: Dict[str, ProviderAdapter] = {}
+_settings: Dict[str, dict] = {}
+
+def configure(provider: str, **kwargs):
+    # set pool/base_url options before the first call; drops any existing adapter
+    _settings[provider] = kwargs
+    old = _adapters.pop(provider, None)
+    if old is not None:
+        old.close()
+
+def get_adapter(provider: str) -> ProviderAdapter:
+    a = _adapters.get(provider)
+    if a is None:
+        a = _adapters.setdefault(provider, ADAPTER_CLASSES[provider](**_settings.get(provider, {})))
+    return a
+
+def all_stats() -> Dict[str, Dict[str, float]]:
+    return {name: a.stats.as_dict() for name, a in _adapters.items()}
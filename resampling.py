@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+# Vectorized resampling statistics over the per-record feature table of
+# analyze_script (one row per response). For every hypothesis and metric:
+#   - a permutation test of "condition makes no difference": condition labels
+#     are shuffled within the hypothesis and the statistic recomputed; the
+#     p-value is (#{stat >= observed} + 1) / (n_resamples + 1)
+#   - percentile bootstrap CIs per condition, resampling records
+# Resamples are generated in blocks of whole (n_resamples x n) arrays and
+# reduced with reduceat/bincount, never in a Python loop per resample. Each
+# (hypothesis, metric) task gets its own child of one SeedSequence, so results
+# depend on the seed only, not on --workers or task scheduling.
+#
+# Metric kinds and statistics:
+#   mean   per-record value (sentiment); between-condition sum of squares
+#   share  category per record (recommended_player, axes); chi-square of
+#          the condition x category table
+#   ratio  (numerator, denominator) per record (incorrect / checked claims,
+#          i.e. the fabrication rate); denominator-weighted between-condition
+#          sum of squares of the rates
+
+BLOCK = 1 << 22  # index-array elements per resampling block
+SHARE_METRICS = ["recommended_player", "strategy_axis", "scope_axis"]
+
+def _blocks(n_resamples, n):
+    b = max(1, BLOCK // max(1, n))
+    for start in range(0, n_resamples, b):
+        yield min(b, n_resamples - start)
+
+def _statistic(kind, values, sizes, n_cats=0):
+    # values (B, n): resampled values with records sorted by group, group g
+    # holding `sizes[g]` consecutive positions (sizes are fixed under
+    # permutation) -> (B,) statistic
+    B, n = values.shape[:2]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    if kind == "mean":
+        # sum of n_g (mean_g - mean)^2, from the group sums alone
+        sums = np.add.reduceat(values, starts, axis=1)
+        return (sums ** 2 / sizes).sum(axis=1) - values[0].sum() ** 2 / n
+    if kind == "share":
+        groups = np.repeat(np.arange(len(sizes)), sizes)
+        flat = ((groups + np.arange(B)[:, None] * len(sizes)) * n_cats + values).ravel()
+        table = np.bincount(flat, minlength=B * len(sizes) * n_cats).reshape(B, len(sizes), n_cats)
+        expected = sizes[:, None] * np.bincount(values[0], minlength=n_cats)[None, :] / n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(expected > 0, (table - expected) ** 2 / expected, 0.0).sum(axis=(1, 2))
+    nums = np.add.reduceat(values[..., 0], starts, axis=1)
+    dens = np.add.reduceat(values[..., 1], starts, axis=1)
+    overall = values[0, :, 0].sum() / values[0, :, 1].sum() if values[0, :, 1].sum() else 0.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(dens > 0, nums / dens, overall)
+    return (dens * (rates - overall) ** 2).sum(axis=1)
+
+def permutation_test(kind, labels, values, n_resamples, rng, n_groups, n_cats=0):
+    # shuffling labels over records == shuffling values over group positions
+    order = np.argsort(labels, kind="stable")
+    values, sizes = values[order], np.bincount(labels, minlength=n_groups)
+    observed = _statistic(kind, values[None], sizes, n_cats)[0]
+    hits = 0
+    for b in _blocks(n_resamples, len(labels)):
+        if kind == "ratio":
+            perm = values[rng.permuted(np.broadcast_to(np.arange(len(values)), (b, len(values))), axis=1)]
+        else:
+            perm = rng.permuted(np.broadcast_to(values, (b, len(values))), axis=1)
+        hits += int((_statistic(kind, perm, sizes, n_cats) >= observed - 1e-9 * max(1.0, abs(observed))).sum())
+    return float(observed), (hits + 1) / (n_resamples + 1)
+
+def bootstrap(kind, values, n_resamples, rng, n_cats=0):
+    # (n_resamples,) or, for shares, (n_resamples, n_cats) bootstrap estimates
+    n = len(values)
+    if kind == "share":
+        # resampling categorical records is a multinomial draw
+        p = np.bincount(values, minlength=n_cats) / n
+        return rng.multinomial(n, p, size=n_resamples) / n
+    out = []
+    for b in _blocks(n_resamples, n):
+        idx = rng.integers(0, n, size=(b, n))
+        if kind == "mean":
+            out.append(values[idx].mean(axis=1))
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out.append(values[idx, 0].sum(axis=1) / values[idx, 1].sum(axis=1))
+    return np.concatenate(out)
+
+def _ci(est, level):
+    lo, hi = (1 - level) / 2, 1 - (1 - level) / 2
+    return np.nanquantile(est, [lo, hi], axis=0)
+
+def _run_task(task):
+    hid, metric, kind, conds, cats, labels, values, n_resamples, seed, level = task
+    rng = np.random.default_rng(seed)
+    stat, p = permutation_test(kind, labels, values, n_resamples, rng, len(conds), len(cats))
+    test = {"hypothesis_id": hid, "metric": metric, "kind": kind, "statistic": stat, "p_value": p,
+            "n": int(len(labels)), "n_conditions": len(conds), "n_resamples": n_resamples}
+    rows = []
+    for g, cond in enumerate(conds):
+        v = values[labels == g]
+        est = bootstrap(kind, v, n_resamples, rng, len(cats))
+        lo, hi = _ci(est, level)
+        if kind == "share":
+            point = np.bincount(v, minlength=len(cats)) / len(v)
+            rows += [(hid, cond, metric, cat, point[k], lo[k], hi[k], len(v)) for k, cat in enumerate(cats)]
+        else:
+            point = v.mean() if kind == "mean" else (v[:, 0].sum() / v[:, 1].sum() if v[:, 1].sum() else np.nan)
+            rows.append((hid, cond, metric, "", point, lo, hi, len(v)))
+    return test, rows
+
+def claim_counts(claims):
+    # claims_validation rows -> per-record (hypothesis_id, condition, incorrect, checked)
+    return pd.DataFrame([(r["hypothesis_id"], r["condition"],
+                          sum(1 for i in r.get("issues", []) if i.get("correct") is False),
+                          len(r.get("issues", []))) for r in claims],
+                        columns=["hypothesis_id", "condition", "incorrect", "checked"])
+
+def tasks(af, claims=None, n_resamples=10000, seed=0, level=0.95):
+    specs = [("sentiment", "mean", af, "sentiment")]
+    specs += [(m, "share", af, m) for m in SHARE_METRICS if m in af]
+    if claims is not None and len(claims):
+        specs.append(("fabrication_rate", "ratio", claims, ["incorrect", "checked"]))
+    jobs = []
+    for metric, kind, df, col in specs:
+        for hid, sub in df.groupby("hypothesis_id", sort=True):
+            if kind == "ratio":
+                # responses without checkable claims carry no information
+                sub = sub[sub["checked"] > 0]
+            conds, labels = np.unique(sub["condition"].astype(str).to_numpy(), return_inverse=True)
+            if len(conds) < 2:
+                continue
+            if kind == "share":
+                cats, values = np.unique(sub[col].astype(str).to_numpy(), return_inverse=True)
+            else:
+                cats, values = [], sub[col].to_numpy(dtype=float)
+            jobs.append([hid, metric, kind, list(conds), list(cats), labels, values, n_resamples, None, level])
+    # one independent stream per task, in a fixed task order
+    for job, ss in zip(jobs, np.random.SeedSequence(seed).spawn(len(jobs))):
+        job[8] = ss
+    return [tuple(j) for j in jobs]
+
+def resample_all(af, claims=None, n_resamples=10000, seed=0, level=0.95, workers=1):
+    # -> (permutation tests, bootstrap CI frame) for every hypothesis x metric
+    from streaming import map_shards
+    tests, rows = [], []
+    for test, r in map_shards(_run_task, tasks(af, claims, n_resamples, seed, level), workers):
+        tests.append(test)
+        rows.extend(r)
+    ci = pd.DataFrame(rows, columns=["hypothesis_id", "condition", "metric", "category", "estimate",
+                                     "ci_low", "ci_high", "n"])
+    return tests, ci
@@ -0,0 +1,54 @@
+import hashlib, json, sqlite3, threading
+from typing import Any, Dict, Optional
+
+# Content-addressed response cache backed by SQLite. Keys are stable digests of
+# (provider, model, prompt, temperature, seed), so they survive process restarts
+# (unlike Python's salted hash()). Every response is committed as it arrives;
+# a crashed or interrupted run loses nothing already answered.
+
+def cell_key(provider: str, model: str, prompt: str, temperature: float, seed: int) -> str:
+    payload = json.dumps([provider, model, prompt, float(temperature), int(seed)],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def prompt_digest(prompt: str) -> int:
+    # stable replacement for hash(prompt) % 10**10, same integer range
+    return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16) % (10**10)
+
+class ResponseCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT record FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, record: Dict[str, Any]):
+        # error placeholders are never cached so that --resume retries them
+        if str(record.get("response", "")).startswith("[ERROR]"):
+            return
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, record) VALUES (?, ?)",
+                              (key, json.dumps(record, ensure_ascii=False)))
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,113 +1,322 @@
 
-import os, json, argparse, time, random
+import os, re, json, argparse, time, random, functools
 from datetime import datetime
 from typing import Dict, Any
-from tqdm import tqdm
 from scripts.utils import ensure_dir, jsonl_write, now_iso
+from providers import get_adapter, configure as configure_provider, all_stats
+from response_cache import ResponseCache, cell_key, prompt_digest
+from manifest import Manifest
+import instrument
 
-# Lazy imports only if needed
+# Clients are created lazily and reused across calls (see providers.py)
 def ask_openai(model: str, prompt: str, temperature: float, seed: int) -> str:
-    import openai
-    from openai import OpenAI
-    client = OpenAI()
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        seed=seed
-    )
-    return resp.choices[0].message.content
+    return get_adapter("openai").ask(model, prompt, temperature, seed)
 
 def ask_anthropic(model: str, prompt: str, temperature: float, seed: int) -> str:
-    import anthropic
-    client = anthropic.Anthropic()
-    resp = client.messages.create(
-        model=model,
-        max_tokens=800,
-        temperature=temperature,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return resp.content[0].text
+    return get_adapter("anthropic").ask(model, prompt, temperature, seed)
 
 def ask_gemini(model: str, prompt: str, temperature: float, seed: int) -> str:
-    import google.generativeai as genai
-    genai.configure()
-    m = genai.GenerativeModel(model)
-    resp = m.generate_content(prompt, generation_config={"temperature": temperature}, safety_settings=None)
-    return resp.text
-
-def ask_mock(model: str, prompt: str, temperature: float, seed: int) -> str:
-    random.seed(seed)
+    return get_adapter("gemini").ask(model, prompt, temperature, seed)
+
+def ask_mock(model: str, prompt: str, temperature: float, seed: int, latency: float = 0.0) -> str:
+    # latency simulates provider round-trip time for offline throughput benchmarks
+    if latency:
+        time.sleep(latency)
+    rng = random.Random(seed)  # private RNG: safe when called from worker threads
     # Minimal variability while still structured
     stances = ["cautiously positive", "balanced", "critical"]
     recs = ["individual coaching", "team drills", "defensive focus", "offensive sets"]
-    tone = random.choice(stances)
-    rec = ", ".join(random.sample(recs, 2))
+    tone = rng.choice(stances)
+    rec = ", ".join(rng.sample(recs, 2))
     return f"[MOCK:{model}] Tone: {tone}. Recommendations: {rec}. Rationale grounded in provided numbers."
 
-def main(args):
-    with open(args.manifest, "r") as f:
-        manifest = json.load(f)
-
-    models = manifest["models"]
-    temperature = manifest["temperature"]
-    n_samples = manifest["n_samples_per_prompt"]
-    prompts = manifest["prompts"]
+def make_record(provider: str, model: str, p: Dict[str, Any], seed: int, text: str) -> Dict[str, Any]:
+    return {
+        "timestamp": now_iso(),
+        "provider": provider,
+        "model": model,
+        "seed": seed,
+        "hypothesis_id": p["hypothesis_id"],
+        "condition": p["condition"],
+        "prompt_hash": prompt_digest(p["prompt"]),
+        "prompt": p["prompt"],
+        "response": text
+    }
 
-    provider = args.provider.lower()
+def get_asker(provider: str, mock_latency: float = 0.0):
     if provider == "openai":
-        asker = ask_openai
+        return ask_openai
     elif provider == "anthropic":
-        asker = ask_anthropic
+        return ask_anthropic
     elif provider == "gemini":
-        asker = ask_gemini
+        return ask_gemini
     elif provider == "mock":
-        asker = ask_mock
-    else:
-        raise ValueError("provider must be one of: openai, anthropic, gemini, mock")
+        return functools.partial(ask_mock, latency=mock_latency) if mock_latency else ask_mock
+    raise ValueError("provider must be one of: openai, anthropic, gemini, mock")
+
+class RecordSink:
+    # buffers records for jsonl_write and commits each one to the cache
+    # immediately; flush_every=0 leaves flushing to the caller
+    def __init__(self, outpath: str, cache: ResponseCache = None, flush_every: int = 50, on_add=None):
+        self.outpath = outpath
+        self.cache = cache
+        self.flush_every = flush_every
+        self.on_add = on_add  # observer called with every record (--adaptive)
+        self.done = set()  # cell keys already in outpath (--resume)
+        self.records = []
+        self.n_written = 0
+
+    def add(self, rec: Dict[str, Any], key: str = None):
+        if self.cache is not None and key is not None:
+            with instrument.stage("cache_put"):
+                self.cache.put(key, rec)
+        instrument.count("records")
+        if rec["response"].startswith("[ERROR]"):
+            instrument.count("errors")
+        self.records.append(rec)
+        if self.on_add is not None:
+            self.on_add(rec)
+        if self.flush_every and len(self.records) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            with instrument.stage("jsonl_write"):
+                jsonl_write(self.outpath, self.records)
+            self.n_written += len(self.records)
+            self.records = []
+
+def resumed(cell, provider, temperature, sink):
+    # re-emits a cell already in the cache; True when no call is needed
+    model, p, seed = cell[-3:]
+    key = cell_key(provider, model, p["prompt"], temperature, seed)
+    if key in sink.done:
+        # already in the interrupted run's file
+        instrument.count("resumed")
+        return True
+    if sink.cache is None:
+        return False
+    cached = sink.cache.get(key)
+    if cached is None:
+        return False
+    instrument.count("resumed")
+    sink.add(cached)
+    return True
+
+def pending_cells(cells, provider, temperature, sink, resume=False):
+    # with --resume, cells already in the output file are skipped and cells in
+    # the cache are re-emitted, both without a call
+    for model, p, seed in cells:
+        if resume and resumed((model, p, seed), provider, temperature, sink):
+            continue
+        yield model, p, seed
+
+def run_async(args, asker, provider, cells, total, temperature, sink):
+    from async_engine import ProviderLimiter, run_cells
+    from tqdm import tqdm
+    limiter = ProviderLimiter(concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+                              max_retries=args.max_retries)
+    bar = tqdm(total=total, desc=f"Provider={provider}, concurrency={limiter.concurrency}")
+
+    def on_result(model, p, seed, text):
+        sink.add(make_record(provider, model, p, seed, text),
+                 cell_key(provider, model, p["prompt"], temperature, seed))
+        bar.update(1)
+
+    try:
+        run_cells(asker, cells, temperature, limiter, on_result)
+    finally:
+        bar.close()
+
+def run_batch(args, asker, provider, manifest, span, temperature, sink):
+    # provider batch APIs: pack, submit, poll, unpack (see batch.py)
+    import hashlib
+    import batch
+    backend = batch.get_backend(provider, args.batch_dir, asker)
+    cells = ((i,) + cell for i, cell in zip(span, manifest.cells(span.start, span.stop)))
+    if getattr(args, "resume", False):
+        cells = (c for c in cells if not resumed(c, provider, temperature, sink))
+    key = hashlib.sha256(json.dumps([provider, manifest.spec, manifest.models, span.start, span.stop],
+                                    sort_keys=True).encode("utf-8")).hexdigest()
+
+    def on_result(i, text):
+        model, p, seed = manifest.cell(i)
+        k = cell_key(provider, model, p["prompt"], temperature, seed)
+        if k in sink.done:
+            # written before a crash that beat batch.run's offset update
+            instrument.count("resumed")
+            return
+        sink.add(make_record(provider, model, p, seed, text), k)
+
+    # batch.run flushes at the offsets it records in state.json; an automatic
+    # flush between them would be written again after a restart
+    flush_every, sink.flush_every = sink.flush_every, 0
+    batch.run(backend, cells, temperature, args.batch_dir, on_result, flush=sink.flush,
+              poll=args.batch_poll, key=key, flush_every=flush_every)
+
+def report_provider_stats():
+    for name, st in all_stats().items():
+        print(f"{name}: {st['requests']} requests, {st['clients_created']} clients, "
+              f"{st['reuse_count']} reuses, {st['errors']} errors, mean latency {st['mean_latency_s']:.3f}s")
+
+def latest_run(outdir: str, provider: str, suffix: str = ""):
+    # newest {stamp}_{provider}{suffix}.jsonl in outdir: the run --resume continues
+    rx = re.compile(r"\d{8}_\d{6}_" + re.escape(provider + suffix) + r"\.jsonl$")
+    names = sorted(fn for fn in os.listdir(outdir) if rx.match(fn)) if os.path.isdir(outdir) else []
+    return os.path.join(outdir, names[-1]) if names else None
+
+def load_partial(path: str):
+    # records of an interrupted run; [ERROR] placeholders (retried on resume)
+    # and a line cut off by the interruption are dropped from the file, so
+    # every cell appears in it once
+    recs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if not rec["response"].startswith("[ERROR]"):
+                recs.append(rec)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    jsonl_write(tmp, recs)
+    os.replace(tmp, path)
+    return recs
+
+def parse_shard(spec: str):
+    # "K/N" -> (K, N), shard K (0-based) of N
+    k, _, n = spec.partition("/")
+    return int(k), int(n)
+
+def main(args):
+    # compact or legacy manifest; cells are expanded lazily (see manifest.py)
+    manifest = Manifest.load(args.manifest, args.only_model)
+    temperature = manifest.temperature
+    span = range(len(manifest))
+    if getattr(args, "shard", ""):
+        span = manifest.shard(*parse_shard(args.shard))
+
+    provider = args.provider.lower()
+    asker = get_asker(provider, getattr(args, "mock_latency", 0.0))
+    if provider != "mock":
+        pool = getattr(args, "pool_size", 0) or max(16, getattr(args, "concurrency", 0))
+        configure_provider(provider, pool_size=pool, keepalive_expiry=getattr(args, "keepalive", 30.0),
+                           base_url=getattr(args, "base_url", "") or None)
 
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    outpath = os.path.join(args.outdir, f"{stamp}_{provider}.jsonl")
+    suffix = "_shard{}of{}".format(*parse_shard(args.shard)) if getattr(args, "shard", "") else ""
+    outpath = os.path.join(args.outdir, f"{stamp}_{provider}{suffix}.jsonl")
     ensure_dir(args.outdir)
 
-    records = []
-    for model in models:
-        if args.only_model and model != args.only_model:
-            continue
-        for p in tqdm(prompts, desc=f"Provider={provider}, model={model}"):
-            for i in range(n_samples):
-                seed = int(p["seed"]) + i
+    cache = ResponseCache(args.cache) if getattr(args, "cache", "") else None
+    if getattr(args, "resume", False) and cache is None:
+        raise ValueError("--resume requires --cache")
+    partial = []
+    if getattr(args, "resume", False):
+        # continue the interrupted run's file instead of starting a second one,
+        # which analysis would read alongside it
+        outpath = latest_run(args.outdir, provider, suffix) or outpath
+        if os.path.exists(outpath):
+            partial = load_partial(outpath)
+            print(f"Resuming {outpath}: {len(partial)} responses already written")
+    sink = RecordSink(outpath, cache)
+    sink.done = {cell_key(provider, r["model"], r["prompt"], temperature, r["seed"]) for r in partial}
+    total = len(span)
+    cells = pending_cells(manifest.cells(span.start, span.stop),
+                          provider, temperature, sink, getattr(args, "resume", False))
+    sampler = None
+    if getattr(args, "adaptive", False):
+        # early stopping: skip the cells of groups whose estimates are settled
+        if getattr(args, "batch", False):
+            raise ValueError("--adaptive needs responses as they arrive; it cannot be used with --batch")
+        from adaptive import AdaptiveSampler
+        sampler = AdaptiveSampler(args.precision, args.confidence, args.min_samples,
+                                  [m for m in args.adaptive_metrics.split(",") if m], args.sentiment_precision)
+        from collections import Counter
+        sizes = Counter((m, p["hypothesis_id"], p["condition"]) for m, p, _ in manifest.cells(span.start, span.stop))
+        need = sampler.min_settle_n()
+        if sizes and max(sizes.values()) <= need:
+            print(f"warning: --adaptive cannot skip any call: groups have at most {max(sizes.values())} cells, "
+                  f"but settling needs at least {need} responses at these targets; loosen --precision / "
+                  f"--sentiment_precision or collect more samples per group")
+        for rec in partial:
+            sampler.observe(rec)
+        sink.on_add = sampler.observe
+        cells = sampler.filter(cells)
+
+    try:
+        if getattr(args, "batch", False):
+            run_batch(args, asker, provider, manifest, span, temperature, sink)
+        elif getattr(args, "concurrency", 0) > 0:
+            run_async(args, asker, provider, cells, total, temperature, sink)
+        else:
+            from tqdm import tqdm
+            for model, p, seed in tqdm(cells, total=total, desc=f"Provider={provider}"):
                 try:
-                    text = asker(model, p["prompt"], temperature, seed)
+                    with instrument.stage("provider_call"):
+                        text = asker(model, p["prompt"], temperature, seed)
                 except Exception as e:
                     text = f"[ERROR] {type(e).__name__}: {e}"
-                rec = {
-                    "timestamp": now_iso(),
-                    "provider": provider,
-                    "model": model,
-                    "seed": seed,
-                    "hypothesis_id": p["hypothesis_id"],
-                    "condition": p["condition"],
-                    "prompt_hash": hash(p["prompt"]) % (10**10),
-                    "prompt": p["prompt"],
-                    "response": text
-                }
-                records.append(rec)
-
-            if len(records) >= 50:
-                jsonl_write(outpath, records)
-                records = []
-
-    if records:
-        jsonl_write(outpath, records)
-
-    print(f"Wrote responses to {outpath}")
+                sink.add(make_record(provider, model, p, seed, text),
+                         cell_key(provider, model, p["prompt"], temperature, seed))
+    finally:
+        # flush on any exit, including Ctrl-C, so nothing answered is lost
+        sink.flush()
+        if cache is not None:
+            print(f"Cache {args.cache}: {cache.hits} resumed, {len(cache)} stored")
+            cache.close()
 
-if __name__ == "__main__":
-    ap = argparse.ArgumentParser()
+    if sampler is not None:
+        instrument.count("skipped", sampler.skipped)
+        summary_path = outpath[:-len(".jsonl")] + ".adaptive.json"
+        with open(summary_path, "w") as f:
+            json.dump(sampler.summary(), f, indent=1)
+        print(f"Adaptive: {len(sampler.settled)}/{len(sampler.groups)} groups settled, "
+              f"{sampler.skipped} of {total} calls skipped ({summary_path})")
+
+    report_provider_stats()
+    # per-provider request/latency stats; async calls are not timed as stages
+    instrument.note("providers", all_stats())
+    print(f"Wrote {sink.n_written} responses to {outpath}")
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog)
     ap.add_argument("--manifest", default="prompts/manifest.json")
     ap.add_argument("--outdir", default="results")
     ap.add_argument("--provider", default="mock", help="openai|anthropic|gemini|mock")
     ap.add_argument("--only_model", default="", help="optional filter: only run a single model name")
-    args = ap.parse_args()
+    ap.add_argument("--shard", default="", help="K/N: run only the K-th (0-based) of N contiguous cell ranges")
+    ap.add_argument("--cache", default="", help="SQLite response cache path; every response is committed as it arrives")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue the newest run in --outdir: skip cells already in it, re-emit cells in --cache, "
+                         "and only issue missing calls")
+    ap.add_argument("--concurrency", type=int, default=0, help="async mode: max in-flight requests (0 = sequential)")
+    ap.add_argument("--rpm", type=float, default=0, help="async mode: requests per minute limit (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=0, help="async mode: estimated tokens per minute limit (0 = unlimited)")
+    ap.add_argument("--max_retries", type=int, default=6, help="async mode: retries with backoff when throttled")
+    ap.add_argument("--pool_size", type=int, default=0, help="HTTP connections per provider (0 = max(16, concurrency))")
+    ap.add_argument("--keepalive", type=float, default=30.0, help="seconds to keep idle connections alive")
+    ap.add_argument("--base_url", default="", help="override provider endpoint, e.g. a local stand-in server")
+    ap.add_argument("--batch", action="store_true", help="use the provider's batch API (openai, anthropic, mock)")
+    ap.add_argument("--batch_dir", default="batches", help="batch job files and resumable job state")
+    ap.add_argument("--batch_poll", type=float, default=30.0, help="seconds between batch status checks")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="stop sampling a (model, hypothesis, condition) group once its estimates are settled")
+    ap.add_argument("--precision", type=float, default=0.2,
+                    help="adaptive: target CI half-width of the recommended-player shares")
+    ap.add_argument("--sentiment_precision", type=float, default=0.02,
+                    help="adaptive: target CI half-width of the mean sentiment")
+    ap.add_argument("--confidence", type=float, default=0.95, help="adaptive: CI confidence level")
+    ap.add_argument("--min_samples", type=int, default=5, help="adaptive: responses per group before stopping")
+    ap.add_argument("--adaptive_metrics", default="sentiment,recommendation",
+                    help="adaptive: comma-separated estimates that must settle (sentiment, recommendation)")
+    ap.add_argument("--mock_latency", type=float, default=0.0, help="seconds of simulated latency per mock call")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("run_experiment", args)
     main(args)
+
+if __name__ == "__main__":
+    cli()
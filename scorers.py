@@ -0,0 +1,296 @@
+import argparse, hashlib, json, os, sqlite3, time, zlib
+
+import instrument
+from features import POS_WORDS, NEG_WORDS, POS_WORDS_PHASE3, NEG_WORDS_PHASE3, TOKEN_RE
+
+# Sentiment scorers behind one batch interface: score_batch(texts) takes a
+# pandas Series of responses and returns a float array, so analysis never makes
+# a per-record model call. Two backends:
+#   lexicon  the (#pos - #neg) / #tokens ratio of features.py, for either
+#            phase's word lists (the default; identical to extract_frame)
+#   ngram    a hashed uni/bigram linear model on CPU: tokens are hashed once
+#            per distinct token into n_features buckets, each response becomes
+#            a sparse vector of bucket counts / #tokens, and the score is its
+#            dot product with the weights (one weighted bincount per batch).
+#            Weights are fitted with `scorers.py fit`, by default distilled
+#            from a lexicon, or from a labelled column.
+# score_texts() scores in batches, deduplicates identical responses, caches
+# scores per (scorer version, response digest) in SQLite so a rescore only
+# touches new responses, and reports per-batch throughput.
+
+LEXICONS = {"phase2": (POS_WORDS, NEG_WORDS), "phase3": (POS_WORDS_PHASE3, NEG_WORDS_PHASE3)}
+META = ["provider", "model", "hypothesis_id", "condition", "seed"]
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=list).encode("utf-8")).hexdigest()[:16]
+
+class Scorer:
+    name = ""
+
+    def version(self) -> str:
+        # changes whenever scores would change; part of the cache key
+        raise NotImplementedError
+
+    def score_batch(self, texts):
+        raise NotImplementedError
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.version()}"
+
+class LexiconScorer(Scorer):
+    name = "lexicon"
+
+    def __init__(self, pos=POS_WORDS_PHASE3, neg=NEG_WORDS_PHASE3):
+        self.pos, self.neg = frozenset(pos), frozenset(neg)
+
+    def version(self):
+        return _digest([sorted(self.pos), sorted(self.neg)])
+
+    def score_batch(self, texts):
+        from features import sentiment_array
+        return sentiment_array(texts, self.pos, self.neg)
+
+def _mix(a, b):
+    # order-dependent combination of two uint64 token hashes
+    return (a * 1000003 ^ b) & 0xFFFFFFFF
+
+def _tokens(texts):
+    # (row, token hash) of every TOKEN_RE token in order, plus tokens per row
+    import numpy as np
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        rows, hashes, vocab = [], [], {}
+        for i, t in enumerate(texts.astype(str)):
+            for tok in TOKEN_RE.findall(t.lower()):
+                if tok not in vocab:
+                    vocab[tok] = zlib.crc32(tok.encode("utf-8"))
+                rows.append(i)
+                hashes.append(vocab[tok])
+        rows = np.array(rows, dtype=np.int64)
+        return rows, np.array(hashes, dtype=np.uint64), np.bincount(rows, minlength=len(texts))
+    from features import arrow_tokens
+    arr = pa.array(texts.astype(str))
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    flat, seg = arrow_tokens(arr)
+    rows = np.repeat(np.arange(len(arr)), np.diff(seg))
+    keep = pc.binary_length(flat).to_numpy(zero_copy_only=False) > 0
+    # hash each distinct token once, then gather
+    enc = pc.dictionary_encode(flat.filter(pa.array(keep)))
+    vocab = np.array([zlib.crc32(w.encode("utf-8")) for w in enc.dictionary.to_pylist()], dtype=np.uint64)
+    rows = rows[keep]
+    return rows, vocab[enc.indices.to_numpy(zero_copy_only=False)], np.bincount(rows, minlength=len(arr))
+
+class HashedNgramScorer(Scorer):
+    name = "ngram"
+
+    def __init__(self, weights=None, bias=0.0, n_features=1 << 18, ngram=2):
+        import numpy as np
+        self.n_features, self.ngram, self.bias = n_features, ngram, float(bias)
+        self.weights = np.zeros(n_features) if weights is None else np.asarray(weights, dtype=float)
+
+    def version(self):
+        return _digest([self.n_features, self.ngram, self.bias,
+                        hashlib.sha256(self.weights.tobytes()).hexdigest()])
+
+    def _ngrams(self, texts):
+        # (row, bucket) of every n-gram occurrence, plus tokens per row
+        import numpy as np
+        rows, h, ntok = _tokens(texts)
+        all_rows, cols = [rows], [h % self.n_features]
+        g = h
+        for k in range(1, self.ngram):
+            # n-grams ending at each token whose first token is in the same row
+            g = _mix(g[:-1], h[k:])
+            same = rows[k:] == rows[:-k]
+            all_rows.append(rows[k:][same])
+            cols.append(g[same] % self.n_features)
+        return np.concatenate(all_rows), np.concatenate(cols).astype(np.int64), ntok
+
+    def features(self, texts):
+        # sparse (len(texts), n_features) matrix of n-gram counts / #tokens
+        import numpy as np
+        from scipy import sparse
+        rows, cols, ntok = self._ngrams(texts)
+        vals = 1.0 / np.maximum(ntok, 1)[rows]
+        return sparse.csr_matrix((vals, (rows, cols)), shape=(len(ntok), self.n_features))
+
+    def score_batch(self, texts):
+        # == features(texts) @ weights + bias, without building the matrix
+        import numpy as np
+        rows, cols, ntok = self._ngrams(texts)
+        return np.bincount(rows, weights=self.weights[cols], minlength=len(ntok)) / np.maximum(ntok, 1) + self.bias
+
+    def fit(self, texts, y, l2=1e-4):
+        # ridge regression (damped LSQR) on the hashed features plus an intercept
+        import numpy as np
+        from scipy import sparse
+        from scipy.sparse.linalg import lsqr
+        X = sparse.hstack([self.features(texts), np.ones((len(y), 1))]).tocsr()
+        coef = lsqr(X, np.asarray(y, dtype=float), damp=l2 ** 0.5)[0]
+        self.weights, self.bias = coef[:-1], float(coef[-1])
+        return self
+
+    def save(self, path):
+        import numpy as np
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, n_features=self.n_features,
+                                ngram=self.ngram)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        with np.load(path) as z:
+            return cls(z["weights"], float(z["bias"]), int(z["n_features"]), int(z["ngram"]))
+
+def get_scorer(spec: str, pos=POS_WORDS_PHASE3, neg=NEG_WORDS_PHASE3) -> Scorer:
+    # "lexicon" (with the caller's word lists) or "ngram:<weights.npz>"
+    kind, _, path = spec.partition(":")
+    if kind == "lexicon":
+        return LexiconScorer(pos, neg)
+    if kind == "ngram" and path:
+        return HashedNgramScorer.load(path)
+    raise ValueError(f"unknown scorer {spec!r}; use lexicon or ngram:<weights.npz>")
+
+class ScoreCache:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS scores (scorer TEXT, digest TEXT, score REAL, "
+                          "PRIMARY KEY (scorer, digest))")
+        self.conn.commit()
+
+    def get_many(self, scorer: str, digests):
+        found, digests = {}, list(digests)
+        for i in range(0, len(digests), 500):
+            part = digests[i:i + 500]
+            q = f"SELECT digest, score FROM scores WHERE scorer = ? AND digest IN ({','.join('?' * len(part))})"
+            found.update(self.conn.execute(q, [scorer] + part))
+        return found
+
+    def put_many(self, scorer: str, pairs):
+        self.conn.executemany("INSERT OR REPLACE INTO scores (scorer, digest, score) VALUES (?, ?, ?)",
+                              [(scorer, d, float(s)) for d, s in pairs])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def score_texts(scorer: Scorer, texts, cache: ScoreCache = None, batch_size: int = 50000, stats=None):
+    # scores aligned with `texts` (a pandas Series); per-batch throughput is
+    # appended to `stats` and counted by instrument
+    import numpy as np
+    import pandas as pd
+    out = np.empty(len(texts))
+    for start in range(0, len(texts), batch_size):
+        t0 = time.perf_counter()
+        batch = texts.iloc[start:start + batch_size].astype(str)
+        digests = [text_digest(t) for t in batch]
+        todo = dict(zip(digests, batch))  # distinct responses of the batch
+        known = cache.get_many(scorer.key, todo) if cache is not None else {}
+        for d in known:
+            del todo[d]
+        if todo:
+            with instrument.stage("score_batch"):
+                known.update(zip(todo, scorer.score_batch(pd.Series(list(todo.values())))))
+            if cache is not None:
+                cache.put_many(scorer.key, ((d, known[d]) for d in todo))
+        out[start:start + len(batch)] = [known[d] for d in digests]
+        dt = time.perf_counter() - t0
+        instrument.count("scored", len(todo))
+        instrument.count("score_reused", len(batch) - len(todo))
+        if stats is not None:
+            stats.append({"records": len(batch), "scored": len(todo), "seconds": dt,
+                          "records_per_s": len(batch) / dt if dt else float("inf")})
+    return out
+
+def _frames(path, columns, chunksize):
+    import pandas as pd
+    from columnar import is_columnar, iter_frames
+    from streaming import iter_chunks
+    if is_columnar(path):
+        yield from iter_frames(path, columns, chunksize)
+    else:
+        for chunk in iter_chunks(path, chunksize):
+            yield pd.DataFrame(chunk).reindex(columns=columns)
+
+def report(stats):
+    n = sum(s["records"] for s in stats)
+    secs = sum(s["seconds"] for s in stats)
+    summary = {"batches": len(stats), "records": n, "scored": sum(s["scored"] for s in stats),
+               "seconds": secs, "records_per_s": n / secs if secs else 0.0}
+    instrument.note("scoring", dict(summary, per_batch=stats))
+    print(f"Scored {n} records in {len(stats)} batches ({summary['scored']} computed, the rest deduplicated "
+          f"or cached): {secs:.2f}s, {summary['records_per_s']:.0f} records/s")
+
+def main(args):
+    pos, neg = LEXICONS[args.lexicon]
+    if args.cmd == "fit":
+        import numpy as np
+        import pandas as pd
+        texts, ys = [], []
+        for df in _frames(args.results, ["response"] + ([args.target] if args.target else []), args.chunksize):
+            instrument.count("records", len(df))
+            texts.append(df["response"].astype(str))
+            ys.append(df[args.target].to_numpy(dtype=float) if args.target
+                      else LexiconScorer(pos, neg).score_batch(df["response"]))
+        texts, y = pd.concat(texts, ignore_index=True), np.concatenate(ys)
+        model = HashedNgramScorer(n_features=1 << args.bits, ngram=args.ngram)
+        with instrument.stage("fit"):
+            model.fit(texts, y, args.l2)
+        model.save(args.out)
+        with instrument.stage("score_batch"):
+            err = model.score_batch(texts) - y
+        print(f"Fitted {model.key} on {len(y)} responses (target: {args.target or 'lexicon ' + args.lexicon}), "
+              f"train RMSE {float(np.sqrt((err ** 2).mean())):.5f} -> {args.out}")
+        return
+
+    scorer = get_scorer(args.scorer, pos, neg)
+    cache = ScoreCache(args.cache) if args.cache else None
+    stats = []
+    if os.path.exists(args.out):
+        os.remove(args.out)
+    try:
+        for df in _frames(args.results, META + ["response"], args.chunksize):
+            instrument.count("records", len(df))
+            df = df[META].assign(sentiment=score_texts(scorer, df["response"], cache, args.batch_size, stats))
+            df.to_csv(args.out, mode="a", header=not os.path.exists(args.out), index=False)
+            print(f"batch {len(stats)}: {stats[-1]['records']} records, {stats[-1]['scored']} scored, "
+                  f"{stats[-1]['records_per_s']:.0f} records/s")
+    finally:
+        if cache is not None:
+            cache.close()
+    report(stats)
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog, description="Fit or apply a batched sentiment scorer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("score", "fit"):
+        p = sub.add_parser(name)
+        p.add_argument("--results", required=True, help="JSONL results file or columnar .parquet store")
+        p.add_argument("--lexicon", default="phase3", choices=sorted(LEXICONS),
+                       help="word lists of the lexicon scorer (and of the default fit target)")
+        p.add_argument("--chunksize", type=int, default=200000, help="records read per chunk")
+        instrument.add_arguments(p)
+    sc, fit = sub.choices["score"], sub.choices["fit"]
+    sc.add_argument("--scorer", default="lexicon", help="lexicon or ngram:<weights.npz>")
+    sc.add_argument("--batch_size", type=int, default=50000, help="responses per scoring batch")
+    sc.add_argument("--cache", default="", help="SQLite score cache keyed by scorer version and response digest")
+    sc.add_argument("--out", default="scores.csv", help="per-record scores (CSV)")
+    fit.add_argument("--target", default="", help="record column with labels (default: the lexicon score)")
+    fit.add_argument("--bits", type=int, default=18, help="log2 of the number of hash buckets")
+    fit.add_argument("--ngram", type=int, default=2, help="longest n-gram")
+    fit.add_argument("--l2", type=float, default=1e-4, help="ridge penalty")
+    fit.add_argument("--out", default="ngram_scorer.npz", help="where the fitted weights are written")
+    args = ap.parse_args(argv)
+    instrument.from_args(f"scorers_{args.cmd}", args)
+    main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,2 @@
+# Shared helpers (utils) and the unified command line (cli, `python -m scripts`)
+# for the top-level pipeline scripts.
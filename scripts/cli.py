@@ -0,0 +1,47 @@
+import importlib, os, sys
+
+# One command line for the pipeline: `python -m scripts <command> [options]`.
+# Each command maps to a top-level entry script and runs its cli(); the script
+# is only imported once its command is chosen, and the scripts themselves
+# import pandas/scipy/numpy/matplotlib/tqdm inside the functions that use
+# them, so short jobs (a shard, a validation run, --help) do not pay for
+# libraries they never touch. benchmarks/bench_startup.py times every command
+# against a cold-start budget. The entry scripts are top-level modules
+# installed alongside this package (see pyproject.toml); the same commands are
+# available as the `bias-detection` console script.
+
+# command -> (entry module, summary)
+COMMANDS = {
+    "design": ("experiment_design", "build the prompt manifest"),
+    "collect": ("run_experiment", "query a provider for every manifest cell"),
+    "queue": ("coordinator", "sharded collection through a SQLite work queue"),
+    "analyze": ("analyze_script", "phase-3 features, aggregates and tests"),
+    "bias": ("analyze_bias", "phase-2 bias tests (H1/H2)"),
+    "validate": ("validate_claims", "check numeric claims against the ground truth"),
+    "score": ("scorers", "fit or apply a batched sentiment scorer"),
+    "convert": ("columnar", "convert JSONL results to the columnar store"),
+    "plot": ("visualizations", "render figures from the analysis CSVs"),
+}
+
+def program() -> str:
+    # how we were invoked: `python -m scripts` or the console script
+    name = os.path.basename(sys.argv[0])
+    return "python -m scripts" if name in ("__main__.py", "-m", "") else name
+
+def usage() -> str:
+    lines = [f"usage: {program()} <command> [options]", "", "commands:"]
+    lines += [f"  {name:10s}{summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", f"{program()} <command> --help lists a command's options"]
+    return "\n".join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"unknown command {argv[0]!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[argv[0]][0])
+    module.cli(argv[1:], prog=f"{program()} {argv[0]}")
+    return 0
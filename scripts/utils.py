@@ -0,0 +1,28 @@
+import hashlib, json, os
+from datetime import datetime
+
+# Small stdlib-only helpers shared by the entry points; importing this module
+# must stay cheap (see scripts/cli.py).
+
+def ensure_dir(path: str):
+    if path:
+        os.makedirs(path, exist_ok=True)
+
+def now_iso() -> str:
+    # local time, second resolution, e.g. 2025-11-01T19:57:59
+    return datetime.now().isoformat(timespec="seconds")
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def jsonl_write(path: str, records):
+    # appends, so a run's output can be written in flushes
+    with open(path, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def read_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,228 @@
+import json, math
+from collections import Counter, defaultdict
+
+import instrument
+from features import PLAYERS, MENTION_COLS, extract_frame
+
+# Streaming, bounded-memory analysis: JSONL files are read in chunks, features
+# are extracted per chunk, and only running aggregates per (hypothesis_id,
+# condition) are kept. Memory depends on chunksize and on the number of
+# distinct conditions, never on the number of responses.
+
+KEYS = ["hypothesis_id", "condition"]
+
+class ExactSum:
+    # Shewchuk's exact float summation (the algorithm behind math.fsum), kept
+    # incrementally. The result is independent of addition order, so chunked,
+    # merged and serial runs give bit-identical means.
+    def __init__(self):
+        self.partials = []
+
+    def add(self, x: float):
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def merge(self, other: "ExactSum"):
+        for x in other.partials:
+            self.add(x)
+
+    def value(self) -> float:
+        return math.fsum(self.partials)
+
+def exact_mean(values) -> float:
+    # the mean RunningAggregates reports, for pandas groupby(...).agg in the
+    # in-memory paths, so serial and streamed CSVs match byte for byte
+    values = list(values)
+    return math.fsum(values) / len(values)
+
+class RunningAggregates:
+    def __init__(self, categorical=("recommended_player",), mentions=True):
+        self.categorical = list(categorical)
+        self.mentions = mentions
+        self.sent_sum = defaultdict(ExactSum)
+        self.n = Counter()
+        self.counts = {c: Counter() for c in self.categorical}
+        self.mention_totals = Counter()
+
+    def update(self, af):
+        # af: per-record feature frame with KEYS, sentiment and feature columns
+        if af.empty:
+            return
+        keys = list(zip(af["hypothesis_id"], af["condition"]))
+        for k, s in zip(keys, af["sentiment"].tolist()):
+            self.sent_sum[k].add(s)
+        self.n.update(keys)
+        for c in self.categorical:
+            self.counts[c].update(zip(af["hypothesis_id"], af["condition"], af[c]))
+        if self.mentions:
+            sums = af.groupby(KEYS, sort=False)[MENTION_COLS].sum()
+            for (hid, cond), row in zip(sums.index, sums.to_numpy().tolist()):
+                for p, v in zip(PLAYERS, row):
+                    self.mention_totals[(hid, cond, p)] += int(v)
+
+    def merge(self, other: "RunningAggregates"):
+        for k, s in other.sent_sum.items():
+            self.sent_sum[k].merge(s)
+        self.n.update(other.n)
+        for c in self.categorical:
+            self.counts[c].update(other.counts[c])
+        self.mention_totals.update(other.mention_totals)
+        return self
+
+    # --- outputs, shaped like the pandas groupby results they replace ---
+
+    def sentiment_frame(self):
+        import pandas as pd
+        rows = [{"hypothesis_id": h, "condition": c,
+                 "mean_sentiment": self.sent_sum[(h, c)].value() / self.n[(h, c)], "n": self.n[(h, c)]}
+                for h, c in sorted(self.n)]
+        return pd.DataFrame(rows, columns=["hypothesis_id", "condition", "mean_sentiment", "n"])
+
+    def count_frame(self, col: str):
+        import pandas as pd
+        rows = [{"hypothesis_id": h, "condition": c, col: v, "count": n}
+                for (h, c, v), n in sorted(self.counts[col].items())]
+        return pd.DataFrame(rows, columns=["hypothesis_id", "condition", col, "count"])
+
+    def mentions_frame(self):
+        import pandas as pd
+        rows = [{"hypothesis_id": h, "condition": c, "entity": e, "total_mentions": n}
+                for (h, c, e), n in sorted(self.mention_totals.items())]
+        return pd.DataFrame(rows, columns=["hypothesis_id", "condition", "entity", "total_mentions"])
+
+    def crosstab(self, hid: str, col: str):
+        # equivalent of pd.crosstab(sub["condition"], sub[col]) for one hypothesis
+        import pandas as pd
+        cells = {(c, v): n for (h, c, v), n in self.counts[col].items() if h == hid and n}
+        if not cells:
+            return pd.DataFrame()
+        rows = sorted({c for c, _ in cells})
+        cols = sorted({v for _, v in cells})
+        return pd.DataFrame([[cells.get((r, v), 0) for v in cols] for r in rows], index=rows, columns=cols)
+
+def iter_chunks(path: str, chunksize: int = 50000, start: int = 0, end: int = None):
+    # yields lists of parsed records; [start, end) optionally restricts the scan
+    # to a byte range (lines are assigned to the range their first byte falls in)
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles `start`
+        chunk = []
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def iter_records(path: str, columns, chunksize=50000, start=0, end=None):
+    # record dicts from JSONL (byte range) or Parquet (row-group range) files
+    from columnar import is_columnar, iter_frames
+    if is_columnar(path):
+        for df in iter_frames(path, columns, chunksize, start, end):
+            yield from df.to_dict("records")
+    else:
+        for chunk in iter_chunks(path, chunksize, start, end):
+            yield from chunk
+
+def feature_frames(path, pos, neg, axes=True, chunksize=50000, start=0, end=None):
+    # per-chunk feature frames; Parquet files with stored feature columns skip extraction
+    import pandas as pd
+    from columnar import is_columnar, iter_frames, has_features, sentiment_col, AXIS_COLS
+    if is_columnar(path):
+        scol = sentiment_col(pos, neg)
+        need = ["recommended_player"] + (AXIS_COLS + MENTION_COLS if axes else [])
+        if scol and has_features(path, [scol] + need):
+            for df in iter_frames(path, KEYS + [scol] + need, chunksize, start, end):
+                yield df.rename(columns={scol: "sentiment"})
+            return
+        frames = iter_frames(path, KEYS + ["response"], chunksize, start, end)
+    else:
+        frames = (pd.DataFrame(chunk, columns=KEYS + ["response"])
+                  for chunk in iter_chunks(path, chunksize, start, end))
+    for raw in frames:
+        with instrument.stage("extract_features"):
+            af = pd.concat([raw[KEYS], extract_frame(raw["response"], pos, neg, axes=axes)], axis=1)
+        yield af
+
+def new_aggregates(axes=True):
+    # analyze_script tracks axes and mentions; analyze_bias (axes=False) neither
+    if axes:
+        return RunningAggregates(("recommended_player", "strategy_axis", "scope_axis"))
+    return RunningAggregates(("recommended_player",), mentions=False)
+
+def aggregate_file(path, pos, neg, axes=True, chunksize=50000, start=0, end=None, agg=None):
+    if agg is None:
+        agg = new_aggregates(axes)
+    for af in feature_frames(path, pos, neg, axes, chunksize, start, end):
+        with instrument.stage("aggregate"):
+            agg.update(af)
+    return agg
+
+def plan_shards(paths, n_shards: int):
+    # split files into ~n_shards ranges (path, start, end), in file order: byte
+    # ranges for JSONL, row-group ranges for Parquet. Concatenating shard
+    # results in this order reproduces a serial scan.
+    import os
+    from columnar import is_columnar, num_row_groups
+    sizes = [(p, os.path.getsize(p)) for p in paths]
+    total = sum(s for _, s in sizes)
+    target = max(1, -(-total // max(1, n_shards)))
+    shards = []
+    for p, size in sizes:
+        if is_columnar(p):
+            groups = num_row_groups(p)
+            parts = max(1, min(groups, round(size / target)))
+            bounds = [groups * i // parts for i in range(parts + 1)]
+            shards.extend((p, a, b) for a, b in zip(bounds, bounds[1:]))
+            continue
+        start = 0
+        while start < size:
+            end = min(size, start + target)
+            shards.append((p, start, end))
+            start = end
+    return shards
+
+def _aggregate_shard(job):
+    path, start, end, pos, neg, axes, chunksize = job
+    return aggregate_file(path, pos, neg, axes=axes, chunksize=chunksize, start=start, end=end)
+
+def map_shards(fn, jobs, workers: int):
+    # ordered map over shard jobs, in a process pool when workers > 1
+    if workers <= 1:
+        return [fn(j) for j in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        if not instrument.enabled():
+            return list(ex.map(fn, jobs))
+        # workers record into their own recorder; merged here
+        out = []
+        for res, snap in ex.map(instrument.traced, [(fn, j) for j in jobs]):
+            instrument.merge(snap)
+            out.append(res)
+        return out
+
+def aggregate_parallel(paths, pos, neg, axes=True, workers=1, chunksize=50000, agg=None):
+    # several shards per worker to even out skewed file sizes
+    shards = plan_shards(paths, workers * 4 if workers > 1 else 1)
+    jobs = [(p, s, e, pos, neg, axes, chunksize) for p, s, e in shards]
+    if agg is None:
+        agg = new_aggregates(axes)
+    for part in map_shards(_aggregate_shard, jobs, workers):
+        agg.merge(part)
+    return agg
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from adaptive import AdaptiveSampler, GroupEstimate
+
+# The stopping rule on inputs whose answer is known: Agresti-Coull share
+# intervals at z=1.96 and the Welford sentiment interval.
+
+A = "Player A should get individual coaching."
+B = "Player B should get individual coaching."
+
+def rec(text, model="m", hid="H1", cond="neutral"):
+    return {"model": model, "hypothesis_id": hid, "condition": cond, "response": text}
+
+def settles_after(sampler, texts):
+    # responses observed when the group first counts as settled
+    for n, text in enumerate(texts, 1):
+        sampler.observe(rec(text))
+        if sampler.settled:
+            return n
+    return None
+
+def test_min_settle_n():
+    assert AdaptiveSampler().min_settle_n() == 9
+    assert AdaptiveSampler(precision=0.05).min_settle_n() == 50
+    assert AdaptiveSampler(min_samples=20).min_settle_n() == 20
+    assert AdaptiveSampler(metrics=["sentiment"]).min_settle_n() == 5
+    assert AdaptiveSampler(metrics=["sentiment"], min_samples=1).min_settle_n() == 2
+
+def test_unanimous_group_settles_at_min_settle_n():
+    s = AdaptiveSampler()
+    assert settles_after(s, [A] * 50) == s.min_settle_n() == 9
+
+def test_split_group_needs_more_responses():
+    # shares near 1/2 have the widest interval: 1.96 * 0.5 / sqrt(n + 1.96^2) <= 0.2
+    assert settles_after(AdaptiveSampler(), [A, B] * 50) == 21
+
+def test_share_halfwidth():
+    g = GroupEstimate()
+    assert g.share_halfwidth(1.96) == math.inf
+    g.n, g.recs = 20, {"Player A": 10, "Player B": 10}
+    assert g.share_halfwidth(1.96) == pytest.approx(1.96 * 0.5 / math.sqrt(20 + 1.96 ** 2))
+
+def test_sentiment_interval():
+    # sentiment -0.25 ("risk" in four tokens) and 0 alternating; the sample sd
+    # is ~0.128, so the 95% half-width reaches 0.05 at n=25 (0.0511 at n=24)
+    s = AdaptiveSampler(metrics=["sentiment"], sentiment_precision=0.05)
+    assert settles_after(s, ["Player A risk should.", "Player A should now."] * 20) == 25
+    g = s.groups[("m", "H1", "neutral")]
+    assert g.mean == pytest.approx(-0.25 * 13 / 25)
+    assert g.sentiment_halfwidth(s.z) == pytest.approx(1.96 * math.sqrt(13 * 12 / 25 * 0.0625 / 24 / 25), rel=1e-3)
+
+def test_errors_do_not_count():
+    s = AdaptiveSampler()
+    for _ in range(20):
+        s.observe(rec("[ERROR] Timeout"))
+    assert s.groups[("m", "H1", "neutral")].n == 0 and not s.settled
+
+def test_filter_skips_cells_of_settled_groups():
+    s = AdaptiveSampler()
+    for _ in range(9):
+        s.observe(rec(A, hid="H1"))
+    cells = [("m", {"hypothesis_id": h, "condition": "neutral"}, seed) for h in ("H1", "H2") for seed in range(3)]
+    kept = list(s.filter(cells))
+    assert [(p["hypothesis_id"], seed) for _, p, seed in kept] == [("H2", 0), ("H2", 1), ("H2", 2)]
+    assert s.skipped == 3
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(ValueError, match="unknown adaptive metrics"):
+        AdaptiveSampler(metrics=["recommendation", "tone"])
@@ -0,0 +1,23 @@
+import asyncio
+
+from async_engine import ProviderLimiter, TokenBucket, run_cells
+
+def echo(model, prompt, temperature, seed):
+    return f"{model}:{prompt}:{seed}"
+
+def test_limiter_is_reused_across_event_loops():
+    # coordinator keeps one limiter for every batch, and each batch is its own
+    # asyncio.run; the rpm bucket (capacity 2) makes the workers queue on its lock
+    limiter = ProviderLimiter(concurrency=4, rpm=6000)
+    limiter.rpm.capacity = limiter.rpm.tokens = 2
+    for batch in range(2):
+        out = []
+        cells = [("m", {"prompt": f"p{i}"}, batch) for i in range(8)]
+        run_cells(echo, cells, 0.0, limiter, lambda m, p, s, text: out.append(text))
+        assert sorted(out) == sorted(f"m:p{i}:{batch}" for i in range(8))
+
+def test_bucket_can_be_built_outside_the_loop():
+    bucket = TokenBucket(60)
+    assert bucket.lock is None
+    asyncio.run(bucket.acquire(1))
+    assert bucket.tokens < 60
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import batch
+from run_experiment import ask_mock
+
+# batch.py against MockBatchBackend: packing, resuming a run from state.json,
+# and restarting after a crash part way through unpacking a job
+
+PROMPT = {"prompt": "Assess Player A."}
+
+def cells(n, models=("m1",)):
+    return [(i, models[i * len(models) // n], PROMPT, i) for i in range(n)]
+
+def backend(tmp_path):
+    return batch.MockBatchBackend(str(tmp_path / "server"), ask_mock)
+
+class Sink:
+    # stands in for RecordSink: results handed over reach "written" on flush
+    def __init__(self, crash_after=None):
+        self.buffered, self.written, self.crash_after = [], [], crash_after
+
+    def on_result(self, i, text):
+        if self.crash_after is not None and len(self.written) + len(self.buffered) == self.crash_after:
+            raise KeyboardInterrupt
+        self.buffered.append(i)
+
+    def flush(self):
+        self.written += self.buffered
+        self.buffered = []
+
+def test_pack_splits_by_model_and_request_limit(tmp_path):
+    b = backend(tmp_path)
+    b.max_requests = 4
+    jobs = batch.pack(b, cells(12, models=("m1", "m2")), 0.7, str(tmp_path))
+    assert [(j["model"], j["requests"]) for j in jobs] == [("m1", 4), ("m1", 2), ("m2", 4), ("m2", 2)]
+    with open(jobs[0]["file"]) as f:
+        first = json.loads(f.readline())
+    assert first["custom_id"] == "cell-0"
+    assert first["body"]["seed"] == 0 and first["body"]["temperature"] == 0.7
+
+def test_run_emits_every_cell_once_in_order(tmp_path):
+    b = backend(tmp_path)
+    b.max_requests = 5
+    sink = Sink()
+    state = batch.run(b, cells(12), 0.7, str(tmp_path), sink.on_result, flush=sink.flush, poll=0, flush_every=3)
+    assert sink.written == list(range(12))
+    assert all(j["collected"] and j["emitted"] == j["requests"] for j in state["jobs"])
+
+def test_errors_are_unpacked_as_records(tmp_path):
+    b = batch.MockBatchBackend(str(tmp_path / "server"), ask_mock, error_rate=0.5)
+    texts = {}
+    batch.run(b, cells(20), 0.7, str(tmp_path), texts.__setitem__, poll=0)
+    assert sorted(texts) == list(range(20))
+    assert 0 < sum(t.startswith("[ERROR] BatchError") for t in texts.values()) < 20
+
+def test_restart_resumes_without_resubmitting(tmp_path, monkeypatch):
+    b = backend(tmp_path)
+    b.status = lambda batch_id: "running"
+
+    def interrupt(seconds):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as m:
+        m.setattr(batch.time, "sleep", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            batch.run(b, cells(6), 0.7, str(tmp_path), lambda i, t: None, poll=0, key="k")
+    ids = [j["id"] for j in json.load(open(tmp_path / "state.json"))["jobs"]]
+
+    b = backend(tmp_path)
+    submitted = []
+    b.submit = submitted.append
+    sink = Sink()
+    state = batch.run(b, cells(6), 0.7, str(tmp_path), sink.on_result, flush=sink.flush, poll=0, key="k")
+    assert submitted == [] and [j["id"] for j in state["jobs"]] == ids
+    assert sink.written == list(range(6))
+
+def test_restart_mid_unpack_does_not_duplicate(tmp_path):
+    b = backend(tmp_path)
+    b.max_requests = 10
+    first = Sink(crash_after=14)  # job 0 collected, job 1 crashes after one flushed slice
+    with pytest.raises(KeyboardInterrupt):
+        batch.run(b, cells(25), 0.7, str(tmp_path), first.on_result, flush=first.flush, poll=0, flush_every=3)
+    assert first.written == list(range(13))
+    jobs = json.load(open(tmp_path / "state.json"))["jobs"]
+    assert [j.get("collected", False) for j in jobs] == [True, False, False]
+    assert jobs[1]["emitted"] == 3
+
+    second = Sink()
+    batch.run(b, cells(25), 0.7, str(tmp_path), second.on_result, flush=second.flush, poll=0, flush_every=3)
+    assert first.written + second.written == list(range(25))
+
+def test_state_of_another_run_is_rejected(tmp_path):
+    batch.run(backend(tmp_path), cells(3), 0.7, str(tmp_path), lambda i, t: None, poll=0, key="a")
+    with pytest.raises(ValueError, match="different run"):
+        batch.run(backend(tmp_path), cells(3), 0.7, str(tmp_path), lambda i, t: None, poll=0, key="b")
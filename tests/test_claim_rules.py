@@ -0,0 +1,59 @@
+import json, os, random, re
+
+import pytest
+
+from claim_rules import ClaimChecker
+from benchmarks.bench_claims import ResponseSynth, baseline_check, checkers, timed
+
+# The keyword prescan against a brute-force search, windowed checks against
+# checks over the whole text, and throughput against the original checker.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def truth():
+    with open(os.path.join(ROOT, "su_stats_excerpt.json")) as f:
+        return json.load(f)
+
+def hits(checker, text):
+    return {i: set(starts) for i, starts in checker._hits(text.lower()).items()}
+
+def brute_hits(checker, text):
+    low, found = text.lower(), {}
+    for i, r in enumerate(checker.rules):
+        for k in r["keywords"]:
+            for m in re.finditer(f"(?={re.escape(k.lower())})", low):
+                found.setdefault(i, set()).add(m.start())
+    return found
+
+def test_prescan_finds_every_keyword_start(truth):
+    spec = {"rules": [
+        {"id": "a", "kind": "outlier", "keywords": ["shot", "shots on goal"], "pattern": "shot", "threshold": 1},
+        {"id": "b", "kind": "outlier", "keywords": ["goal", "on go"], "pattern": "goal", "threshold": 1},
+        {"id": "c", "kind": "outlier", "keywords": ["goalie", "sog", "ogo"], "pattern": "sog", "threshold": 1},
+    ]}
+    checker = ClaimChecker(truth, spec)
+    rng = random.Random(0)
+    pieces = ["shot", "shots on goal", "goalie", "s", "og", "o", "n ", " ", "goa", "Shots On Goalie"]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert hits(checker, text) == brute_hits(checker, text), text
+
+def test_windows_agree_with_full_scan(truth):
+    checker = ClaimChecker(truth)
+    for rec in ResponseSynth().records(300, seed=3):
+        text = rec["response"]
+        full = []
+        for i in sorted(brute_hits(checker, text)):
+            rule = checker.rules[i]
+            getattr(checker, "_" + rule["kind"])(rule, text, [(0, len(text))], full)
+        assert checker.check(text) == full
+
+def test_throughput_not_below_baseline(truth):
+    # the three ported rules do the baseline's work; a prescan slower than the
+    # checks it gates showed up as 2x the baseline time
+    texts = [r["response"] for r in ResponseSynth().records(2000)]
+    ported, _ = checkers(truth)
+    t_base = timed(lambda t: baseline_check(t, truth), texts, 3)
+    t_rules = timed(ported.check, texts, 3)
+    assert t_rules < 1.25 * t_base, f"ClaimChecker {t_rules:.3f}s vs baseline {t_base:.3f}s"
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import columnar
+from features import POS_WORDS, NEG_WORDS, extract_frame
+
+# convert(): fixed column types across chunks and files, nothing left at `out`
+# when a conversion fails, and stored features that are only used while their
+# version stamp matches.
+
+def record(i, prompt_hash):
+    return {"timestamp": f"t{i}", "provider": "mock", "model": "m", "seed": i, "hypothesis_id": "H1",
+            "condition": "neutral", "prompt_hash": prompt_hash, "prompt": "p",
+            "response": f"Player A should focus on strong defense {i}."}
+
+def write(path, recs):
+    with open(path, "w") as f:
+        for r in recs:
+            f.write(json.dumps(r) + "\n")
+    return str(path)
+
+def test_types_are_normalized_across_chunks(tmp_path):
+    a = write(tmp_path / "a.jsonl", [record(i, 1234567890) for i in range(5)])
+    b = write(tmp_path / "b.jsonl", [record(i, "987") for i in range(5)] + [dict(record(5, 1), seed=None)])
+    out = str(tmp_path / "store.parquet")
+    assert columnar.convert([a, b], out, chunksize=2) == 11
+    df = columnar.read_columns(out, ["seed", "prompt_hash", "sentiment", "response"])
+    assert df["prompt_hash"].tolist()[4:7] == [1234567890, 987, 987]
+    assert df["seed"].isna().sum() == 1
+    assert df["sentiment"].tolist() == extract_frame(df["response"], POS_WORDS, NEG_WORDS, axes=False)["sentiment"].tolist()
+
+def test_failed_conversion_leaves_no_store(tmp_path):
+    a = write(tmp_path / "a.jsonl", [record(i, 1234567890) for i in range(40)])
+    b = write(tmp_path / "b.jsonl", [record(0, "9f86d081884c7d65")])
+    out = tmp_path / "store.parquet"
+    out.write_bytes(b"previous")
+    with pytest.raises(ValueError, match=r"b\.jsonl: column 'prompt_hash'"):
+        columnar.convert([a, b], str(out), chunksize=10)
+    assert out.read_bytes() == b"previous"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.jsonl", "b.jsonl", "store.parquet"]
+
+def test_stale_features_are_not_used(tmp_path, monkeypatch):
+    out = str(tmp_path / "store.parquet")
+    columnar.convert([write(tmp_path / "a.jsonl", [record(i, 1) for i in range(3)])], out)
+    assert columnar.has_features(out, ["sentiment", "recommended_player"])
+    monkeypatch.setattr(columnar, "features_version", lambda: "other lexicon")
+    with pytest.warns(UserWarning, match="recomputing"):
+        assert not columnar.has_features(out, ["sentiment", "recommended_player"])
+
+def test_responses_only_store_has_no_features(tmp_path):
+    out = str(tmp_path / "raw.parquet")
+    columnar.convert([write(tmp_path / "a.jsonl", [record(i, 1) for i in range(3)])], out, with_features=False)
+    assert not columnar.has_features(out, ["sentiment"])
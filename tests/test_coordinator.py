@@ -0,0 +1,32 @@
+import json
+
+from coordinator import FAILED, LEASED, PartWriter, WorkQueue, merge
+
+SPEC = {"models": ["m"], "temperature": 0.7, "n_samples_per_prompt": 1,
+        "prompts": [{"prompt": f"p{i}"} for i in range(6)]}
+
+def test_merge_counts_only_written_records(tmp_path, capsys):
+    queue = WorkQueue(str(tmp_path / "q.sqlite"))
+    queue.init(SPEC, max_attempts=1)
+    part = PartWriter(str(tmp_path / "parts" / "part-w.jsonl"))
+    idx = queue.lease("w", 4, 60)
+    results = []
+    for i in idx[:3]:
+        text = "[ERROR] Boom: x" if i == 2 else "ok"
+        results.append((i, part.name, part.append({"cell": i, "response": text}), text if i == 2 else None))
+    part.flush()
+    queue.complete("w", results)
+    # cell 3 was leased by a worker that died: its lease expires at max_attempts
+    queue.conn.execute("UPDATE cells SET lease_until = 0 WHERE state = ?", (LEASED,))
+    queue.lease("w", 0, 60)
+    assert queue.counts()[FAILED] == 2
+    queue.close()
+
+    out = tmp_path / "run.jsonl"
+    n = merge(str(tmp_path / "q.sqlite"), str(tmp_path / "parts"), str(out), partial=True)
+    with open(out) as f:
+        assert [json.loads(line)["cell"] for line in f] == [0, 1, 2]
+    assert n == 3
+    merged, notes = capsys.readouterr().out.splitlines()
+    assert merged == f"Merged 3 records into {out}"
+    assert notes == "  1 failed cells merged with [ERROR] responses; no record for 2 pending, 1 failed cells"
@@ -0,0 +1,49 @@
+import json, os, subprocess, sys
+
+import pytest
+
+from benchmarks.corpus import write_corpus
+
+# The "records" counter is kept in one layer (the entry points), so it equals
+# the number of input records whether a run is serial, sharded over --workers,
+# or reads a columnar store.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+N = 300
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory):
+    d = tmp_path_factory.mktemp("results")
+    write_corpus(str(d / "corpus.jsonl"), N, seed=1)
+    return d
+
+def records(tmp_path, script, *args):
+    metrics = tmp_path / f"{script}-{len(os.listdir(tmp_path))}.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, script), *args, "--metrics", str(metrics)],
+                   cwd=tmp_path, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(metrics) as f:
+        return json.load(f)["counters"]["records"]
+
+def test_validate_claims(results, tmp_path):
+    args = ["--truth_json", os.path.join(ROOT, "su_stats_excerpt.json"), "--results_dir", str(results),
+            "--out", str(tmp_path / "claims.json")]
+    assert records(tmp_path, "validate_claims.py", *args) == N
+    assert records(tmp_path, "validate_claims.py", *args, "--workers", "2") == N
+
+def test_validate_claims_columnar(results, tmp_path):
+    pytest.importorskip("pyarrow")
+    import columnar
+    store = tmp_path / "store"
+    columnar.convert([str(results / "corpus.jsonl")], str(store / "corpus.parquet"), row_group_size=100)
+    args = ["--truth_json", os.path.join(ROOT, "su_stats_excerpt.json"), "--results_dir", str(store),
+            "--out", str(tmp_path / "claims.json")]
+    assert records(tmp_path, "validate_claims.py", *args) == N
+    assert records(tmp_path, "validate_claims.py", *args, "--workers", "2") == N
+
+def test_analysis(results, tmp_path):
+    bias = ["--results_dir", str(results), "--outdir", str(tmp_path / "bias")]
+    assert records(tmp_path, "analyze_bias.py", *bias) == N
+    assert records(tmp_path, "analyze_bias.py", *bias, "--workers", "2") == N
+    script = ["--results", str(results / "corpus.jsonl"), "--outdir", str(tmp_path / "script")]
+    assert records(tmp_path, "analyze_script.py", *script) == N
+    assert records(tmp_path, "analyze_script.py", *script, "--workers", "2") == N
@@ -0,0 +1,46 @@
+import random, re, time
+
+from keyword_matcher import KeywordMatcher, TOKEN_RE
+import features
+
+# KeywordMatcher against brute-force counts, its build time on large
+# lexicons, and the lexicon sentiment with and without multi-word phrases.
+
+def brute_substring(categories, text):
+    return {c: sum(len(re.findall(f"(?={re.escape(k)})", text)) for k in set(kws)) for c, kws in categories.items()}
+
+def test_substring_counts_include_overlaps():
+    cats = {"a": ["he", "she", "hers"], "b": ["his", "e", "rs"], "c": ["xyz"]}
+    rng = random.Random(0)
+    for _ in range(200):
+        text = "".join(rng.choice("hersix") for _ in range(rng.randint(0, 40)))
+        assert KeywordMatcher(cats).counts(text) == brute_substring(cats, text)
+
+def test_whole_word_phrases():
+    m = KeywordMatcher({"pos": ["strong", "ground ball edge"], "neg": ["ground ball", "ball"]}, whole_words=True)
+    assert m.counts("a strong ground ball edge; ground balls, ball") == {"pos": 2, "neg": 3}
+    assert [c for _, c in m.hits("ground ball edge")] == ["neg", "neg", "pos"]
+
+def test_positions():
+    m = KeywordMatcher({"x": ["ab"], "y": ["b", "abc"]})
+    assert m.positions("abcab") == {0: [1, 4], 1: [1, 2, 4]}
+
+def test_build_is_linear_in_lexicon_size():
+    rng = random.Random(1)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=8)) for _ in range(8000)]
+    t0 = time.perf_counter()
+    m = KeywordMatcher({"pos": words[:4000], "neg": words[4000:]}, whole_words=True)
+    assert time.perf_counter() - t0 < 1.0  # a full transition table took ~37s here
+    assert m.counts(" ".join(words[3998:4002]) + " none") == {"pos": 2, "neg": 2}
+
+def test_sentiment_with_and_without_phrases():
+    text = "Strong ground ball play, but a ground ball risk remains; strong."
+    toks = TOKEN_RE.findall(text.lower())
+    assert features.sentiment_score(text) == (2 - 1) / len(toks)
+    assert features.sentiment_score(text, ["strong", "ground ball"], ["risk"]) == (4 - 1) / len(toks)
+    assert features.lexicon_matcher() is None and features.lexicon_matcher(["ground ball"], []) is not None
+
+def test_classify_strategy():
+    assert features.classify_strategy("Work on ground ball pressure and set plays") == ("defensive", "team")
+    assert features.classify_strategy("Player A should finish more shots") == ("offensive", "individual")
+    assert features.classify_strategy("Nothing here") == ("other", "other")
@@ -0,0 +1,104 @@
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import providers
+
+# The adapters against a local HTTP server that speaks just enough of each
+# provider's API: responses come back, per-model clients are reused, all of
+# them share one keep-alive pool of pool_size connections, and
+# provider_client() does not count as a per-model client.
+
+def reply(path, body):
+    text = f"{path} {body.get('temperature', body.get('generationConfig', {}).get('temperature'))}"
+    if path == "/v1/chat/completions":
+        return {"id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]}
+    if path == "/v1/messages":
+        return {"id": "m", "type": "message", "role": "assistant", "model": body["model"], "stop_reason": "end_turn",
+                "content": [{"type": "text", "text": text}], "usage": {"input_tokens": 1, "output_tokens": 1}}
+    if path.startswith("/v1beta/models/") and path.endswith(":generateContent"):
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+    return None
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.peers.add(self.client_address)
+        out = reply(self.path.split("?")[0], body)
+        data = json.dumps(out or {"error": {"message": "not found"}}).encode()
+        self.send_response(200 if out else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.peers = set()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+@pytest.fixture(autouse=True)
+def keys(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+
+BASE = {"openai": "http://127.0.0.1:{}/v1", "anthropic": "http://127.0.0.1:{}", "gemini": "http://127.0.0.1:{}"}
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic", "gemini"])
+def test_adapter_reuses_clients_and_connections(server, provider):
+    if provider != "gemini":
+        pytest.importorskip(provider)
+    a = providers.ADAPTER_CLASSES[provider](pool_size=1, base_url=BASE[provider].format(server.server_port))
+    try:
+        for model in ["m1", "m2", "m1", "m2"]:
+            assert a.ask(model, "hello", 0.5, 1).endswith(" 0.5")
+        assert a.provider_client() is a.provider_client()
+        st = a.stats.as_dict()
+        assert (st["requests"], st["errors"], st["clients_created"], st["reuse_count"]) == (4, 0, 2, 2)
+        assert len(server.peers) == 1  # one pooled keep-alive connection for both models
+    finally:
+        a.close()
+
+def test_gemini_errors_are_counted(server):
+    a = providers.GeminiAdapter(base_url=f"http://127.0.0.1:{server.server_port}/missing")
+    try:
+        with pytest.raises(Exception):
+            a.ask("m1", "hello", 0.5, 1)
+        assert a.stats.errors == 1
+    finally:
+        a.close()
+
+def test_configure_replaces_the_adapter(server):
+    providers.configure("gemini", pool_size=2, base_url=BASE["gemini"].format(server.server_port))
+    a = providers.get_adapter("gemini")
+    assert providers.get_adapter("gemini") is a and a.pool_size == 2
+    a.ask("m1", "hello", 0.5, 1)
+    providers.configure("gemini", pool_size=4)
+    assert providers.get_adapter("gemini") is not a
+    assert a._http is None  # the old pool was closed
+    providers.configure("gemini")
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic"])
+def test_batch_backend_uses_the_provider_client(server, provider, tmp_path):
+    pytest.importorskip(provider)
+    import batch
+    providers.configure(provider, base_url=BASE[provider].format(server.server_port))
+    try:
+        b = batch.get_backend(provider, str(tmp_path))
+        a = providers.get_adapter(provider)
+        assert b.client is a.provider_client()
+        assert a.stats.clients_created == 0 and a.stats.reuse_count == 0
+    finally:
+        providers.configure(provider)
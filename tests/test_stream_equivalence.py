@@ -0,0 +1,38 @@
+import os, subprocess, sys
+
+import pytest
+
+from benchmarks.corpus import write_corpus
+
+# --stream and --workers must write the same files as the in-memory run, byte
+# for byte: the serial mean_sentiment goes through streaming.exact_mean, the
+# same exact sum the running aggregates keep.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+N = 2000
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory):
+    d = tmp_path_factory.mktemp("results")
+    write_corpus(str(d / "corpus.jsonl"), N, seed=1)
+    return d
+
+def outputs(tmp_path, script, *args):
+    outdir = tmp_path / f"{script}-{len(os.listdir(tmp_path))}"
+    subprocess.run([sys.executable, os.path.join(ROOT, script), *args, "--outdir", str(outdir)],
+                   cwd=tmp_path, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return {name: (outdir / name).read_bytes() for name in sorted(os.listdir(outdir))}
+
+def test_analyze_bias(results, tmp_path):
+    args = ["--results_dir", str(results)]
+    serial = outputs(tmp_path, "analyze_bias.py", *args)
+    assert "sentiment_by_condition.csv" in serial
+    assert outputs(tmp_path, "analyze_bias.py", *args, "--stream") == serial
+    assert outputs(tmp_path, "analyze_bias.py", *args, "--workers", "2") == serial
+
+def test_analyze_script(results, tmp_path):
+    args = ["--results", str(results / "corpus.jsonl")]
+    serial = outputs(tmp_path, "analyze_script.py", *args)
+    assert "sentiment_by_condition_phase3.csv" in serial
+    assert outputs(tmp_path, "analyze_script.py", *args, "--stream") == serial
+    assert outputs(tmp_path, "analyze_script.py", *args, "--workers", "2") == serial
@@ -1,70 +1,130 @@
 
-import argparse, json, os, re
+import argparse, itertools, json, os
 from scripts.utils import read_jsonl
+from claim_rules import ClaimChecker, extract_numbers  # noqa: F401
+
+import instrument
 
 def load_truth(path):
     with open(path, "r") as f:
         return json.load(f)
 
-def extract_numbers(text):
-    # returns list of (number, context window)
-    nums = []
-    for m in re.finditer(r"(-?\d+\.?\d*)", text):
-        start = max(0, m.start()-20)
-        end = min(len(text), m.end()+20)
-        nums.append((float(m.group(1)), text[start:end]))
-    return nums
+def check_claims(text, truth, rules_path=None):
+    # rules are declared in scripts/claim_rules.json (see claim_rules.py); for many
+    # responses build one ClaimChecker and call .check() directly
+    return ClaimChecker(truth, rules_path).check(text)
+
+def run_checks(checker, text):
+    with instrument.stage("check_claims"):
+        issues = checker.check(text)
+    instrument.count("claims", len(issues))
+    instrument.count("claims_incorrect", sum(1 for i in issues if i["correct"] is False))
+    return issues
 
-def check_claims(text, truth):
-    issues = []
-    # Example heuristic: if text says "more turnovers than opponents" verify numbers
-    if re.search(r"turnover[s]? .*than opponent", text, re.I):
-        ours = truth["turnovers"]
-        theirs = truth["opponent_turnovers"]
-        cond = ours > theirs
-        issues.append({"claim": "more turnovers than opponents", "truth": f"{ours} vs {theirs}", "correct": cond})
+def report_row(rec, checker):
+    return {
+        "provider": rec["provider"],
+        "model": rec["model"],
+        "hypothesis_id": rec["hypothesis_id"],
+        "condition": rec["condition"],
+        "issues": run_checks(checker, rec["response"])
+    }
 
-    if re.search(r"better free position", text, re.I):
-        # compare made/attempt rate
-        ours = truth["free_position_made"] / truth["free_position_att"]
-        theirs = truth["opponent_free_position_made"] / truth["opponent_free_position_att"]
-        cond = ours > theirs
-        issues.append({"claim": "better free position rate", "truth": f"{ours:.3f} vs {theirs:.3f}", "correct": cond})
+REPORT_COLS = ["provider", "model", "hypothesis_id", "condition", "response"]
 
-    # Flag naked numeric hallucinations > 400 when talking about shots (since total attempts 716 for team)
-    if re.search(r"shot", text, re.I):
-        for num, ctx in extract_numbers(text):
-            if num > 1000:
-                issues.append({"claim": f"suspicious large number {num}", "context": ctx, "correct": False})
+def _check_shard(job):
+    from streaming import iter_records
+    path, start, end, checker = job
+    return [report_row(rec, checker) for rec in iter_records(path, REPORT_COLS, start=start, end=end)]
 
-    return issues
+def claims_version(checker):
+    # changes whenever the claim engine, the rules or the ground truth change
+    import hashlib, inspect
+    import claim_rules
+    src = inspect.getsource(claim_rules) + checker.version
+    return hashlib.sha256(src.encode("utf-8")).hexdigest()
+
+def index_claims(paths, checker, index_path, chunksize=50000):
+    # incremental mode: check claims only for records not yet in the index
+    from feature_index import FeatureIndex, record_digest
+    from streaming import iter_records
+    index = FeatureIndex(index_path)
+    if index.ensure_version("claims", claims_version(checker)):
+        print(f"Claim checks/truth changed: re-validating all records in {index_path}")
+    cols = ["timestamp", "provider", "model", "seed", "hypothesis_id", "condition", "prompt", "response"]
+    n_new = 0
+    for path in paths:
+        records = iter_records(path, cols, chunksize)
+        while True:
+            part = list(itertools.islice(records, chunksize))
+            if not part:
+                break
+            digests = [record_digest(r) for r in part]
+            todo = set(index.missing(digests, "claims"))
+            new = [(d, r) for d, r in zip(digests, part) if d in todo]
+            if new:
+                issues = [run_checks(checker, r["response"]) for _, r in new]
+                with instrument.stage("index_write"):
+                    index.put_claims([d for d, _ in new], [r for _, r in new], issues, source=path)
+                n_new += len(new)
+    # records of earlier batches whose claims were invalidated (or never checked)
+    stale = index.stale("claims")
+    for i in range(0, len(stale), chunksize):
+        part = stale[i:i + chunksize]
+        issues = [run_checks(checker, r["response"]) for _, r in part]
+        with instrument.stage("index_write"):
+            index.put_claims([d for d, _ in part], [r for _, r in part], issues)
+    index.require_complete("claims")
+    print(f"Index {index_path}: checked claims for {n_new} new and {len(stale)} previously indexed records")
+    report = index.claims_report()
+    index.close()
+    return report
 
 def main(args):
     truth = load_truth(args.truth_json)
+    with instrument.stage("compile_rules"):
+        checker = ClaimChecker(truth, getattr(args, "rules", None))
+    paths = [os.path.join(args.results_dir, fn) for fn in os.listdir(args.results_dir)
+             if fn.endswith((".jsonl", ".parquet"))]
+    workers = getattr(args, "workers", 1)
     report = []
-    for fn in os.listdir(args.results_dir):
-        if not fn.endswith(".jsonl"): 
-            continue
-        for rec in read_jsonl(os.path.join(args.results_dir, fn)):
-            issues = check_claims(rec["response"], truth)
-            report.append({
-                "provider": rec["provider"],
-                "model": rec["model"],
-                "hypothesis_id": rec["hypothesis_id"],
-                "condition": rec["condition"],
-                "issues": issues
-            })
+    if getattr(args, "index", ""):
+        # the report then covers every record in the index, not only results_dir
+        report = index_claims(paths, checker, args.index)
+    elif workers > 1:
+        # byte-range shards in file order; concatenation matches the serial report
+        from streaming import plan_shards, map_shards
+        jobs = [(p, s, e, checker) for p, s, e in plan_shards(paths, workers * 4)]
+        for part in map_shards(_check_shard, jobs, workers):
+            report.extend(part)
+    else:
+        for path in paths:
+            if path.endswith(".parquet"):
+                # columnar store: only the columns the report needs are read
+                report.extend(_check_shard((path, 0, None, checker)))
+                continue
+            for rec in read_jsonl(path):
+                report.append(report_row(rec, checker))
+    instrument.count("records", len(report))
 
-    with open(args.out, "w") as f:
+    with instrument.stage("write_report"), open(args.out, "w") as f:
         json.dump(report, f, indent=2)
 
     print(f"Wrote validation report to {args.out}")
 
-if __name__ == "__main__":
+def cli(argv=None, prog=None):
     import argparse
-    ap = argparse.ArgumentParser()
+    ap = argparse.ArgumentParser(prog=prog)
     ap.add_argument("--truth_json", default="data/su_stats_excerpt.json")
+    ap.add_argument("--rules", default=None, help="claim rules JSON (default: scripts/claim_rules.json)")
     ap.add_argument("--results_dir", default="results")
     ap.add_argument("--out", default="analysis/claims_validation.json")
-    args = ap.parse_args()
+    ap.add_argument("--workers", type=int, default=1, help="process-pool workers over byte-range shards")
+    ap.add_argument("--index", default="", help="SQLite feature/claims index shared with analyze_script --index")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("validate_claims", args)
     main(args)
+
+if __name__ == "__main__":
+    cli()
@@ -1,49 +1,151 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-
-import os
-
-print(os.listdir(r"C:\Users\sagar\Downloads\Research Work\task8_week3&4"))
-
-# 1. Player recommendations (H1)
-df_mentions = pd.read_csv("mentions_by_condition.csv")
-h1 = df_mentions[df_mentions["hypothesis_id"]=="H1"]
-
-pivot = h1.pivot(index="condition", columns="entity", values="total_mentions")
-pivot.plot(kind="bar", figsize=(8,5))
-plt.title("Player Mentions by Framing Condition (H1)")
-plt.ylabel("Mentions")
-plt.tight_layout()
-plt.savefig("h1_player_mentions.png", dpi=300)
-
-# 2. Sentiment by condition
-sent = pd.read_csv("sentiment_by_condition.csv")
-sent_plot = sent[sent["hypothesis_id"].isin(["H1","H3"])]
-
-pivot2 = sent_plot.pivot(index="condition", columns="hypothesis_id", values="mean_sentiment")
-pivot2.plot(kind="bar", figsize=(8,5))
-plt.title("Sentiment by Condition (H1 & H3)")
-plt.ylabel("Mean Sentiment Score")
-plt.tight_layout()
-plt.savefig("sentiment_by_condition.png", dpi=300)
-
-# 3. Strategy axis (H3)
-strategy = pd.read_csv("recommendation_strategy_by_condition.csv")
-h3 = strategy[strategy["hypothesis_id"]=="H3"]
-
-pivot3 = h3.pivot(index="condition", columns="strategy_axis", values="count")
-pivot3.plot(kind="bar", stacked=True, figsize=(8,5))
-plt.title("Strategy Axis by Condition (H3)")
-plt.ylabel("Count")
-plt.tight_layout()
-plt.savefig("h3_strategy_axis.png", dpi=300)
-
-# 4. Fabrication rate
-fab = pd.read_csv("fabrication_rate_by_condition.csv")
-fab_h3 = fab[fab["hypothesis_id"]=="H3"]
-
-fab_h3.plot(kind="bar", x="condition", y="fabrication_rate", figsize=(6,4))
-plt.title("Fabrication Rate by Condition (H3)")
-plt.ylabel("Rate")
-plt.tight_layout()
-plt.savefig("fabrication_rate.png", dpi=300)
+import argparse, hashlib, json, os
+
+import instrument
+
+# Figures from the analysis CSVs (analyze_bias / analyze_script outputs).
+# Nothing runs at import time. Each CSV is read once; every figure is reduced
+# to the small frame it plots, and that frame (plus the figure settings) is
+# hashed: figures whose hash matches the cache in the output directory and
+# whose PNG exists are skipped. The rest are rendered in a process pool with
+# the Agg backend, so a sweep with --split_by model|provider (one figure set
+# per subdirectory written by analyze_script --split_by) renders its sets in
+# parallel, and a rerun redraws only the sets whose data changed.
+
+RENDER_VERSION = "1"  # bump when rendering code changes, to invalidate caches
+CACHE_FILE = ".figure_cache.json"
+
+# output file -> (input CSVs, first existing one is used), builder, plot settings
+FIGURES = {
+    "h1_player_mentions.png": (["mentions_by_condition.csv"], "h1_mentions",
+                               dict(title="Player Mentions by Framing Condition (H1)", ylabel="Mentions",
+                                    figsize=(8, 5))),
+    "sentiment_by_condition.png": (["sentiment_by_condition.csv", "sentiment_by_condition_phase3.csv"], "sentiment",
+                                   dict(title="Sentiment by Condition (H1 & H3)", ylabel="Mean Sentiment Score",
+                                        figsize=(8, 5))),
+    "h3_strategy_axis.png": (["recommendation_strategy_by_condition.csv"], "h3_strategy",
+                             dict(title="Strategy Axis by Condition (H3)", ylabel="Count", figsize=(8, 5),
+                                  stacked=True)),
+    "fabrication_rate.png": (["fabrication_rate_by_condition.csv"], "fabrication",
+                             dict(title="Fabrication Rate by Condition (H3)", ylabel="Rate", figsize=(6, 4))),
+}
+
+def h1_mentions(df):
+    h1 = df[df["hypothesis_id"]=="H1"]
+    return h1.pivot(index="condition", columns="entity", values="total_mentions")
+
+def sentiment(df):
+    sent = df[df["hypothesis_id"].isin(["H1","H3"])]
+    return sent.pivot(index="condition", columns="hypothesis_id", values="mean_sentiment")
+
+def h3_strategy(df):
+    h3 = df[df["hypothesis_id"]=="H3"]
+    return h3.pivot(index="condition", columns="strategy_axis", values="count")
+
+def fabrication(df):
+    return df[df["hypothesis_id"]=="H3"].set_index("condition")[["fabrication_rate"]]
+
+BUILDERS = {"h1_mentions": h1_mentions, "sentiment": sentiment, "h3_strategy": h3_strategy,
+            "fabrication": fabrication}
+
+def figure_sets(data_dir, out_dir, split_by=""):
+    # (data dir, output dir) pairs: the top level, plus one per split value
+    sets = [(data_dir, out_dir)]
+    if split_by:
+        prefix = split_by + "="
+        sets += [(os.path.join(data_dir, d), os.path.join(out_dir, d)) for d in sorted(os.listdir(data_dir))
+                 if d.startswith(prefix) and os.path.isdir(os.path.join(data_dir, d))]
+    return sets
+
+def figure_jobs(data_dir, out_dir, dpi=300):
+    # (png path, plot frame, settings, hash) for every figure whose input exists
+    import pandas as pd
+    frames, jobs = {}, []
+    for png, (inputs, builder, opts) in FIGURES.items():
+        path = next((os.path.join(data_dir, c) for c in inputs if os.path.exists(os.path.join(data_dir, c))), None)
+        if path is None:
+            continue
+        if path not in frames:
+            frames[path] = pd.read_csv(path)
+        frame = BUILDERS[builder](frames[path])
+        if frame.empty:
+            continue
+        key = json.dumps([RENDER_VERSION, png, sorted(opts.items()), dpi], default=str) + frame.to_csv()
+        jobs.append((os.path.join(out_dir, png), frame, dict(opts, dpi=dpi),
+                     hashlib.sha256(key.encode("utf-8")).hexdigest()))
+    return jobs
+
+def _load_cache(out_dir):
+    try:
+        with open(os.path.join(out_dir, CACHE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(out_dir, cache):
+    with open(os.path.join(out_dir, CACHE_FILE), "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def render(job):
+    path, frame, opts = job[:3]
+    _init_worker()
+    import matplotlib.pyplot as plt
+    opts = dict(opts)
+    title, ylabel, dpi = opts.pop("title"), opts.pop("ylabel"), opts.pop("dpi")
+    ax = frame.plot(kind="bar", **opts)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    fig = ax.get_figure()
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path
+
+def main(args):
+    todo, caches, n_cached = [], {}, 0
+    with instrument.stage("load"):
+        for data_dir, out_dir in figure_sets(args.data_dir, args.out_dir, args.split_by):
+            os.makedirs(out_dir, exist_ok=True)
+            caches[out_dir] = cache = {} if args.force else _load_cache(out_dir)
+            for job in figure_jobs(data_dir, out_dir, args.dpi):
+                name = os.path.basename(job[0])
+                if cache.get(name) == job[3] and os.path.exists(job[0]):
+                    n_cached += 1
+                    continue
+                todo.append(job)
+    workers = min(len(todo), args.workers or os.cpu_count() or 1)
+    with instrument.stage("render"):
+        if workers <= 1:
+            done = [render(j) for j in todo]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+                done = list(ex.map(render, todo))
+    instrument.count("figures_rendered", len(done))
+    instrument.count("figures_cached", n_cached)
+    for path, _, _, digest in todo:
+        out_dir = os.path.dirname(path)
+        caches[out_dir][os.path.basename(path)] = digest
+    for out_dir in {os.path.dirname(j[0]) for j in todo}:
+        _save_cache(out_dir, caches[out_dir])
+    print(f"Rendered {len(done)} figures, {n_cached} unchanged")
+
+def cli(argv=None, prog=None):
+    ap = argparse.ArgumentParser(prog=prog, description="Render figures from the analysis CSVs")
+    ap.add_argument("--data_dir", default=".", help="directory with the analysis CSVs")
+    ap.add_argument("--out_dir", default=".", help="where PNGs (and the figure cache) are written")
+    ap.add_argument("--split_by", default="", choices=["", "model", "provider"],
+                    help="also render one set per <split>=<value> subdirectory (analyze_script --split_by)")
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--workers", type=int, default=0, help="render processes (default: one per CPU)")
+    ap.add_argument("--force", action="store_true", help="redraw every figure, ignoring the cache")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.from_args("visualizations", args)
+    main(args)
+
+if __name__ == "__main__":
+    cli()